@@ -0,0 +1,404 @@
+import argparse
+import gzip
+import json
+import logging
+import re
+import secrets
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from db_manager import DatabaseManager
+from workspace_analyzer import WorkspaceAnalyzer
+
+DB_PATH = 'vegetarian_diet.db'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# 小於此大小的回應不壓縮 (gzip 標頭的成本比省下的還多)
+GZIP_MIN_BYTES = 1024
+# 已編碼回應的快取筆數 (資料庫變動時整個清空)
+RESPONSE_CACHE_SIZE = 1024
+WORKER_THREADS = 16
+# 閒置的保持連線超過此秒數即關閉，釋出執行緒給其他客戶端
+KEEP_ALIVE_SECONDS = 5
+MAX_BODY_BYTES = 1 << 20
+
+logger = logging.getLogger(__name__)
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def _int_param(query: Dict[str, List[str]], name: str, default: int, low: int = 0,
+               high: Optional[int] = None) -> int:
+    raw = query.get(name, [None])[0]
+    if raw is None or raw == '':
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ApiError(400, f"{name} 必須是整數")
+    if value < low or (high is not None and value > high):
+        raise ApiError(400, f"{name} 超出範圍")
+    return value
+
+def _str_param(query: Dict[str, List[str]], name: str) -> Optional[str]:
+    value = query.get(name, [''])[0].strip()
+    return value or None
+
+def _id_list(raw: str) -> List[int]:
+    try:
+        return [int(part) for part in raw.split(',') if part.strip()]
+    except ValueError:
+        raise ApiError(400, "recipes 必須是以逗號分隔的食譜 id")
+
+def paginate(items: List, query: Dict[str, List[str]]) -> Dict:
+    """以 offset / limit 切出一頁，並附上總數與下一頁的 offset"""
+    offset = _int_param(query, 'offset', 0)
+    limit = _int_param(query, 'limit', DEFAULT_LIMIT, low=1, high=MAX_LIMIT)
+    page = items[offset:offset + limit]
+    next_offset = offset + limit if offset + limit < len(items) else None
+    return {'items': page, 'total': len(items), 'offset': offset, 'limit': limit, 'next_offset': next_offset}
+
+class CatalogApi:
+    """
+    以 DatabaseManager 提供食材、食譜、套餐與今日菜單分析的 JSON 端點。
+
+    每個端點回傳 (狀態碼, 可序列化成 JSON 的內容)；HTTP 層 (ApiHandler) 負責快取、ETag 與壓縮。
+    """
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+        self.analyzer = WorkspaceAnalyzer(db)
+        self.routes = [
+            ('GET', re.compile(r'^/api/categories$'), self.categories),
+            ('GET', re.compile(r'^/api/ingredients$'), self.ingredients),
+            ('GET', re.compile(r'^/api/ingredients/(\d+)$'), self.ingredient),
+            ('GET', re.compile(r'^/api/recipes$'), self.recipes),
+            ('GET', re.compile(r'^/api/recipes/(\d+)$'), self.recipe),
+            ('GET', re.compile(r'^/api/menu-sets$'), self.menu_sets),
+            ('GET', re.compile(r'^/api/menu-sets/(\d+)$'), self.menu_set),
+            ('GET', re.compile(r'^/api/workspace/analysis$'), self.analysis),
+            ('POST', re.compile(r'^/api/workspace/analysis$'), self.analysis),
+            ('GET', re.compile(r'^/api/shopping-list$'), self.shopping_list),
+            ('POST', re.compile(r'^/api/shopping-list$'), self.shopping_list),
+        ]
+
+    def dispatch(self, method: str, path: str, query: Dict[str, List[str]], body: Optional[Dict]):
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            return handler(query, body, *(int(g) for g in match.groups()))
+        if allowed:
+            raise ApiError(405, "不支援此方法")
+        raise ApiError(404, "找不到此端點")
+
+    # --- 目錄 ---
+    def categories(self, query, body):
+        return 200, {
+            'ingredient_categories': self.db.get_categories(),
+            'recipe_categories': self.db.get_recipe_categories(),
+            'five_colors': self.db.get_five_colors(),
+            'natures': self.db.get_natures(),
+        }
+
+    def ingredients(self, query, body):
+        keyword = _str_param(query, 'q')
+        category = _str_param(query, 'category')
+        if keyword:
+            items = self.db.search_ingredients(keyword, category)
+        elif category:
+            items = self.db.get_ingredients_by_category(category)
+        else:
+            items = self.db.get_all_ingredients()
+        return 200, paginate(items, query)
+
+    def ingredient(self, query, body, ingredient_id):
+        item = self.db.get_ingredient_by_id(ingredient_id)
+        if item is None:
+            raise ApiError(404, "找不到此食材")
+        return 200, item
+
+    def recipes(self, query, body):
+        keyword = _str_param(query, 'q')
+        category = _str_param(query, 'category')
+        if keyword:
+            recipes = self.db.search_recipes(keyword, category)
+        elif category:
+            recipes = self.db.get_recipes_by_category(category)
+        else:
+            recipes = self.db.get_all_recipes()
+        page = paginate(recipes, query)
+        # 只為這一頁的食譜查詢食材
+        page_ids = [r['id'] for r in page['items']]
+        by_id = {r['id']: r for r in self.db.get_recipes_with_ingredients(page_ids)}
+        page['items'] = [by_id[rid] for rid in page_ids if rid in by_id]
+        return 200, page
+
+    def recipe(self, query, body, recipe_id):
+        item = self.db.get_recipe_with_ingredients(recipe_id)
+        if item is None:
+            raise ApiError(404, "找不到此食譜")
+        return 200, item
+
+    def menu_sets(self, query, body):
+        return 200, paginate(self.db.get_all_menu_sets(), query)
+
+    def menu_set(self, query, body, menu_set_id):
+        item = self.db.get_menu_set_with_recipes(menu_set_id)
+        if item is None:
+            raise ApiError(404, "找不到此套餐")
+        return 200, item
+
+    # --- 今日菜單 ---
+    def _workspace(self, query, body) -> List[Dict]:
+        """
+        GET 以 ?recipes=1,2,3 指定食譜；POST 的 JSON 內容為 {"items": [...]}，
+        項目格式與 app.py 的今日菜單相同 ({"type": "recipe", "id": 1} 或
+        {"type": "custom", "name": "...", "ingredients": [食材 id, ...]})；
+        自訂菜色的食材也可以填名稱，在這裡換成 id
+        """
+        if body is None:
+            return [{'type': 'recipe', 'id': rid} for rid in _id_list(query.get('recipes', [''])[0])]
+        items = body.get('items')
+        if not isinstance(items, list):
+            raise ApiError(400, "items 必須是陣列")
+        workspace = []
+        for item in items:
+            if not isinstance(item, dict) or item.get('type') not in ('recipe', 'custom'):
+                raise ApiError(400, "每個項目的 type 必須是 recipe 或 custom")
+            if item['type'] == 'recipe' and not isinstance(item.get('id'), int):
+                raise ApiError(400, "食譜項目需要整數 id")
+            if item['type'] == 'custom':
+                item = {**item, 'ingredients': self._ingredient_ids(item.get('ingredients') or [])}
+            workspace.append(item)
+        return workspace
+
+    def _ingredient_ids(self, values) -> List[int]:
+        if not isinstance(values, list):
+            raise ApiError(400, "ingredients 必須是陣列")
+        ids = []
+        for value in values:
+            if isinstance(value, str):
+                ing = self.db.catalog.by_name(value)
+            else:
+                ing = self.db.catalog.get(value) if isinstance(value, int) else None
+            if ing is None:
+                raise ApiError(400, f"找不到食材：{value}")
+            ids.append(ing.id)
+        return ids
+
+    def analysis(self, query, body):
+        analysis = self.analyzer.analyze(self._workspace(query, body))
+        return 200, {
+            'color_counts': analysis.color_counts,
+            'nature_score': analysis.nature_score,
+            'core_ingredients': analysis.core_ingredients,
+            'condiments': analysis.condiments,
+        }
+
+    def shopping_list(self, query, body):
+        """採購清單 = 核心食材 + 勾選為缺少的調味品 (missing_condiments)"""
+        analysis = self.analyzer.analyze(self._workspace(query, body))
+        if body is not None:
+            missing = body.get('missing_condiments') or []
+        else:
+            missing = [name for name in query.get('missing_condiments', [''])[0].split(',') if name]
+        missing = [name for name in missing if name in analysis.condiments]
+        return 200, {
+            'core_ingredients': analysis.core_ingredients,
+            'condiments': analysis.condiments,
+            'items': analysis.core_ingredients + missing,
+        }
+
+class ResponseCache:
+    """已編碼的 GET 回應 (LRU)；以資料庫變動標記為世代，變動後整個清空"""
+
+    def __init__(self, size: int = RESPONSE_CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._token = None
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, token, key):
+        with self._lock:
+            if token != self._token:
+                self._token = token
+                self._entries.clear()
+                return None
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, token, key, entry):
+        with self._lock:
+            if token != self._token:
+                return
+            self._entries[key] = entry
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 保持連線，客戶端不必每個請求重新握手
+    server_version = 'VegeDietAPI/1.0'
+    timeout = KEEP_ALIVE_SECONDS
+    disable_nagle_algorithm = True  # 標頭與內容分開寫出，避免 Nagle 與延遲 ACK 造成每個請求 40ms 的等待
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _handle(self, method: str):
+        accepts_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        # 先完成回應內容再送出：處理過程的任何錯誤都能改回 JSON 錯誤，而不是直接斷線
+        try:
+            response = self._respond(method, accepts_gzip)
+        except ApiError as e:
+            response = self._encode(e.status, {'error': e.message}, accepts_gzip)
+        except Exception:
+            logger.exception("處理 %s %s 時發生錯誤", method, self.path)
+            response = self._encode(500, {'error': "伺服器內部錯誤"}, accepts_gzip)
+        self._send(*response)
+
+    def _respond(self, method: str, accepts_gzip: bool) -> Tuple:
+        """回傳 _send 的參數 (狀態碼, 內容, 壓縮方式[, ETag])"""
+        server = self.server
+        url = urlsplit(self.path)
+        if method != 'GET':
+            status, payload = server.api.dispatch(method, url.path, parse_qs(url.query), self._read_json())
+            return self._encode(status, payload, accepts_gzip)
+
+        token = server.api.db.change_token()
+        # 伺服器重新啟動後 change_token 會從頭計數，加上啟動時的隨機值才不會誤判為未變動
+        etag = f'W/"{server.nonce}-{token[0]}-{token[1]}"'
+        # 回應快取只存成功的回應：命中時不必再查詢；否則先路由，錯誤 (404 等) 不帶 ETag、也不回 304
+        key = (url.path, url.query, accepts_gzip)
+        entry = server.cache.get(token, key)
+        if entry is None:
+            status, payload = server.api.dispatch(method, url.path, parse_qs(url.query), None)
+            entry = self._encode(status, payload, accepts_gzip)
+            if status != 200:
+                return entry
+            server.cache.put(token, key, entry)
+        if etag in self.headers.get('If-None-Match', ''):
+            return 304, b'', None, etag
+        return (*entry, etag)
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "請求內容過大")
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ApiError(400, "請求內容不是合法的 JSON")
+        if not isinstance(body, dict):
+            raise ApiError(400, "請求內容必須是 JSON 物件")
+        return body
+
+    @staticmethod
+    def _encode(status: int, payload, accepts_gzip: bool) -> Tuple[int, bytes, Optional[str]]:
+        data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if accepts_gzip and len(data) >= GZIP_MIN_BYTES:
+            return status, gzip.compress(data, compresslevel=5), 'gzip'
+        return status, data, None
+
+    def _send(self, status: int, data: bytes, encoding: Optional[str] = None, etag: Optional[str] = None):
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')  # 可以快取，但每次都要以 ETag 確認
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+class ApiServer(HTTPServer):
+    """
+    以固定大小的執行緒池處理連線 (而非每個連線一條新執行緒)，
+    同時處理的請求數固定，連線池中的 SQLite 連線可以重複使用。
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, api: CatalogApi, workers: int = WORKER_THREADS, quiet: bool = False):
+        super().__init__(address, ApiHandler)
+        self.api = api
+        self.cache = ResponseCache()
+        self.nonce = secrets.token_hex(4)
+        self.quiet = quiet
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def create_server(db_path: str = DB_PATH, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                  workers: int = WORKER_THREADS, quiet: bool = False, read_only: bool = False) -> ApiServer:
+    """
+    建立 (尚未啟動的) API 伺服器；呼叫 serve_forever() 開始服務
+
+    Args:
+        db_path (str): 資料庫路徑
+        workers (int): 處理連線的執行緒數，也是資料庫連線數的上限
+        quiet (bool): 不輸出每個請求的存取紀錄
+        read_only (bool): 以唯讀模式直接開啟 db_path (例如 catalog_snapshot.py 編譯的目錄快照)
+    """
+    db = DatabaseManager(db_path, use_pool=True, read_only=read_only)
+    return ApiServer((host, port), CatalogApi(db), workers=workers, quiet=quiet)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="植感飲食 JSON API (食材、食譜、套餐、今日菜單分析與採購清單)")
+    parser.add_argument('--db', default=DB_PATH, help="資料庫路徑")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=WORKER_THREADS, help="處理連線的執行緒數")
+    parser.add_argument('--quiet', action='store_true', help="不輸出存取紀錄")
+    parser.add_argument('--read-only', action='store_true', help="唯讀開啟 --db (例如目錄快照)")
+    args = parser.parse_args()
+
+    server = create_server(args.db, args.host, args.port, args.workers, args.quiet, args.read_only)
+    print(f"=== 植感飲食 API：http://{args.host}:{args.port}/api/ ===")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.api.db.close()
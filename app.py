@@ -1,9 +1,11 @@
+import io
+import json
+import uuid
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-from db_manager import db
-# 引入專業 UI 套件
-import streamlit_antd_components as sac
+from db_manager import db, RECIPE_PAGE_SIZE, WorkspaceWriter
+from workspace_analyzer import WorkspaceAnalyzer
+from shopping_list import write_csv, write_text
+from quantities import DEFAULT_SERVINGS, format_amount, scenario_headcount
 
 # --- 1. 全域設定與 CSS ---
 st.set_page_config(
@@ -57,7 +59,54 @@ def inject_custom_css():
     </style>
     """, unsafe_allow_html=True)
 
-# --- 2. 頁面功能函數 ---
+# --- 2. 資料快取 ---
+# 讀取結果以資料庫變動標記 (PRAGMA data_version) 為快取鍵：
+# 沒有任何寫入時，重新執行腳本 (例如勾選核取方塊) 直接由記憶體回傳，不會查詢資料表
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _cached_read(method, token, *args):
+    return getattr(db, method)(*args)
+
+def cached(method, *args):
+    """以快取呼叫 DatabaseManager 的讀取方法，例如 cached('get_all_recipes')"""
+    return _cached_read(method, db.change_token(), *args)
+
+# --- 今日菜單保存 ---
+# 今日菜單以網址上的 ?ws= 工作階段 id 存入 menu_workspace 表：重新整理或被分配到其他副本時都能還原，
+# 寫入由 WorkspaceWriter 合併後批次 commit；寫入器被移出快取 (st.cache_resource.clear()) 時先寫入待寫入的內容
+
+@st.cache_resource(on_release=WorkspaceWriter.flush)
+def _workspace_writer(_db, db_key):
+    return WorkspaceWriter(_db)
+
+def workspace_writer():
+    # 以呼叫當下的 db 為快取鍵：db 被換成其他實例 (例如 benchmark 切換各倍數的資料庫) 時不沿用舊的寫入器。
+    # 快取中的寫入器持有該實例，id 不會被重複使用
+    return _workspace_writer(db, id(db))
+
+def workspace_session_id():
+    sid = st.query_params.get('ws')
+    if not sid:
+        sid = uuid.uuid4().hex
+        st.query_params['ws'] = sid
+    return sid
+
+def _workspace_snapshot(items):
+    return json.dumps(items, ensure_ascii=False, sort_keys=True, default=str)
+
+def load_workspace():
+    if 'menu_workspace' in st.session_state: return
+    items = workspace_writer().load(workspace_session_id())
+    st.session_state.menu_workspace = items
+    st.session_state.ws_saved = _workspace_snapshot(items)
+
+def persist_workspace():
+    snapshot = _workspace_snapshot(st.session_state.menu_workspace)
+    if snapshot != st.session_state.get('ws_saved'):
+        workspace_writer().schedule(workspace_session_id(), st.session_state.menu_workspace)
+        st.session_state.ws_saved = snapshot
+
+# --- 3. 頁面功能函數 ---
 
 def show_ingredients_page():
     # 篩選器 (使用 Pills)
@@ -67,17 +116,13 @@ def show_ingredients_page():
     search_keyword = st.text_input("搜尋", placeholder="輸入名稱或功效...", key="search_keyword", label_visibility="collapsed")
     st.write("") 
     
-    all_ingredients = db.get_all_ingredients()
-    filtered_ingredients = []
-    
-    for ingredient in all_ingredients:
-        if selected_cat != "全部" and ingredient['category'] != selected_cat:
-            continue
-        if search_keyword:
-            kw = search_keyword.lower()
-            if kw not in ingredient['name'].lower() and (not ingredient['effects'] or kw not in ingredient['effects'].lower()):
-                continue
-        filtered_ingredients.append(ingredient)
+    cat_filter = None if selected_cat == "全部" else selected_cat
+    if search_keyword.strip():
+        filtered_ingredients = cached('search_ingredients', search_keyword, cat_filter)
+    elif cat_filter:
+        filtered_ingredients = cached('get_ingredients_by_category', cat_filter)
+    else:
+        filtered_ingredients = cached('get_all_ingredients')
     
     st.caption(f"共 {len(filtered_ingredients)} 項食材")
     
@@ -94,6 +139,7 @@ def show_ingredients_page():
             '功效': ing['effects'] or '',
         })
     
+    import pandas as pd  # 較重的模組只在用到的頁面載入
     df = pd.DataFrame(df_data)
     
     st.dataframe(
@@ -117,28 +163,26 @@ def show_recipes_page():
         st.write("---")
         st.write("**選擇食材**")
         
-        all_ingredients = db.get_all_ingredients()
+        # 選項值為食材 id，顯示文字由食材選單提供
+        options = db.catalog.options()
         tabs = st.tabs(["🥬 蔬果", "🍄 蛋豆菇", "🌾 主食", "🧂 其他"])
-        
-        def get_options(cats):
-            return [f"【{ing['category']}】{ing['name']}" for ing in all_ingredients if ing['category'] in cats]
 
         with tabs[0]:
-            opts1 = get_options(['葉菜類', '根莖類', '花果類', '水果類'])
-            st.multiselect("選擇蔬果", opts1, key="tab_veg")
+            opts1 = options.ids(('葉菜類', '根莖類', '花果類', '水果類'))
+            st.multiselect("選擇蔬果", opts1, format_func=options.label, key="tab_veg")
         
         with tabs[1]:
-            opts2 = get_options(['豆製品', '蛋奶類', '菇菌類'])
-            st.multiselect("選擇蛋白質", opts2, key="tab_prot")
+            opts2 = options.ids(('豆製品', '蛋奶類', '菇菌類'))
+            st.multiselect("選擇蛋白質", opts2, format_func=options.label, key="tab_prot")
             
         with tabs[2]:
-            opts3 = get_options(['五穀雜糧', '堅果種子類'])
-            st.multiselect("選擇主食", opts3, key="tab_grain")
+            opts3 = options.ids(('五穀雜糧', '堅果種子類'))
+            st.multiselect("選擇主食", opts3, format_func=options.label, key="tab_grain")
             
         with tabs[3]:
-            covered = ['葉菜類', '根莖類', '花果類', '水果類', '豆製品', '蛋奶類', '菇菌類', '五穀雜糧', '堅果種子類']
-            opts4 = [f"【{ing['category']}】{ing['name']}" for ing in all_ingredients if ing['category'] not in covered]
-            st.multiselect("選擇調味/其他", opts4, key="tab_other")
+            covered = ('葉菜類', '根莖類', '花果類', '水果類', '豆製品', '蛋奶類', '菇菌類', '五穀雜糧', '堅果種子類')
+            opts4 = options.ids(exclude=covered)
+            st.multiselect("選擇調味/其他", opts4, format_func=options.label, key="tab_other")
 
         def save_recipe_callback():
             r_name = st.session_state.new_recipe_name
@@ -149,14 +193,8 @@ def show_recipes_page():
             
             if r_name and all_sels:
                 try:
-                    final_ids = []
-                    for option in all_sels:
-                        name = option.split("】")[1] if "】" in option else option
-                        ing_db = db.get_ingredient_by_name(name)
-                        if ing_db: final_ids.append(ing_db['id'])
-                    
                     rid = db.add_recipe(r_name, r_cat, r_desc)
-                    db.set_recipe_ingredients(rid, final_ids)
+                    db.set_recipe_ingredients(rid, all_sels)
                     st.toast('✅ 食譜已新增！')
                     st.session_state.new_recipe_name = ""
                     st.session_state.new_recipe_description = ""
@@ -173,29 +211,59 @@ def show_recipes_page():
     
     st.divider()
     
-    recipes = db.get_all_recipes()
-    if recipes:
-        cats = db.get_recipe_categories()
-        view_cat = st.selectbox("瀏覽分類", ["全部"] + cats)
-        
-        display_recipes = recipes if view_cat == "全部" else [r for r in recipes if r['category'] == view_cat]
-        
-        if display_recipes:
-            for recipe in display_recipes:
-                details = db.get_recipe_with_ingredients(recipe['id'])
-                ing_count = len(details.get('ingredients', []))
-                
-                with st.expander(f"{details['name']} ({ing_count}食材)"):
-                    if details['description']: st.caption(details['description'])
-                    ings = [f"{ing['name']}" for ing in details.get('ingredients', [])]
-                    st.write("、".join(ings))
-        else:
-            st.info("此分類暫無食譜")
+    cats = db.get_recipe_categories()
+    view_cat = st.selectbox("瀏覽分類", ["全部"] + cats)
+    recipe_keyword = st.text_input("搜尋食譜", placeholder="輸入名稱或描述...", key="recipe_search", label_visibility="collapsed")
+
+    cat_filter = None if view_cat == "全部" else view_cat
+    keyword = recipe_keyword.strip()
+    # 每頁的起點：瀏覽時為上一頁最後一筆的 (分類, 名稱, id)，搜尋時為排名清單中的位置；篩選條件改變就回到第一頁
+    if st.session_state.get('recipe_view') != (cat_filter, keyword):
+        st.session_state.recipe_view = (cat_filter, keyword)
+        st.session_state.recipe_cursors = [None]
+    cursors = st.session_state.recipe_cursors
+
+    if keyword:
+        # 依搜尋相關度排列，只取出本頁食譜的食材
+        ranked_ids = [r['id'] for r in cached('search_recipes', keyword, cat_filter)]
+        offset = cursors[-1] or 0
+        page_ids = ranked_ids[offset:offset + RECIPE_PAGE_SIZE]
+        by_id = {r['id']: r for r in cached('get_recipes_with_ingredients', page_ids)}
+        page = [{**by_id[rid], 'ingredient_names': [ing['name'] for ing in by_id[rid].get('ingredients', [])]}
+                for rid in page_ids]
+        next_cursor = offset + RECIPE_PAGE_SIZE if offset + RECIPE_PAGE_SIZE < len(ranked_ids) else None
+        if next_cursor is not None:
+            cached('get_recipes_with_ingredients', ranked_ids[next_cursor:next_cursor + RECIPE_PAGE_SIZE])
     else:
-        st.info("暫無食譜")
+        result = cached('get_recipe_page', cat_filter, cursors[-1], RECIPE_PAGE_SIZE)
+        page, next_cursor = result['recipes'], result['next']
+        if next_cursor is not None:
+            cached('get_recipe_page', cat_filter, next_cursor, RECIPE_PAGE_SIZE)  # 預先載入下一頁
+
+    if not page:
+        st.info("此分類暫無食譜" if cat_filter or keyword else "暫無食譜")
+        return
+
+    for details in page:
+        with st.expander(f"{details['name']} ({len(details['ingredient_names'])}食材)"):
+            if details['description']: st.caption(details['description'])
+            st.write("、".join(details['ingredient_names']))
+
+    def prev_page():
+        st.session_state.recipe_cursors.pop()
+
+    def next_page():
+        st.session_state.recipe_cursors.append(next_cursor)
+
+    c1, c2, c3 = st.columns([1, 2, 1])
+    c1.button("◀ 上一頁", disabled=len(cursors) == 1, on_click=prev_page, use_container_width=True)
+    c2.caption(f"第 {len(cursors)} 頁")
+    c3.button("下一頁 ▶", disabled=next_cursor is None, on_click=next_page, use_container_width=True)
 
 def show_menu_workspace_page():
     if 'menu_workspace' not in st.session_state: st.session_state.menu_workspace = []
+    if 'headcount' not in st.session_state: st.session_state.headcount = DEFAULT_SERVINGS
+    import streamlit_antd_components as sac  # 已由 main() 載入，這裡只是取得模組
     
     # 使用 SAC 分段控制器 (二級導航)
     mode = sac.segmented(
@@ -203,6 +271,7 @@ def show_menu_workspace_page():
             sac.SegmentedItem(label='自由配', icon='bag-plus'),
             sac.SegmentedItem(label='快速樣板', icon='grid-3x3-gap'),
             sac.SegmentedItem(label='經典套餐', icon='star'),
+            sac.SegmentedItem(label='冰箱配', icon='basket'),
         ],
         align='center',
         size='md', # 次級選單用中等尺寸
@@ -217,14 +286,21 @@ def show_menu_workspace_page():
         show_quick_template_panel()
     elif mode == "經典套餐":
         show_set_menu_panel()
+    elif mode == "冰箱配":
+        show_pantry_panel()
     
     st.divider()
     
     st.subheader("今日菜單")
     show_workspace_dashboard()
     show_workspace_content()
-    show_workspace_analysis()
-    show_shopping_list_generator()
+
+    # 五色、食性與採購清單共用同一份分析結果
+    analyzer = WorkspaceAnalyzer(db, recipe_loader=lambda ids: cached('get_recipes_with_ingredients', ids))
+    analysis = analyzer.analyze(st.session_state.menu_workspace)
+    show_workspace_analysis(analysis)
+    show_shopping_list_generator(analysis)
+    show_multi_day_shopping_panel()
 
 def show_free_style_panel():
     st.caption("方式 A：從食譜挑選")
@@ -235,7 +311,7 @@ def show_free_style_panel():
         with c1:
             sel_cat = st.selectbox("食譜分類", ["全部"] + r_cats, key="fs_cat_filter", label_visibility="collapsed")
         with c2:
-            all_recipes = db.get_all_recipes()
+            all_recipes = cached('get_all_recipes')
             if sel_cat != "全部":
                 filtered_recipes = [r for r in all_recipes if r['category'] == sel_cat]
             else:
@@ -246,7 +322,7 @@ def show_free_style_panel():
                 sel_recipe = st.selectbox("選擇食譜", list(opts.keys()), key="fs_recipe_sel", label_visibility="collapsed")
                 
                 if st.button("＋ 加入", key="add_free", use_container_width=True):
-                    r = db.get_recipe_by_id(opts[sel_recipe])
+                    r = cached('get_recipe_by_id', opts[sel_recipe])
                     st.session_state.menu_workspace.append({'type':'recipe', **r})
                     st.toast(f"已加入：{r['name']}")
             else:
@@ -257,28 +333,26 @@ def show_free_style_panel():
     
     c_name = st.text_input("菜名", placeholder="例如: 燙青菜", key="fs_diy_name")
     
-    all_ingredients = db.get_all_ingredients()
-    formatted_opts = [f"【{ing['category']}】{ing['name']}" for ing in all_ingredients]
-    
+    options = db.catalog.options()
     filter_ing_cat = st.selectbox("篩選食材分類", ["全部"] + db.get_categories(), key="fs_diy_cat_filter")
-    
-    if filter_ing_cat == "全部":
-        current_cat_opts = formatted_opts
-    else:
-        current_cat_opts = [opt for opt in formatted_opts if f"【{filter_ing_cat}】" in opt]
-        
+    current_cat_opts = options.ids() if filter_ing_cat == "全部" else options.ids((filter_ing_cat,))
+
+    # 已選的食材即使不在目前的分類中也要保留在選項內
     current_selection = st.session_state.get("fs_diy_ing_sel", [])
-    merged_options = sorted(list(set(current_cat_opts + current_selection)))
+    extra = []
+    if current_selection:
+        in_view = set(current_cat_opts)
+        extra = [i for i in current_selection if i not in in_view]
+    merged_options = extra + current_cat_opts if extra else current_cat_opts
     
-    st.multiselect("包含食材", options=merged_options, key="fs_diy_ing_sel")
+    st.multiselect("包含食材", options=merged_options, format_func=options.label, key="fs_diy_ing_sel")
     
     def add_diy_callback():
         c_name = st.session_state.fs_diy_name
         c_ings = st.session_state.fs_diy_ing_sel
         if c_name and c_ings:
-            clean_ings = [opt.split("】")[1] if "】" in opt else opt for opt in c_ings]
             st.session_state.menu_workspace.append({
-                'type':'custom', 'name':c_name, 'ingredients':clean_ings, 'category':'自訂'
+                'type':'custom', 'name':c_name, 'ingredients':list(c_ings), 'category':'自訂'
             })
             st.session_state.fs_diy_name = ""
             st.session_state.fs_diy_ing_sel = []
@@ -303,6 +377,22 @@ def show_quick_template_panel():
     
     bp = blueprints.get(sel_scn, {})
     if 'temp_sels' not in st.session_state: st.session_state.temp_sels = {}
+
+    if st.button("🪄 自動配菜", key="auto_fill", use_container_width=True,
+                 help="依五色均衡、寒熱平衡與不重複食材，自動補滿空位"):
+        # 已選的空位 (包含 DIY 自訂菜色) 都保留；自訂菜色沒有食譜 id，不納入評分
+        fixed = {k: v['id'] if v['type'] == 'recipe' else None for k, v in st.session_state.temp_sels.items()}
+        from template_filler import TemplateFiller  # numpy 只在需要矩陣時載入
+        picks = TemplateFiller(db.get_recipe_matrix()).fill(bp, fixed)
+        details = {r['id']: r for r in cached('get_recipes_with_ingredients', sorted(set(picks.values())))}
+        for key, rid in picks.items():
+            if key in st.session_state.temp_sels:
+                continue
+            r = {k: v for k, v in details[rid].items() if k != 'ingredients'}
+            st.session_state.temp_sels[key] = {'type':'recipe', **r}
+        if picks:
+            st.rerun()
+        st.toast("沒有可自動填入的空位", icon="⚠️")
     
     for cat, count in bp.items():
         for i in range(count):
@@ -325,6 +415,7 @@ def show_quick_template_panel():
             for v in st.session_state.temp_sels.values():
                 st.session_state.menu_workspace.append(v)
             st.session_state.temp_sels = {}
+            st.session_state.headcount = scenario_headcount(sel_scn)
             st.toast("已加入工作台！")
             st.rerun()
 
@@ -332,7 +423,7 @@ def show_quick_template_panel():
 def show_slot_dialog(key, cat):
     t1, t2 = st.tabs(["從食譜挑選", "DIY"])
     with t1:
-        rs = [r for r in db.get_all_recipes() if r['category'] == cat]
+        rs = [r for r in cached('get_all_recipes') if r['category'] == cat]
         if rs:
             opts = {r['name']: r for r in rs}
             s = st.selectbox("選擇", list(opts.keys()), key=f"s_{key}")
@@ -344,8 +435,8 @@ def show_slot_dialog(key, cat):
             st.info("無此類食譜")
     with t2:
         c_name = st.text_input("菜名", key=f"cn_{key}")
-        all_ings = [i['name'] for i in db.get_all_ingredients()]
-        c_ings = st.multiselect("食材", options=all_ings, key=f"ci_{key}")
+        options = db.catalog.options()
+        c_ings = st.multiselect("食材", options=options.ids(), format_func=options.label, key=f"ci_{key}")
         
         if st.button("確認", key=f"bc_{key}", type="primary", use_container_width=True):
             if c_name:
@@ -355,13 +446,13 @@ def show_slot_dialog(key, cat):
                 st.rerun()
 
 def show_set_menu_panel():
-    sets = db.get_all_menu_sets()
+    sets = cached('get_all_menu_sets')
     if sets:
         opts = {s['name']: s['id'] for s in sets}
         s_name = st.selectbox("選擇套餐", list(opts.keys()))
         if s_name:
             sid = opts[s_name]
-            details = db.get_menu_set_with_recipes(sid)
+            details = cached('get_menu_set_with_recipes', sid)
             if details['description']: st.caption(details['description'])
             
             for r in details['recipes']:
@@ -376,6 +467,34 @@ def show_set_menu_panel():
     else:
         st.info("暫無套餐")
 
+def show_pantry_panel():
+    st.caption("勾選手邊現有的食材，找出最能用上它們的食譜")
+
+    options = db.catalog.options()
+    pantry = st.multiselect("現有食材", options.ids(), format_func=options.label,
+                            key="pantry_sel", placeholder="例如: 高麗菜、雞蛋、白米")
+    ignore_conds = st.checkbox("不計調味品", value=True, key="pantry_ignore_conds")
+
+    if not pantry:
+        return
+
+    matches = cached('rank_recipes_by_pantry', pantry, ignore_conds, 10)
+    if not matches:
+        st.info("找不到用得上這些食材的食譜")
+        return
+
+    for m in matches:
+        c1, c2 = st.columns([5, 1], vertical_alignment="center")
+        with c1:
+            st.write(f"**{m['name']}** · {m['category']} · 已備 {m['matched']}/{m['total']}")
+            if m['missing_ids']:
+                st.caption("還缺：" + "、".join(options.label(i) for i in m['missing_ids']))
+        with c2:
+            if st.button("＋", key=f"pantry_add_{m['id']}", use_container_width=True):
+                r = cached('get_recipe_by_id', m['id'])
+                st.session_state.menu_workspace.append({'type':'recipe', **r})
+                st.toast(f"已加入：{r['name']}")
+
 def show_workspace_dashboard():
     if not st.session_state.menu_workspace:
         st.caption("尚未加入菜色")
@@ -399,6 +518,7 @@ def show_workspace_content():
             "移除": False
         })
     
+    import pandas as pd
     df = pd.DataFrame(df_data)
     
     edited_df = st.data_editor(
@@ -422,7 +542,7 @@ def show_workspace_content():
         st.session_state.menu_workspace = []
         st.rerun()
 
-def show_workspace_analysis():
+def show_workspace_analysis(analysis):
     if not st.session_state.menu_workspace: return
     
     st.write("---")
@@ -430,24 +550,14 @@ def show_workspace_analysis():
     
     with c1:
         st.write("**五色平衡**")
-        colors_list = []
-        for item in st.session_state.menu_workspace:
-            ings = []
-            if item['type'] == 'recipe':
-                ings = db.get_recipe_with_ingredients(item['id']).get('ingredients', [])
-                for ing in ings: colors_list.append(ing['five_color'])
-            elif item['type'] == 'custom' and item.get('ingredients'):
-                for ing_name in item['ingredients']:
-                    ing_db = db.get_ingredient_by_name(ing_name)
-                    if ing_db: colors_list.append(ing_db['five_color'])
-
-        if colors_list:
-            counts = {c: colors_list.count(c) for c in set(colors_list) if c != '未知'}
+        if analysis.color_counts:
+            counts = analysis.color_counts
             color_map = {'青':'#4CAF50', '赤':'#F44336', '黃':'#FFC107', '白':'#E0E0E0', '黑':'#424242'}
             labels = list(counts.keys())
             values = list(counts.values())
             cols = [color_map.get(l, '#999') for l in labels]
             
+            import plotly.graph_objects as go
             fig = go.Figure(data=[go.Pie(
                 labels=labels, values=values, hole=0.6,
                 marker_colors=cols, textinfo='none', hoverinfo='skip', showlegend=False
@@ -457,20 +567,8 @@ def show_workspace_analysis():
             
     with c2:
         st.write("**食性分析**")
-        natures = []
-        for item in st.session_state.menu_workspace:
-            if item['type'] == 'recipe':
-                ings = db.get_recipe_with_ingredients(item['id']).get('ingredients', [])
-                for ing in ings: natures.append(ing['nature'])
-            elif item['type'] == 'custom' and item.get('ingredients'):
-                for ing_name in item['ingredients']:
-                    ing_db = db.get_ingredient_by_name(ing_name)
-                    if ing_db: natures.append(ing_db['nature'])
-        
-        if natures:
-            scores = {'熱':2, '溫':1, '平':0, '涼':-1, '寒':-2}
-            score = sum(scores.get(n,0) for n in natures) / len(natures)
-            
+        if analysis.nature_score is not None:
+            score = analysis.nature_score
             pct = (max(-1, min(1, score/1.5)) + 1) / 2 * 100
             
             st.markdown(f"""
@@ -484,7 +582,24 @@ def show_workspace_analysis():
             
             st.write("") 
 
-def show_shopping_list_generator():
+    show_balance_suggestions(analysis)
+
+def show_balance_suggestions(analysis, limit=3):
+    """依目前缺少的顏色與偏寒/偏熱程度，用食譜矩陣挑出最能補足的菜色"""
+    from recipe_matrix import COLOR_COLUMNS  # numpy 只在需要矩陣時載入
+    weights = {c: 1.0 for c in COLOR_COLUMNS if not analysis.color_counts.get(c)}
+    if analysis.nature_score is not None and abs(analysis.nature_score) > 0.3:
+        weights['nature'] = -1.0 if analysis.nature_score > 0 else 1.0
+    if not weights: return
+
+    matrix = db.get_recipe_matrix()
+    in_use = [item['id'] for item in st.session_state.menu_workspace if item['type'] == 'recipe']
+    weights['condiments'] = -0.1  # 同分時偏好調味品較少的食譜
+    picks = [(rid, s) for rid, s in matrix.rank(weights, limit=limit, exclude_ids=in_use) if s > 0]
+    if picks:
+        st.caption("💡 建議補充：" + "、".join(matrix.name(rid) for rid, _ in picks))
+
+def show_shopping_list_generator(analysis):
     if not st.session_state.menu_workspace: return
     
     if 'show_shop_list' not in st.session_state: st.session_state.show_shop_list = False
@@ -496,27 +611,19 @@ def show_shopping_list_generator():
         st.divider()
         st.subheader("採購清單")
         
-        core_ings = []
-        condiments = []
-        
-        for item in st.session_state.menu_workspace:
-            ings = []
-            if item['type'] == 'recipe':
-                ings = db.get_recipe_with_ingredients(item['id']).get('ingredients', [])
-                for ing in ings:
-                    if ing['is_condiment']: condiments.append(ing['name'])
-                    else: core_ings.append(ing['name'])
-            elif item['type'] == 'custom':
-                for ing in item.get('ingredients', []):
-                    core_ings.append(ing)
-        
-        core_ings = sorted(list(set(core_ings)))
-        condiments = sorted(list(set(condiments)))
+        core_ings = analysis.core_ingredients
+        condiments = analysis.condiments
+        headcount = st.number_input("用餐人數", min_value=1, max_value=1000, value=st.session_state.headcount,
+                                    help="依食譜份數換算每樣食材的採購量")
+        st.session_state.headcount = headcount
+        recipe_ids = [item['id'] for item in st.session_state.menu_workspace if item['type'] == 'recipe']
+        amounts = purchase_amounts([(rid, headcount) for rid in recipe_ids])
+        label = lambda name: f"{name} {amounts[name]}" if name in amounts else name
         
         c1, c2 = st.columns(2)
         with c1:
             st.write("**核心食材**")
-            for i in core_ings: st.write(f"• {i}")
+            for i in core_ings: st.write(f"• {label(i)}")
         
         with c2:
             st.write("**調味品檢查**")
@@ -530,11 +637,80 @@ def show_shopping_list_generator():
             
         final = core_ings + st.session_state.miss_conds
         if final:
-            txt = "\n".join([f"- {i}" for i in final])
+            txt = "\n".join([f"- {label(i)}" for i in final])
             st.code(txt, language="text")
 
+def purchase_amounts(dishes):
+    """(食譜 id, 人數) -> 食材名稱: 採購量文字；沒有填用量的食材不列入"""
+    amounts = {}
+    for row in cached('get_purchase_totals', dishes):
+        if row['unit']:
+            text = format_amount(row['amount'], row['unit'])
+            amounts[row['name']] = f"{amounts[row['name']]} + {text}" if row['name'] in amounts else text
+    return amounts
+
+def build_multi_day_list(plan, guests, include_ws):
+    """彙總多日採購清單：查詢結果逐列寫入文字清單與 CSV (各查詢一次)，不建立整份結果的 list"""
+    if include_ws and st.session_state.menu_workspace:
+        # 今日菜單要先寫入資料庫，才能和套餐一起在 SQL 中彙總
+        persist_workspace()
+        workspace_writer().flush()
+        plan = plan + [("第1天", 'workspace', workspace_session_id())]
+
+    dishes = []
+    for _, kind, ref in plan:
+        if kind == 'menu_set':
+            dishes += [(r['id'], guests) for r in cached('get_menu_set_with_recipes', ref)['recipes']]
+        elif kind == 'workspace':
+            dishes += [(item['id'], guests) for item in st.session_state.menu_workspace if item['type'] == 'recipe']
+
+    text, data = io.StringIO(), io.StringIO()
+    count = write_text(db.iter_shopping_list(plan), text)
+    write_csv(db.iter_shopping_list(plan), data)
+    return {'amounts': purchase_amounts(dishes), 'count': count, 'text': text.getvalue(),
+            'csv': data.getvalue().encode('utf-8-sig')}
+
+def show_multi_day_shopping_panel():
+    with st.expander("📅 多日採購清單", expanded=False):
+        sets = cached('get_all_menu_sets')
+        set_names = {s['id']: s['name'] for s in sets}
+        days = st.number_input("天數", min_value=1, max_value=14, value=1, key="md_days")
+        guests = st.number_input("每餐人數", min_value=1, max_value=1000, value=st.session_state.headcount)
+        include_ws = st.checkbox("第 1 天包含今日菜單", value=True, key="md_include_ws")
+
+        plan = []
+        for d in range(int(days)):
+            picked = st.multiselect(f"第 {d + 1} 天的套餐", list(set_names), format_func=set_names.get,
+                                    key=f"md_day_{d}")
+            plan += [(f"第{d + 1}天", 'menu_set', sid) for sid in picked]
+        include_ws = include_ws and bool(st.session_state.menu_workspace)
+
+        if not plan and not include_ws:
+            st.caption("選擇套餐後即可產生清單")
+            return
+
+        # 展開區塊的內容每次重新執行都會跑：只有按下按鈕才寫入今日菜單並查詢，條件改變後舊清單不再顯示
+        key = _workspace_snapshot([plan, guests, st.session_state.menu_workspace if include_ws else []])
+        if st.button("彙總多日清單", key="md_build", use_container_width=True):
+            st.session_state.md_result = {'key': key, **build_multi_day_list(plan, guests, include_ws)}
+        result = st.session_state.get('md_result')
+        if result is None or result['key'] != key:
+            return
+
+        if result['amounts']:
+            st.write("**採購量**")
+            st.code("\n".join(f"- {name} {text}" for name, text in result['amounts'].items()), language="text")
+        st.caption(f"共 {result['count']} 項食材")
+        st.code(result['text'], language="text")
+        st.download_button("下載 CSV", result['csv'], file_name="shopping_list.csv",
+                           mime="text/csv", use_container_width=True)
+
 def main():
+    # 專業 UI 套件：每個頁面的導航都會用到，但只在真正繪製畫面時載入，
+    # 單純 import app (測試、基準測試取用輔助函式) 不需要付出這筆成本
+    import streamlit_antd_components as sac
     inject_custom_css()
+    load_workspace()
     
     st.markdown("<h1>植感飲食</h1>", unsafe_allow_html=True)
     
@@ -557,5 +733,25 @@ def main():
     elif pg == "食譜": show_recipes_page()
     elif pg == "菜單": show_menu_workspace_page()
 
+    # 頁面中途 st.rerun() 時不會執行到這裡，變動會在下一次執行時寫入
+    persist_workspace()
+
+def show_query_debug_panel(query_log):
+    """查詢追蹤開啟時 (VEGE_DB_INSTRUMENT=1)，在側邊欄列出本次重新執行的所有查詢"""
+    import pandas as pd
+    with st.sidebar.expander(f"🐞 資料庫查詢 ({len(query_log)})", expanded=False):
+        summary = query_log.summary()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("查詢", summary['queries'])
+        c2.metric("耗時 (ms)", f"{summary['ms']:.1f}")
+        c3.metric("慢查詢", summary['slow'])
+        if query_log.records:
+            st.dataframe(pd.DataFrame(summary['by_caller']), hide_index=True, use_container_width=True)
+            st.dataframe(pd.DataFrame([r.to_dict() for r in query_log.records]),
+                         hide_index=True, use_container_width=True)
+
 if __name__ == "__main__":
-    main()
+    with db.query_log() as query_log:
+        main()
+    if query_log is not None:
+        show_query_debug_panel(query_log)
@@ -0,0 +1,181 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from db_manager import DatabaseManager
+
+DEFAULT_WORKERS = 8
+# iter_shopping_list 每次交回事件迴圈的列數，以及最多預先讀好的批數
+SHOPPING_BATCH_ROWS = 256
+SHOPPING_QUEUE_BATCHES = 4
+
+# 讀取方法：同時間以相同參數呼叫時只執行一次查詢
+READ_METHODS = (
+    'get_all_ingredients', 'get_ingredient_by_id', 'get_ingredient_by_name', 'get_ingredients_by_category',
+    'search_ingredients',
+    'get_all_recipes', 'get_recipes_by_category', 'get_recipe_page', 'search_recipes', 'get_recipe_by_id',
+    'get_recipe_with_ingredients', 'get_recipes_with_ingredients',
+    'rank_recipes_by_pantry', 'get_recipe_matrix',
+    'get_quantity_table', 'get_purchase_totals',
+    'get_all_menu_sets', 'get_menu_set_with_recipes',
+    'get_all_menu_items', 'get_menu_item_with_details',
+    'load_workspace',
+)
+
+# 寫入方法：每次呼叫都執行，且之後的讀取不會併入寫入前就開始的查詢
+WRITE_METHODS = (
+    'add_ingredient', 'update_ingredient', 'delete_ingredient',
+    'add_recipe', 'update_recipe', 'delete_recipe',
+    'add_ingredient_to_recipe', 'remove_ingredient_from_recipe', 'set_recipe_ingredients',
+    'add_menu_set', 'set_menu_set_recipes', 'delete_menu_set',
+    'add_menu_item', 'update_menu_item', 'delete_menu_item',
+    'save_workspaces',
+)
+
+# 不涉及資料庫的方法，直接在事件迴圈上回傳
+CONSTANT_METHODS = ('get_categories', 'get_recipe_categories', 'get_five_colors', 'get_natures')
+
+def _freeze(value):
+    """把參數轉成可雜湊的形式，作為合併查詢的鍵"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+class AsyncDatabaseManager:
+    """
+    DatabaseManager 的非同步版本：方法名稱與參數相同，但都是 awaitable。
+
+    查詢在固定大小的執行緒池中執行，每次查詢從連線池取用一條 SQLite 連線，
+    不會阻塞事件迴圈。同時以相同參數發出的讀取會合併成一次查詢 (single-flight)，
+    所有等待者拿到同一份結果，請當作唯讀資料使用。
+    """
+
+    def __init__(self, db: Optional[DatabaseManager] = None, db_path: str = "vegetarian_diet.db",
+                 max_workers: int = DEFAULT_WORKERS):
+        """
+        Args:
+            db: 既有的 DatabaseManager (需以 use_pool=True 建立)；未提供時依 db_path 建立
+            max_workers: 執行緒池大小，也是同時進行的查詢與資料庫連線數上限
+        """
+        self._owns_db = db is None
+        self.db = db or DatabaseManager(db_path, use_pool=True)
+        if self.db.pool is None:
+            raise ValueError("AsyncDatabaseManager 需要連線池模式的 DatabaseManager (use_pool=True)")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        # 每次寫入遞增；讀取的合併鍵包含此值，寫入後的讀取不會拿到寫入前開始的查詢結果
+        self._write_generation = 0
+
+    def _submit(self, name: str, args, kwargs) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, functools.partial(getattr(self.db, name), *args, **kwargs))
+
+    async def _read(self, name: str, *args, **kwargs):
+        key = (name, self._write_generation, _freeze(args), _freeze(kwargs))
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._submit(name, args, kwargs)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _, key=key: self._inflight.pop(key, None))
+        # shield：某個等待者被取消時，不影響其他等待同一查詢的呼叫者
+        return await asyncio.shield(future)
+
+    async def _write(self, name: str, *args, **kwargs):
+        self._write_generation += 1
+        try:
+            return await self._submit(name, args, kwargs)
+        finally:
+            self._write_generation += 1
+
+    def change_token(self):
+        return self.db.change_token()
+
+    async def iter_shopping_list(self, plan: List[Tuple[str, str, object]],
+                                 batch_rows: int = SHOPPING_BATCH_ROWS) -> AsyncIterator[Dict]:
+        """
+        非同步版本的 DatabaseManager.iter_shopping_list (async for)：整個查詢在同一條工作執行緒中逐列讀取
+        (連線不跨執行緒)，每 batch_rows 列交回事件迴圈一次；最多預先讀好 SHOPPING_QUEUE_BATCHES 批，
+        不會把整份結果載入記憶體。提早結束迭代時查詢也隨之停止。
+        """
+        loop = asyncio.get_running_loop()
+        batches: asyncio.Queue = asyncio.Queue(maxsize=SHOPPING_QUEUE_BATCHES)
+        stop = threading.Event()
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(batches.put(item), loop).result()
+
+        def produce():
+            rows = self.db.iter_shopping_list(plan)
+            try:
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) >= batch_rows:
+                        put(batch)
+                        batch = []
+                        if stop.is_set():
+                            return
+                put(batch)
+                put(None)
+            except Exception as e:
+                put(e)
+            finally:
+                rows.close()
+
+        producer = loop.run_in_executor(self._executor, produce)
+        try:
+            while True:
+                batch = await batches.get()
+                if batch is None:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                for row in batch:
+                    yield row
+        finally:
+            # 讓等著放入下一批的工作執行緒結束 (關閉產生器並歸還連線)
+            stop.set()
+            while not producer.done():
+                while not batches.empty():
+                    batches.get_nowait()
+                await asyncio.wait([producer], timeout=0.01)
+
+    async def gather(self, *calls):
+        """同時等待多個查詢，例如 await adb.gather(adb.get_recipe_by_id(1), adb.get_recipe_by_id(2))"""
+        return await asyncio.gather(*calls)
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+        if self._owns_db:
+            self.db.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+def _delegate(name: str, kind: str):
+    if kind == 'read':
+        async def method(self, *args, **kwargs):
+            return await self._read(name, *args, **kwargs)
+    elif kind == 'write':
+        async def method(self, *args, **kwargs):
+            return await self._write(name, *args, **kwargs)
+    else:
+        async def method(self, *args, **kwargs):
+            return getattr(self.db, name)(*args, **kwargs)
+    method.__name__ = method.__qualname__ = name
+    method.__doc__ = f"非同步版本的 DatabaseManager.{name}"
+    return method
+
+for _kind, _names in (('read', READ_METHODS), ('write', WRITE_METHODS), ('constant', CONSTANT_METHODS)):
+    for _name in _names:
+        setattr(AsyncDatabaseManager, _name, _delegate(_name, _kind))
@@ -0,0 +1,590 @@
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import db_manager
+from db_manager import DatabaseManager
+from catalog_snapshot import build_snapshot, install_snapshot
+from import_all import import_all
+from import_recipes import import_recipes
+from import_set_menus import import_set_menus
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(ROOT, 'app.py')
+SOURCE_CSVS = {
+    'ingredients': os.path.join(ROOT, 'ingredients.csv'),
+    'recipes': os.path.join(ROOT, 'recipes.csv'),
+    'set_menus': os.path.join(ROOT, 'set_menus.csv'),
+}
+
+DEFAULT_SCALES = (10, 100, 1000)
+RESULTS_PATH = 'benchmark_results.json'
+BASELINE_PATH = 'benchmark_baseline.json'
+# 中位數比基準慢超過這個倍數就視為退步
+DEFAULT_THRESHOLD = 1.25
+# 差距小於此秒數的項目不列為退步 (次毫秒級的量測雜訊很大)
+NOISE_FLOOR = 0.001
+# 出貨資料下今日菜單的份量：6 道食譜 + 2 道自訂菜色，隨倍數等比放大
+WORKSPACE_RECIPES = 6
+WORKSPACE_CUSTOM = 2
+
+# --- 1. 資料產生器 ---
+
+def _read_csv(path: str) -> List[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+def _write_csv(path: str, fieldnames, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def _replica_name(name: str, replica: int) -> str:
+    return name if replica == 0 else f"{name} #{replica + 1}"
+
+def generate_csvs(scale: int, out_dir: str, seed: int = 0) -> Dict[str, str]:
+    """
+    以出貨的三個 CSV 為樣本，產生 scale 倍大小的資料集 (同樣的 seed 產生同樣的檔案)
+
+    每筆食材、食譜、套餐複製 scale 份，名稱加上編號；分類、五色、食性沿用原值，
+    因此一定符合資料表的 CHECK 限制。食譜的每樣食材、套餐的每道食譜則隨機對應到某一份複本。
+
+    Returns:
+        Dict[str, str]: 'ingredients' / 'recipes' / 'set_menus' -> 產生的 CSV 路徑
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {kind: os.path.join(out_dir, os.path.basename(src)) for kind, src in SOURCE_CSVS.items()}
+
+    ingredients = _read_csv(SOURCE_CSVS['ingredients'])
+    _write_csv(paths['ingredients'], list(ingredients[0].keys()),
+               ({**row, 'name': _replica_name(row['name'], r)} for r in range(scale) for row in ingredients))
+
+    recipes = _read_csv(SOURCE_CSVS['recipes'])
+    rows = []
+    for r in range(scale):
+        for row in recipes:
+            # 食材可附上用量 (名稱:300g)，只替換名稱部分
+            tokens = [t.strip().partition(':') for t in row['ingredients'].split('|') if t.strip()]
+            rows.append({**row, 'name': _replica_name(row['name'], r),
+                         'ingredients': '|'.join(_replica_name(n.strip(), rng.randrange(scale)) + sep + amount
+                                                 for n, sep, amount in tokens)})
+    _write_csv(paths['recipes'], list(recipes[0].keys()), rows)
+
+    set_menus = _read_csv(SOURCE_CSVS['set_menus'])
+    rows = []
+    for r in range(scale):
+        for row in set_menus:
+            names = [n.strip() for n in row['recipes'].split('|') if n.strip()]
+            rows.append({**row, 'name': _replica_name(row['name'], r),
+                         'recipes': '|'.join(_replica_name(n, rng.randrange(scale)) for n in names)})
+    _write_csv(paths['set_menus'], list(set_menus[0].keys()), rows)
+
+    return paths
+
+def build_workspace(manager: DatabaseManager, scale: int, seed: int = 0) -> List[Dict]:
+    """產生今日菜單 (session_state.menu_workspace 的格式)，大小隨倍數放大"""
+    rng = random.Random(seed)
+    recipes = manager.get_all_recipes()
+    picked = rng.sample(recipes, min(len(recipes), WORKSPACE_RECIPES * scale))
+    workspace = [{'type': 'recipe', 'id': r['id'], 'name': r['name'], 'category': r['category'],
+                  'description': r['description']} for r in picked]
+
+    ingredient_ids = [ing.id for ing in manager.catalog.all()]
+    for i in range(WORKSPACE_CUSTOM * scale):
+        workspace.append({'type': 'custom', 'name': f"自訂菜色 {i + 1}",
+                          'ingredients': rng.sample(ingredient_ids, min(4, len(ingredient_ids))),
+                          'category': '自訂'})
+    return workspace
+
+# --- 2. 計時 ---
+
+class Case:
+    """
+    一個計時項目：每輪先執行 setup (不計時)，再計時 func，最後執行 teardown (不計時)
+
+    Args:
+        func: func(ctx, arg)，arg 為 setup 的回傳值
+        setup: setup(ctx) -> arg
+        teardown: teardown(ctx, arg, result)
+    """
+
+    def __init__(self, group: str, name: str, func: Callable, setup: Optional[Callable] = None,
+                 teardown: Optional[Callable] = None, repeat: Optional[int] = None):
+        self.group = group
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.teardown = teardown
+        self.repeat = repeat
+
+def time_case(case: Case, ctx, repeat: int) -> Dict:
+    timings = []
+    for _ in range(case.repeat or repeat):
+        arg = case.setup(ctx) if case.setup else None
+        start = time.perf_counter()
+        result = case.func(ctx, arg)
+        timings.append(time.perf_counter() - start)
+        if case.teardown:
+            case.teardown(ctx, arg, result)
+    return {
+        'scale': ctx.scale,
+        'group': case.group,
+        'name': case.name,
+        'runs': len(timings),
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+    }
+
+class BenchContext:
+    """單一倍數的資料集：資料庫、CSV、代表性的 id 與名稱"""
+
+    def __init__(self, scale: int, work_dir: str, seed: int):
+        self.scale = scale
+        self.work_dir = work_dir
+        self.seed = seed
+        self.db_path = os.path.join(work_dir, 'vegetarian_diet.db')
+        self.csvs: Dict[str, str] = {}
+        self.db: Optional[DatabaseManager] = None
+        self.replica_db: Optional[DatabaseManager] = None
+        self._names = itertools.count(1)
+
+    def unique_name(self, prefix: str) -> str:
+        return f"{prefix} {next(self._names)}"
+
+    def scratch_copy(self, name: str) -> str:
+        """會破壞資料的項目在資料庫副本上執行"""
+        path = os.path.join(self.work_dir, name)
+        self.db.close()
+        shutil.copyfile(self.db_path, path)
+        return path
+
+    def open(self):
+        self.close()  # 重新開啟前先關閉前一次的連線 (含記憶體副本)
+        self.db = DatabaseManager(self.db_path, use_pool=True)
+        db = self.db
+        ingredient = db.get_all_ingredients()[len(db.catalog) // 2]
+        self.ingredient = ingredient
+        recipes = db.get_all_recipes()
+        self.recipe = recipes[len(recipes) // 2]
+        self.menu_set_id = db.get_all_menu_sets()[0]['id']
+        self.workspace = build_workspace(db, self.scale, self.seed)
+        self.workspace_ids = sorted({item['id'] for item in self.workspace if item['type'] == 'recipe'})
+        rng = random.Random(self.seed)
+        self.pantry_ids = [ing.id for ing in rng.sample(db.catalog.all(), min(len(db.catalog), 8))]
+        self.menu_item_id = db.add_menu_item(self.recipe['id'], "", json.dumps(self.pantry_ids[:3]))
+        self.replica_db = DatabaseManager(self.db_path, use_pool=True, replica=True)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+        if self.replica_db is not None:
+            self.replica_db.close()
+            self.replica_db = None
+
+def _fresh_db(ctx):
+    # 全新的 DatabaseManager：衍生索引與矩陣都尚未建立，用來量測冷啟動
+    return DatabaseManager(ctx.db_path, use_pool=True)
+
+def _close_fresh(ctx, fresh, result):
+    fresh.close()
+
+def db_cases() -> List[Case]:
+    """DatabaseManager 每個公開方法的計時項目"""
+    def case(name, func, **kwargs):
+        return Case('db', name, func, **kwargs)
+
+    def ing(ctx):
+        i = ctx.ingredient
+        return i['id'], i['name'], i['category'], i['five_color'], i['nature'], i['effects'], bool(i['is_condiment'])
+
+    def add_bench_ingredient(ctx, arg=None):
+        return ctx.db.add_ingredient(ctx.unique_name('bench食材'), '其他', '白', '平')
+
+    def add_bench_recipe(ctx, arg=None):
+        return ctx.db.add_recipe(ctx.unique_name('bench食譜'), '主菜', '')
+
+    def add_bench_set(ctx, arg=None):
+        return ctx.db.add_menu_set(ctx.unique_name('bench套餐'), '')
+
+    return [
+        case('__init__', lambda ctx, _: DatabaseManager(ctx.db_path, use_pool=True),
+             teardown=lambda ctx, arg, fresh: fresh.close()),
+        case('change_token', lambda ctx, _: ctx.db.change_token()),
+        case('init_database', lambda ctx, _: ctx.db.init_database()),
+        case('init_fts', lambda ctx, _: ctx.db.init_fts()),
+        case('migrate', lambda ctx, _: ctx.db.migrate()),
+
+        # 食材
+        case('get_all_ingredients', lambda ctx, _: ctx.db.get_all_ingredients()),
+        case('get_all_ingredients (cold)', lambda ctx, fresh: fresh.get_all_ingredients(),
+             setup=_fresh_db, teardown=_close_fresh),
+        case('get_ingredient_by_id', lambda ctx, _: ctx.db.get_ingredient_by_id(ctx.ingredient['id'])),
+        case('get_ingredient_by_name', lambda ctx, _: ctx.db.get_ingredient_by_name(ctx.ingredient['name'])),
+        case('get_ingredients_by_category',
+             lambda ctx, _: ctx.db.get_ingredients_by_category(ctx.ingredient['category'])),
+        case('search_ingredients (fts)', lambda ctx, _: ctx.db.search_ingredients('清熱解毒')),
+        case('search_ingredients (like)', lambda ctx, _: ctx.db.search_ingredients('豆腐')),
+        case('add_ingredient', add_bench_ingredient,
+             teardown=lambda ctx, arg, new_id: ctx.db.delete_ingredient(new_id)),
+        case('update_ingredient', lambda ctx, _: ctx.db.update_ingredient(*ing(ctx))),
+        case('delete_ingredient', lambda ctx, new_id: ctx.db.delete_ingredient(new_id),
+             setup=add_bench_ingredient),
+
+        # 食譜
+        case('get_all_recipes', lambda ctx, _: ctx.db.get_all_recipes()),
+        case('get_recipe_page (first)', lambda ctx, _: ctx.db.get_recipe_page()),
+        case('get_recipe_page (keyset)', lambda ctx, _: ctx.db.get_recipe_page(
+            None, (ctx.recipe['category'], ctx.recipe['name'], ctx.recipe['id']))),
+        case('search_recipes (fts)', lambda ctx, _: ctx.db.search_recipes('義大利')),
+        case('search_recipes (like)', lambda ctx, _: ctx.db.search_recipes('豆腐')),
+        case('get_recipe_by_id', lambda ctx, _: ctx.db.get_recipe_by_id(ctx.recipe['id'])),
+        case('get_recipe_with_ingredients', lambda ctx, _: ctx.db.get_recipe_with_ingredients(ctx.recipe['id'])),
+        case('get_recipes_with_ingredients (all)', lambda ctx, _: ctx.db.get_recipes_with_ingredients()),
+        case('get_recipes_with_ingredients (workspace)',
+             lambda ctx, _: ctx.db.get_recipes_with_ingredients(ctx.workspace_ids)),
+        case('get_recipe_with_ingredients (replica)',
+             lambda ctx, _: ctx.replica_db.get_recipe_with_ingredients(ctx.recipe['id'])),
+        case('get_recipes_with_ingredients (replica, workspace)',
+             lambda ctx, _: ctx.replica_db.get_recipes_with_ingredients(ctx.workspace_ids)),
+        case('add_recipe', add_bench_recipe, teardown=lambda ctx, arg, new_id: ctx.db.delete_recipe(new_id)),
+        case('update_recipe', lambda ctx, _: ctx.db.update_recipe(
+            ctx.recipe['id'], ctx.recipe['name'], ctx.recipe['category'], ctx.recipe['description'])),
+        case('delete_recipe', lambda ctx, new_id: ctx.db.delete_recipe(new_id), setup=add_bench_recipe),
+        case('add_ingredient_to_recipe',
+             lambda ctx, _: ctx.db.add_ingredient_to_recipe(ctx.recipe['id'], ctx.pantry_ids[0]),
+             teardown=lambda ctx, arg, result: ctx.db.remove_ingredient_from_recipe(
+                 ctx.recipe['id'], ctx.pantry_ids[0])),
+        case('remove_ingredient_from_recipe',
+             lambda ctx, _: ctx.db.remove_ingredient_from_recipe(ctx.recipe['id'], ctx.pantry_ids[0])),
+        case('set_recipe_ingredients', lambda ctx, _: ctx.db.set_recipe_ingredients(
+            ctx.recipe['id'], [i['id'] for i in ctx.db.get_recipe_with_ingredients(ctx.recipe['id'])['ingredients']])),
+
+        # 衍生索引 (warm 為快取命中，cold 為新的管理器第一次建立)
+        case('rank_recipes_by_pantry', lambda ctx, _: ctx.db.rank_recipes_by_pantry(ctx.pantry_ids)),
+        case('get_recipe_matrix', lambda ctx, _: ctx.db.get_recipe_matrix()),
+        case('get_recipe_matrix (cold)', lambda ctx, fresh: fresh.get_recipe_matrix(),
+             setup=_fresh_db, teardown=_close_fresh),
+        case('get_quantity_table (cold)', lambda ctx, fresh: fresh.get_quantity_table(),
+             setup=_fresh_db, teardown=_close_fresh),
+        case('get_purchase_totals (500 人)',
+             lambda ctx, _: ctx.db.get_purchase_totals([(rid, 500) for rid in ctx.workspace_ids])),
+
+        # 採購清單
+        case('iter_shopping_list', lambda ctx, _: list(ctx.db.iter_shopping_list(
+            [('d1', 'menu_set', ctx.menu_set_id), ('d2', 'menu_set', ctx.menu_set_id)]
+            + [('d1', 'recipe', rid) for rid in ctx.workspace_ids]))),
+
+        # 套餐
+        case('get_all_menu_sets', lambda ctx, _: ctx.db.get_all_menu_sets()),
+        case('get_menu_set_with_recipes', lambda ctx, _: ctx.db.get_menu_set_with_recipes(ctx.menu_set_id)),
+        case('add_menu_set', add_bench_set, teardown=lambda ctx, arg, new_id: ctx.db.delete_menu_set(new_id)),
+        case('set_menu_set_recipes', lambda ctx, new_id: ctx.db.set_menu_set_recipes(new_id, ctx.workspace_ids),
+             setup=add_bench_set, teardown=lambda ctx, new_id, result: ctx.db.delete_menu_set(new_id)),
+        case('delete_menu_set', lambda ctx, new_id: ctx.db.delete_menu_set(new_id), setup=add_bench_set),
+
+        # 今日菜單
+        case('add_menu_item', lambda ctx, _: ctx.db.add_menu_item(ctx.recipe['id']),
+             teardown=lambda ctx, arg, new_id: ctx.db.delete_menu_item(new_id)),
+        case('get_all_menu_items', lambda ctx, _: ctx.db.get_all_menu_items()),
+        case('get_menu_item_with_details', lambda ctx, _: ctx.db.get_menu_item_with_details(ctx.menu_item_id)),
+        case('update_menu_item', lambda ctx, _: ctx.db.update_menu_item(
+            ctx.menu_item_id, ctx.recipe['id'], "", json.dumps(ctx.pantry_ids[:3]))),
+        case('delete_menu_item', lambda ctx, new_id: ctx.db.delete_menu_item(new_id),
+             setup=lambda ctx: ctx.db.add_menu_item(ctx.recipe['id'])),
+
+        # 列舉值
+        case('get_categories', lambda ctx, _: ctx.db.get_categories()),
+        case('get_recipe_categories', lambda ctx, _: ctx.db.get_recipe_categories()),
+        case('get_five_colors', lambda ctx, _: ctx.db.get_five_colors()),
+        case('get_natures', lambda ctx, _: ctx.db.get_natures()),
+    ]
+
+def _quiet(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+def run_importers(ctx, repeat: int) -> List[Dict]:
+    """匯入工具：整批重建 (同時建立本倍數的資料庫)、兩個增量匯入與食材 CSV 匯入"""
+    csvs = ctx.csvs
+
+    def open_snapshot(c, _):
+        manager = DatabaseManager(snapshot, use_pool=True, read_only=True)
+        manager.get_all_recipes()
+        return manager
+
+    cases = [
+        Case('import', 'import_all', lambda c, _: _quiet(
+            import_all, c.db_path, csvs['ingredients'], csvs['recipes'], csvs['set_menus'])),
+        Case('import', 'import_all (dry run)', lambda c, _: _quiet(
+            import_all, c.db_path, csvs['ingredients'], csvs['recipes'], csvs['set_menus'], dry_run=True)),
+        Case('import', 'import_recipes (unchanged)',
+             lambda c, _: _quiet(import_recipes, c.db_path, csvs['recipes'])),
+        Case('import', 'import_recipes (force)',
+             lambda c, _: _quiet(import_recipes, c.db_path, csvs['recipes'], force=True)),
+        Case('import', 'import_set_menus (unchanged)',
+             lambda c, _: _quiet(import_set_menus, c.db_path, csvs['set_menus'])),
+        Case('import', 'import_set_menus (force)',
+             lambda c, _: _quiet(import_set_menus, c.db_path, csvs['set_menus'], force=True)),
+        # 冷啟動的另一條路：預先編譯快照，新節點只需複製檔案
+        Case('import', 'build_snapshot', lambda c, _: build_snapshot(
+            snapshot, csvs['ingredients'], csvs['recipes'], csvs['set_menus'])),
+        Case('import', 'install_snapshot', lambda c, _: install_snapshot(snapshot, installed, force=True)),
+        Case('import', 'open snapshot (read-only)', open_snapshot, teardown=lambda c, arg, manager: manager.close()),
+    ]
+    snapshot = os.path.join(ctx.work_dir, 'catalog_snapshot.db')
+    installed = os.path.join(ctx.work_dir, 'installed.db')
+    return [time_case(case, ctx, repeat) for case in cases]
+
+def run_ingredient_csv_import(ctx, repeat: int) -> Dict:
+    # import_csv 會清空食材表 (連帶刪除食譜關聯)，並透過模組層級的 db 寫入，因此在副本上執行
+    import import_csv
+
+    scratch_path = ctx.scratch_copy('import_csv.db')
+    scratch = DatabaseManager(scratch_path, use_pool=True)
+    original = import_csv.db
+    import_csv.db = scratch
+    try:
+        case = Case('import', 'import_ingredients_from_csv',
+                    lambda c, _: _quiet(import_csv.import_ingredients_from_csv, c.csvs['ingredients']))
+        return time_case(case, ctx, repeat)
+    finally:
+        import_csv.db = original
+        scratch.close()
+
+# --- 3. 頁面 (streamlit.testing.v1.AppTest) ---
+
+def page_scenarios(ctx) -> List[tuple]:
+    """(名稱, 初始 session_state)；名稱列出此情境會執行到的 show_* 函數"""
+    menu = {'main_nav': '菜單', 'menu_workspace': ctx.workspace}
+    return [
+        ('show_ingredients_page', {'main_nav': '食材'}),
+        ('show_ingredients_page (search)', {'main_nav': '食材', 'search_keyword': '清熱解毒'}),
+        ('show_recipes_page', {'main_nav': '食譜'}),
+        ('show_recipes_page (search)', {'main_nav': '食譜', 'recipe_search': '義大利'}),
+        ('show_free_style_panel + workspace', {**menu, 'menu_sub_nav': '自由配'}),
+        ('show_quick_template_panel + workspace', {**menu, 'menu_sub_nav': '快速樣板'}),
+        ('show_set_menu_panel + workspace', {**menu, 'menu_sub_nav': '經典套餐'}),
+        ('show_pantry_panel + workspace', {**menu, 'menu_sub_nav': '冰箱配', 'pantry_sel': ctx.pantry_ids}),
+        ('show_shopping_list_generator', {**menu, 'menu_sub_nav': '自由配', 'show_shop_list': True}),
+    ]
+
+# 啟動成本：在全新的直譯器中執行，量測 import 與第一次查詢 (包含直譯器本身的啟動時間，可與 python 對照)
+STARTUP_SNIPPETS = (
+    ('python', 'pass'),
+    ('import db_manager', 'import db_manager'),
+    ('db_manager first query', 'from db_manager import db; db.get_all_recipes()'),
+    ('import import_all', 'import import_all'),
+    ('import app', 'import app'),
+)
+
+def run_startup(ctx, repeat: int) -> List[Dict]:
+    """每次都啟動新的 Python 行程，工作目錄為本倍數的資料庫所在處"""
+    env = {**os.environ, 'PYTHONPATH': ROOT + os.pathsep + os.environ.get('PYTHONPATH', '')}
+
+    def spawn(code):
+        def run(c, _):
+            subprocess.run([sys.executable, '-c', code], cwd=c.work_dir, env=env, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return run
+
+    return [time_case(Case('startup', name, spawn(code)), ctx, repeat) for name, code in STARTUP_SNIPPETS]
+
+def run_pages(ctx, repeat: int, timeout: float) -> List[Dict]:
+    """
+    以 AppTest 無頭執行 app.py 的各個頁面。cold 為清空 st.cache_data 後的執行，
+    warm 為快取已由前一次執行填好時的執行。
+    """
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    # app.py 每次執行都會重新 `from db_manager import db`，把全域實例換成本倍數的資料庫；
+    # st.cache_resource 裡以舊實例建立的物件 (例如今日菜單的寫入器) 一併清掉
+    original = db_manager.db
+    db_manager.db = ctx.db
+    st.cache_resource.clear()
+    results = []
+    try:
+        for name, state in page_scenarios(ctx):
+            def new_app(c, clear_cache=True, state=state):
+                if clear_cache:
+                    st.cache_data.clear()
+                at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+                for key, value in state.items():
+                    at.session_state[key] = value
+                return at
+
+            def run_app(c, at, name=name):
+                at.run()
+                if at.exception:
+                    raise RuntimeError(f"{name}: {at.exception[0].message}")
+                return at
+
+            results.append(time_case(Case('page', f"{name} (cold)", run_app, setup=new_app), ctx, repeat))
+            results.append(time_case(Case('page', f"{name} (warm)", run_app,
+                                          setup=lambda c: new_app(c, clear_cache=False)), ctx, repeat))
+    finally:
+        db_manager.db = original
+        st.cache_data.clear()
+        st.cache_resource.clear()
+    return results
+
+# --- 4. 結果與基準比較 ---
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float) -> List[Dict]:
+    """
+    以中位數比較本次結果與基準
+
+    Returns:
+        List[Dict]: 每個兩邊都有的項目，含 ratio (本次 / 基準) 與 regressed
+    """
+    base = {(r['scale'], r['group'], r['name']): r for r in baseline}
+    rows = []
+    for r in results:
+        b = base.get((r['scale'], r['group'], r['name']))
+        if not b or not b['median']:
+            continue
+        ratio = r['median'] / b['median']
+        rows.append({'scale': r['scale'], 'group': r['group'], 'name': r['name'],
+                     'baseline': b['median'], 'median': r['median'], 'ratio': ratio,
+                     'regressed': ratio > threshold and r['median'] - b['median'] > NOISE_FLOOR})
+    return rows
+
+def _fmt(seconds: float) -> str:
+    return f"{seconds * 1000:10.2f} ms"
+
+def print_result(r: Dict):
+    print(f"  [{r['scale']:>4}×] {r['group']:<7} {r['name']:<45} median {_fmt(r['median'])}  min {_fmt(r['min'])}")
+
+def print_comparison(rows: List[Dict], threshold: float):
+    regressed = [r for r in rows if r['regressed']]
+    print(f"\n=== 與基準比較 ({len(rows)} 項，門檻 {threshold:.2f}×) ===")
+    for r in sorted(rows, key=lambda r: -r['ratio'])[:15]:
+        mark = '⚠️' if r['regressed'] else '  '
+        print(f"{mark} [{r['scale']:>4}×] {r['group']:<7} {r['name']:<45} "
+              f"{_fmt(r['baseline'])} -> {_fmt(r['median'])}  ({r['ratio']:.2f}×)")
+    print(f"[{'ERROR' if regressed else 'OK'}] 退步 {len(regressed)} 項")
+
+def run_benchmarks(scales=DEFAULT_SCALES, repeat: int = 5, groups=('import', 'db', 'page', 'startup'),
+                   seed: int = 0, work_dir: Optional[str] = None, keep: bool = False,
+                   page_timeout: float = 600) -> Dict:
+    """
+    依序對每個倍數產生資料、建立資料庫並執行各組計時
+
+    Args:
+        scales: 相對出貨 CSV 的資料倍數
+        repeat: 每個項目執行的次數
+        groups: 要執行的組別 ('import'、'db'、'page'、'startup')
+        seed: 資料產生器與今日菜單的亂數種子
+        work_dir: 產生的 CSV 與資料庫放置處，預設為暫存目錄
+        keep: 保留 work_dir
+
+    Returns:
+        Dict: {'meta': 執行環境, 'results': 每個項目的 min / median / mean (秒)}
+    """
+    root = work_dir or tempfile.mkdtemp(prefix='vege-bench-')
+    results = []
+    try:
+        for scale in scales:
+            print(f"\n=== {scale}× ===")
+            ctx = BenchContext(scale, os.path.join(root, f"x{scale}"), seed)
+            ctx.csvs = generate_csvs(scale, ctx.work_dir, seed)
+
+            if 'import' in groups:
+                scale_results = run_importers(ctx, repeat)
+            else:
+                # 不計時，但仍需要建立資料庫
+                _quiet(import_all, ctx.db_path, ctx.csvs['ingredients'], ctx.csvs['recipes'],
+                       ctx.csvs['set_menus'])
+                scale_results = []
+
+            ctx.open()
+            try:
+                if 'import' in groups:
+                    scale_results.append(run_ingredient_csv_import(ctx, repeat))
+                    ctx.open()
+                if 'db' in groups:
+                    scale_results.extend(time_case(case, ctx, repeat) for case in db_cases())
+                if 'page' in groups:
+                    scale_results.extend(run_pages(ctx, repeat, page_timeout))
+                if 'startup' in groups:
+                    scale_results.extend(run_startup(ctx, repeat))
+            finally:
+                ctx.close()
+
+            for r in scale_results:
+                print_result(r)
+            results.extend(scale_results)
+    finally:
+        if not keep and work_dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    meta = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'scales': list(scales),
+        'repeat': repeat,
+        'seed': seed,
+    }
+    return {'meta': meta, 'results': results}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="以放大的合成資料量測資料庫方法、匯入工具與頁面的效能")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES),
+                        help="相對出貨 CSV 的資料倍數 (預設 10 100 1000)")
+    parser.add_argument('--repeat', type=int, default=5, help="每個項目執行的次數")
+    parser.add_argument('--only', nargs='+', choices=('import', 'db', 'page', 'startup'),
+                        default=['import', 'db', 'page', 'startup'],
+                        help="只執行指定的組別")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=RESULTS_PATH, help="結果 JSON 檔")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="用來比較的基準 JSON 檔")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次結果存為新的基準")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="中位數超過基準幾倍視為退步")
+    parser.add_argument('--workdir', help="保留產生的 CSV 與資料庫於此目錄")
+    parser.add_argument('--page-timeout', type=float, default=600, help="單次頁面執行的逾時秒數")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.scales, args.repeat, tuple(args.only), args.seed,
+                            args.workdir, keep=bool(args.workdir), page_timeout=args.page_timeout)
+
+    exit_code = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(report['results'], baseline['results'], args.threshold)
+        report['comparison'] = {'baseline': args.baseline, 'threshold': args.threshold, 'rows': rows}
+        print_comparison(rows, args.threshold)
+        exit_code = 1 if any(r['regressed'] for r in rows) else 0
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[OK] 結果已寫入 {args.output}")
+
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"[OK] 已存為基準 {args.baseline}")
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import Dict
+
+from db_manager import SCHEMA_VERSION
+from import_all import (INGREDIENTS_CSV, RECIPES_CSV, SET_MENUS_CSV, build_plan, parse_ingredients,
+                        parse_recipes, parse_set_menus, write_plan)
+
+# 目錄快照：把三個 CSV 預先編譯成可直接開啟的 SQLite 檔案，旁邊附上 <快照>.json 清單 (manifest)
+# 新節點冷啟動時只需複製檔案 (install_snapshot)，或以唯讀模式直接開啟 (DatabaseManager(read_only=True))
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_PATH = 'catalog_snapshot.db'
+
+def manifest_path(snapshot_path: str) -> str:
+    return snapshot_path + '.json'
+
+def file_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def build_snapshot(out_path: str = SNAPSHOT_PATH, ingredients_csv: str = INGREDIENTS_CSV,
+                   recipes_csv: str = RECIPES_CSV, set_menus_csv: str = SET_MENUS_CSV) -> Dict:
+    """
+    編譯目錄快照：整批匯入到暫存檔、建立索引與統計資訊、VACUUM 後才換上正式檔名
+
+    Returns:
+        Dict: 快照清單 (格式、結構版本、來源 CSV 摘要、筆數、檔案 SHA-256)
+    """
+    sources = {os.path.basename(p): file_digest(p) for p in (ingredients_csv, recipes_csv, set_menus_csv)}
+    plan = build_plan(parse_ingredients(ingredients_csv), parse_recipes(recipes_csv),
+                      parse_set_menus(set_menus_csv))
+    if plan.invalid_rows:
+        raise ValueError("CSV 有不合法的資料列：\n" + "\n".join(plan.invalid_rows))
+
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    fd, tmp_path = tempfile.mkstemp(suffix='.db', dir=out_dir)
+    os.close(fd)
+    os.remove(tmp_path)
+    try:
+        write_plan(plan, tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            # 單一檔案即完整內容 (不留 -wal)，頁面重新排列緊密，唯讀開啟時也有查詢統計可用
+            conn.execute("PRAGMA journal_mode = DELETE")
+            conn.execute("ANALYZE")
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        os.replace(tmp_path, out_path)
+    finally:
+        for path in (tmp_path, tmp_path + '-wal', tmp_path + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'schema_version': SCHEMA_VERSION,
+        # 內容版本：相同的 CSV 一定編譯出相同的版本號
+        'version': hashlib.sha256(json.dumps(sources, sort_keys=True).encode()).hexdigest()[:16],
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'sources': sources,
+        'counts': {'ingredients': len(plan.ingredients), 'recipes': len(plan.recipes),
+                   'recipe_ingredients': len(plan.recipe_links), 'menu_sets': len(plan.menu_sets)},
+        'size': os.path.getsize(out_path),
+        'sha256': file_digest(out_path),
+    }
+    with open(manifest_path(out_path), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+def verify_snapshot(snapshot_path: str) -> Dict:
+    """確認快照與清單相符 (大小、SHA-256、格式)；不相符時拋出 ValueError"""
+    with open(manifest_path(snapshot_path), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"不支援的快照格式：{manifest.get('format')}")
+    if os.path.getsize(snapshot_path) != manifest['size'] or file_digest(snapshot_path) != manifest['sha256']:
+        raise ValueError(f"快照檔案與清單的 checksum 不符：{snapshot_path}")
+    return manifest
+
+def install_snapshot(snapshot_path: str, db_path: str, force: bool = False) -> Dict:
+    """
+    驗證後把快照複製成可寫入的資料庫檔案；先寫到暫存檔再改名，中斷時不會留下半份檔案。
+    較舊結構版本的快照在 DatabaseManager 開啟時會自動升級。
+
+    Args:
+        force (bool): 目標已存在時仍覆蓋 (今日菜單等使用者資料會一併被取代)
+    """
+    manifest = verify_snapshot(snapshot_path)
+    if os.path.exists(db_path) and not force:
+        raise FileExistsError(f"資料庫已存在：{db_path}")
+    tmp_path = db_path + '.installing'
+    shutil.copyfile(snapshot_path, tmp_path)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    os.replace(tmp_path, db_path)
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="編譯、驗證與安裝目錄快照")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="由 CSV 編譯快照")
+    build.add_argument('--out', default=SNAPSHOT_PATH)
+    build.add_argument('--ingredients', default=INGREDIENTS_CSV)
+    build.add_argument('--recipes', default=RECIPES_CSV)
+    build.add_argument('--set-menus', default=SET_MENUS_CSV)
+
+    verify = sub.add_parser('verify', help="檢查快照的 checksum")
+    verify.add_argument('snapshot', nargs='?', default=SNAPSHOT_PATH)
+
+    install = sub.add_parser('install', help="把快照複製成資料庫檔案")
+    install.add_argument('snapshot', nargs='?', default=SNAPSHOT_PATH)
+    install.add_argument('--db', default='vegetarian_diet.db')
+    install.add_argument('--force', action='store_true', help="覆蓋已存在的資料庫")
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'build':
+            manifest = build_snapshot(args.out, args.ingredients, args.recipes, args.set_menus)
+            print(f"[OK] 已編譯 {args.out} (版本 {manifest['version']}，{manifest['size']} bytes)")
+        elif args.command == 'verify':
+            manifest = verify_snapshot(args.snapshot)
+            print(f"[OK] {args.snapshot} 版本 {manifest['version']}，結構版本 {manifest['schema_version']}")
+        else:
+            manifest = install_snapshot(args.snapshot, args.db, force=args.force)
+            print(f"[OK] 已安裝版本 {manifest['version']} 到 {args.db}")
+    except (ValueError, OSError) as e:
+        print(f"[ERROR] {e}")
+        raise SystemExit(1)
@@ -1,16 +1,1082 @@
+import atexit
+import functools
+import itertools
+import logging
+import os
+import queue
 import sqlite3
 import json
-from typing import List, Dict, Optional, Tuple
+import sys
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Optional, Tuple
+
+# 與資料表 CHECK 限制一致的列舉值
+INGREDIENT_CATEGORIES = ('葉菜類', '根莖類', '菇菌類', '豆製品', '蛋奶類', '五穀雜糧', '水果類', '調味品', '堅果種子類', '藻類', '甜品/點心類', '其他')
+RECIPE_CATEGORIES = ('主食', '主菜', '配菜', '湯品', '甜點/飲料', '醬料/醃料', '高湯/湯底')
+FIVE_COLORS = ('青', '赤', '黃', '白', '黑')
+NATURES = ('寒', '涼', '平', '溫', '熱')
+# 食性分數：熱 2 … 寒 -2 (今日菜單分析、食譜矩陣共用)
+NATURE_SCORES = {'熱': 2, '溫': 1, '平': 0, '涼': -1, '寒': -2}
+
+# 連線池模式下，每條連線建立時只設定一次的 PRAGMA
+POOL_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA cache_size = -20000",  # 負值代表 KiB，約 20MB
+)
+
+# 連線池最多同時開啟的連線數；全部被取用時，新的取用最多等待 POOL_TIMEOUT 秒
+POOL_SIZE = 16
+POOL_TIMEOUT = 30.0
+# 閒置超過此秒數的連線，下次取出前先做一次健康檢查
+POOL_IDLE_CHECK = 60.0
+
+# 唯讀開啟 (例如目錄快照) 時的 PRAGMA：不能切換 journal mode，改以 mmap 直接對應檔案
+READ_ONLY_PRAGMAS = (
+    "PRAGMA query_only = ON",
+    "PRAGMA cache_size = -20000",
+    "PRAGMA mmap_size = 268435456",  # 256MB
+)
+
+# 全文檢索 (FTS5 trigram)：來源表 -> (索引表, 索引欄位)
+FTS_TABLES = {
+    'ingredients': ('ingredients_fts', ('name', 'effects')),
+    'recipes': ('recipes_fts', ('name', 'description')),
+}
+
+# trigram 至少需要 3 個字元才能走索引，較短的關鍵字改用 LIKE (全表掃描)。
+# 最常見的中文關鍵字只有兩個字 (清熱、豆腐)，都走這條路徑；關鍵字中的 % 與 _ 以 like_pattern 跳脫
+FTS_MIN_KEYWORD_LENGTH = 3
+
+def fts_trigger_sql(table: str) -> List[str]:
+    """產生讓 FTS 索引與來源表保持同步的觸發器"""
+    fts, columns = FTS_TABLES[table]
+    cols = ', '.join(columns)
+    new_vals = ', '.join(f'new.{c}' for c in columns)
+    old_vals = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals});
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals});
+            END""",
+    ]
+
+# 各資料表的次要索引 (覆蓋常用的 JOIN 與篩選路徑)；大量匯入時會暫時移除再重建
+SECONDARY_INDEXES = {
+    'ingredients': [
+        ('idx_ingredients_category_name', "CREATE INDEX IF NOT EXISTS idx_ingredients_category_name ON ingredients (category, name)"),
+    ],
+    'recipes': [
+        ('idx_recipes_name', "CREATE INDEX IF NOT EXISTS idx_recipes_name ON recipes (name)"),
+        ('idx_recipes_category_name', "CREATE INDEX IF NOT EXISTS idx_recipes_category_name ON recipes (category, name)"),
+    ],
+    'recipe_ingredients': [
+        # 主鍵 (recipe_id, ingredient_id) 已涵蓋 食譜 -> 食材；這個索引涵蓋反向查詢
+        ('idx_recipe_ingredients_ingredient', "CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient ON recipe_ingredients (ingredient_id, recipe_id)"),
+    ],
+    'menu_sets': [
+        ('idx_menu_sets_name', "CREATE INDEX IF NOT EXISTS idx_menu_sets_name ON menu_sets (name)"),
+    ],
+    'menu_set_items': [
+        ('idx_menu_set_items_set', "CREATE INDEX IF NOT EXISTS idx_menu_set_items_set ON menu_set_items (menu_set_id, recipe_id)"),
+        ('idx_menu_set_items_recipe', "CREATE INDEX IF NOT EXISTS idx_menu_set_items_recipe ON menu_set_items (recipe_id, menu_set_id)"),
+    ],
+}
+
+# 目錄資料表：任何一列變動都會遞增 catalog_version，作為快取鍵 (今日菜單等使用者資料不在此列)
+CATALOG_VERSION_TABLES = ('ingredients', 'recipes', 'recipe_ingredients', 'menu_sets', 'menu_set_items')
+
+def catalog_version_trigger_sql(table: str, counter: str = 'catalog_version') -> List[str]:
+    """產生讓 counter (catalog_version 或 workspace_version) 隨 table 的新增、修改、刪除遞增的觸發器"""
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {event} ON {table} BEGIN
+                UPDATE {counter} SET version = version + 1;
+            END"""
+        for suffix, event in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))
+    ]
+
+def _catalog_version(conn: sqlite3.Connection):
+    conn.execute("CREATE TABLE IF NOT EXISTS catalog_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)")
+    for table in CATALOG_VERSION_TABLES:
+        for trigger in catalog_version_trigger_sql(table):
+            conn.execute(trigger)
+
+def _workspace_version(conn: sqlite3.Connection):
+    # 今日菜單的寫入計數：不影響快取鍵，只用來判斷記憶體副本是否與磁碟一致 (見 MemoryReplica)
+    conn.execute("CREATE TABLE IF NOT EXISTS workspace_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO workspace_version (id, version) VALUES (1, 0)")
+    for trigger in catalog_version_trigger_sql('menu_workspace', 'workspace_version'):
+        conn.execute(trigger)
+
+def add_column(conn: sqlite3.Connection, table: str, column: str, definition: str):
+    """欄位不存在時才新增 (ALTER TABLE 沒有 IF NOT EXISTS)"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in existing:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+# 版本化的結構變更：(版本, 說明, 步驟)。步驟可以是 SQL 字串或接收連線的函數。
+# 開啟資料庫時依序套用 PRAGMA user_version 之後的版本，既有的資料庫檔案不需重新匯入。
+def _workspace_sessions(conn: sqlite3.Connection):
+    add_column(conn, 'menu_workspace', 'session_id', 'TEXT')
+    add_column(conn, 'menu_workspace', 'position', 'INTEGER')
+    add_column(conn, 'menu_workspace', 'category', 'TEXT')
+
+def _ingredient_quantities(conn: sqlite3.Connection):
+    add_column(conn, 'recipe_ingredients', 'quantity', 'REAL')
+    add_column(conn, 'recipe_ingredients', 'unit', 'TEXT')
+    add_column(conn, 'recipes', 'servings', 'INTEGER')
+
+MIGRATIONS = [
+    (1, "次要索引", [ddl for indexes in SECONDARY_INDEXES.values() for _, ddl in indexes]),
+    (2, "今日菜單依工作階段保存", [
+        _workspace_sessions,
+        "CREATE INDEX IF NOT EXISTS idx_menu_workspace_session ON menu_workspace (session_id, position)",
+    ]),
+    (3, "食材用量與食譜份數", [_ingredient_quantities]),
+    (4, "目錄版本", [_catalog_version]),
+    (5, "今日菜單寫入計數", [_workspace_version]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# 食譜瀏覽每頁的筆數
+RECIPE_PAGE_SIZE = 20
+
+# 多日、多菜單採購清單：規劃以 JSON 陣列 [[日期, 種類, 參照], ...] 傳入，
+# 先展開成 (日期, 菜色, 食材) 再依食材 GROUP BY，全部在 SQLite 內完成
+SHOPPING_PLAN_KINDS = ('menu_set', 'recipe', 'workspace')
+SHOPPING_LIST_SQL = """
+    WITH plan(day, kind, ref) AS (
+        SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]'), json_extract(value, '$[2]')
+        FROM json_each(?)
+    ),
+    dishes(day, dish, ingredient_id) AS (
+        SELECT p.day, 'r' || msi.recipe_id, ri.ingredient_id
+        FROM plan p
+        JOIN menu_set_items msi ON p.kind = 'menu_set' AND msi.menu_set_id = p.ref
+        JOIN recipe_ingredients ri ON ri.recipe_id = msi.recipe_id
+        UNION ALL
+        SELECT p.day, 'r' || ri.recipe_id, ri.ingredient_id
+        FROM plan p
+        JOIN recipe_ingredients ri ON p.kind = 'recipe' AND ri.recipe_id = p.ref
+        UNION ALL
+        SELECT p.day, 'r' || mw.recipe_id, ri.ingredient_id
+        FROM plan p
+        JOIN menu_workspace mw ON p.kind = 'workspace' AND mw.session_id = p.ref
+        JOIN recipe_ingredients ri ON ri.recipe_id = mw.recipe_id
+        UNION ALL
+        SELECT p.day, 'w' || mw.id, j.value
+        FROM plan p
+        JOIN menu_workspace mw ON p.kind = 'workspace' AND mw.session_id = p.ref AND mw.recipe_id IS NULL,
+             json_each(mw.ingredients_json) j
+    )
+    SELECT i.id, i.category, i.name, i.is_condiment,
+           COUNT(*) AS dishes,
+           COUNT(DISTINCT d.dish) AS recipes,
+           COUNT(DISTINCT d.day) AS days,
+           group_concat(DISTINCT d.day) AS day_list
+    FROM dishes d
+    JOIN ingredients i ON i.id = d.ingredient_id
+    GROUP BY i.id
+    ORDER BY i.is_condiment, i.category, i.name
+"""
+
+def read_only_uri(path: str) -> str:
+    """唯讀且不可變的連線 URI：不取得檔案鎖、不檢查其他行程的變動，只適用於不會再改變的檔案"""
+    return f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro&immutable=1"
+
+def fts_query(keyword: str) -> str:
+    """把使用者輸入包成 FTS5 片語，避免引號或運算子被當成查詢語法"""
+    return '"' + keyword.replace('"', '""') + '"'
+
+def like_pattern(keyword: str) -> str:
+    """包含 keyword 的 LIKE 樣式 (搭配 ESCAPE '\\')，輸入中的 %、_ 只比對字面"""
+    escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+# --- 查詢追蹤 (選用，設定環境變數 VEGE_DB_INSTRUMENT=1 或傳入 instrument=True 啟用) ---
+INSTRUMENT_ENV = 'VEGE_DB_INSTRUMENT'
+SLOW_QUERY_MS = 50      # 超過即記錄為慢查詢
+LONG_QUERY_MS = 1000    # 查詢仍在執行時，超過即由 progress handler 提出警告
+PROGRESS_INTERVAL = 10000  # progress handler 每隔多少個 SQLite VM 指令被呼叫一次
+
+logger = logging.getLogger(__name__)
+
+class QueryRecord:
+    """一次查詢：SQL 樣板、參數數量、回傳 (或影響) 的列數、耗時與呼叫的方法"""
+
+    __slots__ = ('sql', 'params', 'rows', 'seconds', 'caller', 'slow')
+
+    def __init__(self, sql: str, params: int, caller: str):
+        self.sql = sql
+        self.params = params
+        self.rows = 0
+        self.seconds = 0.0
+        self.caller = caller
+        self.slow = False
+
+    def to_dict(self) -> Dict:
+        return {'sql': self.sql, 'params': self.params, 'rows': self.rows,
+                'ms': round(self.seconds * 1000, 3), 'caller': self.caller}
+
+class QueryLog:
+    """一段期間 (例如一次 Streamlit 重新執行) 內的所有查詢"""
+
+    def __init__(self):
+        self.records: List[QueryRecord] = []
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(r.seconds for r in self.records)
+
+    def by_caller(self) -> List[Dict]:
+        groups: Dict[str, Dict] = {}
+        for r in self.records:
+            g = groups.setdefault(r.caller, {'caller': r.caller, 'queries': 0, 'rows': 0, 'ms': 0.0})
+            g['queries'] += 1
+            g['rows'] += r.rows
+            g['ms'] += r.seconds * 1000
+        return sorted(groups.values(), key=lambda g: -g['ms'])
+
+    def summary(self, top: int = 5) -> Dict:
+        return {
+            'queries': len(self.records),
+            'rows': sum(r.rows for r in self.records),
+            'ms': round(self.total_seconds * 1000, 3),
+            'slow': sum(1 for r in self.records if r.slow),
+            'by_caller': [{**g, 'ms': round(g['ms'], 3)} for g in self.by_caller()],
+            'slowest': [r.to_dict() for r in sorted(self.records, key=lambda r: -r.seconds)[:top]],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), ensure_ascii=False)
+
+def _caller_name() -> str:
+    """往上找第一個 DatabaseManager 公開方法；找不到時回傳第一個 db_manager 以外的函數"""
+    frame = sys._getframe(2)
+    outside = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename == __file__:
+            name = code.co_name
+            if not name.startswith('_') and hasattr(DatabaseManager, name):
+                return name
+        elif outside is None:
+            outside = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+        frame = frame.f_back
+    return outside or '?'
+
+class QueryInstrument:
+    """
+    查詢追蹤設定與收集器。
+
+    每個執行緒可以用 recording() 開啟一份 QueryLog；期間透過追蹤連線執行的查詢都會記錄進去。
+    慢查詢不論是否在 recording() 期間都會寫入 logger 警告。
+    """
+
+    def __init__(self, slow_query_ms: float = SLOW_QUERY_MS, long_query_ms: float = LONG_QUERY_MS):
+        self.slow_seconds = slow_query_ms / 1000
+        self.long_seconds = long_query_ms / 1000
+        self._local = threading.local()
+        # 預設的 root logger 只輸出 WARNING，開啟追蹤時讓 JSON 摘要也能看得到
+        if not logger.handlers:
+            logger.addHandler(logging.StreamHandler())
+            logger.setLevel(logging.INFO)
+
+    def connect(self, db_path: str, **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(db_path, factory=InstrumentedConnection, **kwargs)
+        conn.instrument = self
+        conn.set_progress_handler(conn.on_progress, PROGRESS_INTERVAL)
+        return conn
+
+    @property
+    def active(self) -> Optional[QueryLog]:
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def recording(self):
+        """收集本執行緒期間的查詢，結束時輸出一行 JSON 摘要"""
+        stack = self._local.__dict__.setdefault('stack', [])
+        log = QueryLog()
+        stack.append(log)
+        try:
+            yield log
+        finally:
+            stack.pop()
+            logger.info("db queries %s", log.to_json())
+
+    def begin(self, sql: str, params: int) -> QueryRecord:
+        record = QueryRecord(' '.join(sql.split()), params, _caller_name())
+        log = self.active
+        if log is not None:
+            log.records.append(record)
+        return record
+
+    def add_time(self, record: QueryRecord, seconds: float, rows: int = 0):
+        record.seconds += seconds
+        record.rows += rows
+        if not record.slow and record.seconds >= self.slow_seconds:
+            record.slow = True
+            logger.warning("slow query %.1f ms in %s: %s", record.seconds * 1000, record.caller, record.sql)
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """計時 execute 與 fetch，並累計取回的列數 (寫入則記錄受影響的列數)"""
+
+    _record = None
+
+    def _timed(self, method, *args):
+        instrument = self.connection.instrument
+        start = time.perf_counter()
+        try:
+            result = method(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            if self._record is not None:
+                instrument.add_time(self._record, elapsed)
+        return result
+
+    def _begin(self, sql: str, params: int, method, *args):
+        self._record = self.connection.instrument.begin(sql, params)
+        self.connection.query_started(self._record)
+        try:
+            result = self._timed(method, *args)
+        finally:
+            self.connection.query_finished()
+        if self.description is None and self.rowcount > 0:
+            self._record.rows = self.rowcount
+        return result
+
+    def execute(self, sql, parameters=()):
+        return self._begin(sql, len(parameters), super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        params = sum(len(p) for p in seq_of_parameters)
+        return self._begin(sql, params, super().executemany, sql, seq_of_parameters)
+
+    def _fetched(self, rows: int):
+        if self._record is not None and rows:
+            self._record.rows += rows
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        self._fetched(row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, size if size is not None else self.arraysize)
+        self._fetched(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._fetched(len(rows))
+        return rows
+
+    def __next__(self):
+        row = self._timed(super().__next__)
+        self._fetched(1)
+        return row
+
+class InstrumentedConnection(sqlite3.Connection):
+    """所有查詢都經由 InstrumentedCursor 執行；執行過久時由 progress handler 提出警告"""
+
+    instrument: 'QueryInstrument' = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._running: Optional[QueryRecord] = None
+        self._started = 0.0
+        self._warned = False
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute 在 C 層直接執行，需改走 cursor 才會被記錄
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def query_started(self, record: QueryRecord):
+        self._running = record
+        self._started = time.perf_counter()
+        self._warned = False
+
+    def query_finished(self):
+        self._running = None
+
+    def on_progress(self) -> int:
+        record = self._running
+        if record is not None and not self._warned:
+            elapsed = time.perf_counter() - self._started
+            if elapsed >= self.instrument.long_seconds:
+                self._warned = True
+                logger.warning("long query still running after %.0f ms in %s: %s",
+                               elapsed * 1000, record.caller, record.sql)
+        return 0  # 回傳非 0 會中斷查詢
+
+def internal_execute(conn: sqlite3.Connection, sql: str) -> sqlite3.Cursor:
+    """連線池、副本內部的 PRAGMA 與健康檢查：以原生 Cursor 執行，不計入查詢追蹤"""
+    return sqlite3.Cursor(conn).execute(sql)
+
+class ConnectionPool:
+    """
+    有上限的 SQLite 連線池：checkout() 從佇列取出一條連線，離開 with 區塊時歸還。
+
+    連線在需要時才建立並套用 POOL_PRAGMAS，最多 size 條，與執行緒的數量與存活時間無關
+    (Streamlit 每次重新執行、WorkspaceWriter 每次寫入都是新的執行緒)。
+    同一執行緒在 with 區塊內再次取用時沿用同一條連線 (同一個交易)。
+    只有發生錯誤或閒置過久的連線，才會在取出前做健康檢查；失效的連線會被丟棄並重建。
+    """
+
+    def __init__(self, db_path: str, connect=None, pragmas: Tuple[str, ...] = POOL_PRAGMAS,
+                 size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT, idle_check: float = POOL_IDLE_CHECK):
+        self.db_path = db_path
+        # connect(check_same_thread=...) -> 連線，預設直接 sqlite3.connect
+        self._open = connect or (lambda **kwargs: sqlite3.connect(db_path, **kwargs))
+        self.pragmas = pragmas
+        self.size = size
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self._lock = threading.Lock()
+        self._closed = False
+        self._reset()
+
+    def _reset(self):
+        # LIFO：常用的連線留在最上面 (快取較熱)，多出來的連線維持閒置
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._last_used: Dict[sqlite3.Connection, float] = {}
+        self._suspect = set()
+        self._pid = os.getpid()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = self._open(check_same_thread=False)
+        for pragma in self.pragmas:
+            internal_execute(conn, pragma)
+        return conn
+
+    @staticmethod
+    def is_healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            internal_execute(conn, "SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+            self._last_used.pop(conn, None)
+            self._suspect.discard(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _take(self) -> sqlite3.Connection:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._grow()
+                if conn is not None:
+                    return conn
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(f"等待資料庫連線逾時 ({self.size} 條連線皆在使用中)")
+            with self._lock:
+                idle = time.monotonic() - self._last_used.get(conn, 0.0)
+                check = conn in self._suspect or idle >= self.idle_check
+            if check and not self.is_healthy(conn):
+                self._discard(conn)
+                continue
+            with self._lock:
+                self._suspect.discard(conn)
+            return conn
+
+    def _grow(self) -> Optional[sqlite3.Connection]:
+        """尚未達到上限時建立一條新連線；已達上限回傳 None"""
+        with self._lock:
+            if len(self._connections) >= self.size:
+                return None
+            # 先佔位，建立連線期間其他執行緒不會超過上限
+            placeholder = object()
+            self._connections.append(placeholder)
+        try:
+            conn = self._connect()
+        finally:
+            with self._lock:
+                self._connections.remove(placeholder)
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def checkout(self) -> 'PooledConnection':
+        """with pool.checkout() as conn: 區塊內獨占一條連線，結束時 commit (例外時 rollback) 並歸還"""
+        return PooledConnection(self)
+
+    def _acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError("連線池已關閉")
+        # fork 出來的子行程不能沿用父行程的連線
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+        conn = self._take()
+        self._local.conn, self._local.depth = conn, 1
+        return conn
+
+    def _release(self, conn: sqlite3.Connection, failed: bool):
+        if getattr(self._local, 'conn', None) is conn:
+            self._local.depth -= 1
+            if self._local.depth:
+                return
+            self._local.conn = None
+        conn.row_factory = None
+        with self._lock:
+            closed = self._closed or conn not in self._connections
+            if closed:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            else:
+                self._last_used[conn] = time.monotonic()
+                if failed:
+                    self._suspect.add(conn)
+        if closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    def close_all(self):
+        """關閉閒置的連線；使用中的連線在歸還時關閉"""
+        with self._lock:
+            self._closed = True
+            idle = []
+            while True:
+                try:
+                    idle.append(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+            for conn in idle:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+        for conn in idle:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def __len__(self):
+        return len(self._connections)
+
+class PooledConnection:
+    """ConnectionPool.checkout() 的 with 區塊：進入時取出連線，離開時 commit / rollback 後歸還"""
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self.conn: Optional[sqlite3.Connection] = None
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn = self.pool._acquire()
+        return self.conn.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        failed = exc_type is not None and issubclass(exc_type, sqlite3.Error)
+        try:
+            return self.conn.__exit__(exc_type, exc, tb)
+        except sqlite3.Error:
+            failed = True
+            raise
+        finally:
+            self.pool._release(self.conn, failed)
+
+# 新節點冷啟動：資料庫檔案不存在時，從這個環境變數指定的目錄快照複製
+SNAPSHOT_ENV = 'VEGE_DB_SNAPSHOT'
+
+# --- 記憶體唯讀副本 (選用，設定環境變數 VEGE_DB_REPLICA=1 或傳入 replica=True 啟用) ---
+REPLICA_ENV = 'VEGE_DB_REPLICA'
+
+# 會寫入資料庫的方法：副本模式下先寫入磁碟，成功後以同一個方法直接寫入記憶體副本
+REPLICA_WRITE_METHODS = (
+    'init_database', 'init_fts', 'migrate',
+    'add_ingredient', 'update_ingredient', 'delete_ingredient',
+    'add_recipe', 'update_recipe', 'delete_recipe',
+    'add_ingredient_to_recipe', 'remove_ingredient_from_recipe', 'set_recipe_ingredients',
+    'add_menu_set', 'set_menu_set_recipes', 'delete_menu_set',
+    'add_menu_item', 'update_menu_item', 'delete_menu_item',
+    'save_workspaces',
+)
+
+# 比對副本與磁碟內容是否一致：兩個由觸發器維護的寫入計數與結構
+# (schema_version 在載入副本時會改變，改用 user_version 與 sqlite_master 的項目數)
+REPLICA_SIGNATURE_SQL = """
+    SELECT (SELECT version FROM catalog_version), (SELECT version FROM workspace_version),
+           (SELECT user_version FROM pragma_user_version), (SELECT count(*) FROM sqlite_master)
+"""
+
+_replica_generations = itertools.count(1)
+
+class MemoryReplica:
+    """
+    整個資料庫檔案在記憶體中的副本 (memdb VFS：同一行程的連線共用，採一般的檔案鎖定與 busy timeout)。
+
+    本行程的寫入由 DatabaseManager 在磁碟寫入成功後，透過 writer() 直接套用到副本；
+    只有其他行程寫入過磁碟檔案時，才以 refresh() 整份重新載入：backup 到新的記憶體資料庫後才切換過去，
+    不需要等待進行中的讀取，舊副本在最後一條連線歸還後釋放。
+    讀取連線來自各副本自己的 ConnectionPool，設為 query_only，避免資料只寫進副本。
+    """
+
+    def __init__(self, connect, pragmas: Tuple[str, ...] = POOL_PRAGMAS):
+        # connect(uri, **kwargs) -> 連線；pragmas 為磁碟連線的設定，寫入連線套用相同的 foreign_keys 等設定，
+        # 連帶刪除與觸發器的結果才會與磁碟一致
+        self._connect = connect
+        self.pragmas = pragmas
+        self._lock = threading.Lock()
+        self._keeper: Optional[sqlite3.Connection] = None
+        self._pool: Optional[ConnectionPool] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self.uri: Optional[str] = None
+        self.token = None
+        # 副本可能與磁碟不一致 (尚未載入，或本行程的寫入套用失敗)，下次比對時整份重新載入
+        self.stale = True
+        self.refreshes = 0
+
+    def refresh(self, source: sqlite3.Connection):
+        uri = f"file:/vege-replica-{os.getpid()}-{next(_replica_generations)}?vfs=memdb"
+        staging = sqlite3.connect(':memory:')
+        try:
+            source.backup(staging)
+            # 磁碟檔案為 WAL 模式，memdb 不支援 WAL：把檔頭的讀寫格式改回 rollback journal 再載入
+            image = bytearray(staging.serialize())
+            image[18] = image[19] = 1
+            staging.deserialize(bytes(image))
+            # 記憶體資料庫在最後一條連線關閉時釋放，keeper 讓目前的副本一直存在
+            keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            staging.backup(keeper)
+        finally:
+            staging.close()
+        pool = ConnectionPool(uri, lambda **kwargs: self._connect(uri, uri=True, **kwargs),
+                              pragmas=("PRAGMA query_only = ON",))
+        with self._lock:
+            old = (self._pool, self._writer, self._keeper)
+            self._pool, self._writer, self._keeper = pool, None, keeper
+            self.uri = uri
+            self.stale = False
+            self.refreshes += 1
+        self._release(*old)
+
+    def checkout(self) -> 'ReplicaConnection':
+        """讀取連線 (with 區塊)"""
+        return ReplicaConnection(self)
+
+    def writer(self) -> sqlite3.Connection:
+        """可寫入的連線，呼叫端須自行序列化 (DatabaseManager 在寫入鎖內使用)"""
+        with self._lock:
+            if self._writer is None:
+                self._writer = self._connect(self.uri, uri=True, check_same_thread=False)
+                for pragma in self.pragmas:
+                    internal_execute(self._writer, pragma)
+            self._writer.row_factory = None
+            return self._writer
+
+    def signature(self) -> Tuple[int, ...]:
+        with self.checkout() as conn:
+            return tuple(internal_execute(conn, REPLICA_SIGNATURE_SQL).fetchone())
+
+    @staticmethod
+    def _release(pool, writer, keeper):
+        if pool is not None:
+            pool.close_all()
+        for conn in (writer, keeper):
+            if conn is not None:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+
+    def close(self):
+        with self._lock:
+            old = (self._pool, self._writer, self._keeper)
+            self._pool = self._writer = self._keeper = None
+        self._release(*old)
+
+class ReplicaConnection(PooledConnection):
+    """MemoryReplica.checkout() 的 with 區塊：進入時才選定副本，期間切換過的舊副本不再借出連線"""
+
+    def __init__(self, replica: MemoryReplica):
+        super().__init__(None)
+        self.replica = replica
+
+    def __enter__(self) -> sqlite3.Connection:
+        while True:
+            self.pool = self.replica._pool
+            try:
+                return super().__enter__()
+            except sqlite3.ProgrammingError:
+                if self.pool is self.replica._pool:
+                    raise
+
+class IngredientRecord:
+    """食材的精簡記錄 (使用 __slots__，常駐記憶體的食材目錄用)"""
+
+    __slots__ = ('id', 'name', 'category', 'five_color', 'nature', 'effects', 'is_condiment')
+
+    def __init__(self, id: int, name: str, category: str, five_color: str,
+                 nature: str, effects: Optional[str], is_condiment):
+        self.id = id
+        self.name = name
+        self.category = category
+        self.five_color = five_color
+        self.nature = nature
+        self.effects = effects
+        self.is_condiment = int(bool(is_condiment))
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+class IngredientOptions:
+    """
+    食材選單：以食材 id 作為元件的選項值，顯示文字「【分類】名稱」只在建立時組一次。
+    由 IngredientCatalog.options() 依目錄版本快取，內容建立後不再變動。
+    """
+
+    def __init__(self, records: List[IngredientRecord]):
+        records = sorted(records, key=lambda r: (r.category, r.name))
+        self.labels: Dict[int, str] = {r.id: f"【{r.category}】{r.name}" for r in records}
+        self._by_category: Dict[str, List[int]] = {}
+        for r in records:
+            self._by_category.setdefault(r.category, []).append(r.id)
+        self._ids: Dict[Tuple, List[int]] = {}
+
+    def label(self, ingredient_id: int) -> str:
+        """給 format_func 使用；已被刪除的食材顯示為 id"""
+        return self.labels.get(ingredient_id, f"#{ingredient_id}")
+
+    def ids(self, categories: Optional[Tuple[str, ...]] = None, exclude: Tuple[str, ...] = ()) -> List[int]:
+        """
+        依分類、名稱排序的食材 id
+
+        Args:
+            categories: 只列出這些分類；None 為全部
+            exclude: 排除這些分類
+        """
+        key = (categories, exclude)
+        if key not in self._ids:
+            cats = self._by_category if categories is None else categories
+            self._ids[key] = [i for cat in sorted(cats) if cat not in exclude
+                              for i in self._by_category.get(cat, [])]
+        return self._ids[key]
+
+class IngredientCatalog:
+    """
+    將 ingredients 表整批載入記憶體，並維護 id / 名稱 / 分類三組索引。
+
+    DatabaseManager 的食材寫入會直接修補目錄；其他途徑的寫入 (例如 CSV 匯入)
+    則呼叫 invalidate()，下次查詢時重新載入。每次變動都會遞增 version。
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._lock = threading.RLock()
+        self._loaded = False
+        self.version = 0
+        self._by_id: Dict[int, IngredientRecord] = {}
+        self._by_name: Dict[str, IngredientRecord] = {}
+        self._by_category: Dict[str, List[IngredientRecord]] = {}
+        self._options: Optional[Tuple[int, IngredientOptions]] = None
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            records = [IngredientRecord(*row) for row in self._loader()]
+            self._by_id = {r.id: r for r in records}
+            self._by_name = {r.name: r for r in records}
+            self._by_category = {}
+            for r in records:
+                self._by_category.setdefault(r.category, []).append(r)
+            for members in self._by_category.values():
+                members.sort(key=lambda r: r.name)
+            self._loaded = True
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+            self.version += 1
+
+    def upsert(self, record: IngredientRecord):
+        with self._lock:
+            if not self._loaded:
+                self.version += 1
+                return
+            self._remove_unlocked(record.id)
+            self._by_id[record.id] = record
+            self._by_name[record.name] = record
+            members = self._by_category.setdefault(record.category, [])
+            members.append(record)
+            members.sort(key=lambda r: r.name)
+            self.version += 1
+
+    def remove(self, ingredient_id: int):
+        with self._lock:
+            if self._loaded:
+                self._remove_unlocked(ingredient_id)
+            self.version += 1
+
+    def _remove_unlocked(self, ingredient_id: int):
+        old = self._by_id.pop(ingredient_id, None)
+        if old is None:
+            return
+        if self._by_name.get(old.name) is old:
+            del self._by_name[old.name]
+        members = self._by_category.get(old.category, [])
+        if old in members:
+            members.remove(old)
+
+    def get(self, ingredient_id: int) -> Optional[IngredientRecord]:
+        self._ensure_loaded()
+        return self._by_id.get(ingredient_id)
+
+    def by_name(self, name: str) -> Optional[IngredientRecord]:
+        self._ensure_loaded()
+        return self._by_name.get(name)
+
+    def by_category(self, category: str) -> List[IngredientRecord]:
+        self._ensure_loaded()
+        return list(self._by_category.get(category, []))
+
+    def all(self) -> List[IngredientRecord]:
+        self._ensure_loaded()
+        return list(self._by_id.values())
+
+    def options(self) -> IngredientOptions:
+        """目前版本的食材選單；目錄沒有變動時重複回傳同一份"""
+        self._ensure_loaded()
+        with self._lock:
+            if self._options is None or self._options[0] != self.version:
+                self._options = (self.version, IngredientOptions(list(self._by_id.values())))
+            return self._options[1]
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._by_id)
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "vegetarian_diet.db"):
+    def __init__(self, db_path: str = "vegetarian_diet.db", use_pool: bool = False,
+                 instrument: bool = False, slow_query_ms: float = SLOW_QUERY_MS,
+                 long_query_ms: float = LONG_QUERY_MS, replica: bool = False,
+                 read_only: bool = False, snapshot: Optional[str] = None):
+        """
+        Args:
+            use_pool: 從有上限的連線池取用長駐連線 (見 ConnectionPool)
+            instrument: 記錄每次查詢 (見 query_log)
+            replica: 讀取改由記憶體副本提供 (見 MemoryReplica)；寫入仍寫入磁碟，
+                     完成後直接套用到副本，其他行程修改檔案後會在下次讀取前重新載入
+            read_only: 以唯讀、不可變 (immutable) 的方式開啟，例如直接使用目錄快照；不建立或升級結構
+            snapshot: db_path 不存在時，先從這個目錄快照複製一份 (見 catalog_snapshot.py)
+        """
+        if snapshot and not read_only and not os.path.exists(db_path):
+            from catalog_snapshot import install_snapshot  # 只有冷啟動才需要載入
+            install_snapshot(snapshot, db_path)
         self.db_path = db_path
+        self.read_only = read_only
+        self.instrument = QueryInstrument(slow_query_ms, long_query_ms) if instrument else None
+        pragmas = READ_ONLY_PRAGMAS if read_only else POOL_PRAGMAS
+        self.pool = ConnectionPool(db_path, self._open_connection, pragmas) if use_pool else None
+        self.catalog = IngredientCatalog(self._load_ingredient_rows)
+        self.fts_enabled = False
+        self._watch_conn = None
+        self._watch_lock = threading.Lock()
+        self._watch_generation = 0
+        self._watch_data_version = None
+        self._catalog_version = None
+        self._last_token = None
+        self._derived: Dict[str, Tuple[Tuple[int, int], object]] = {}
+        # 食譜矩陣的增量更新紀錄：自矩陣建立後本行程異動過的食譜，以及最後一次異動後的變動標記；
+        # 期間若有其他寫入插隊 (標記對不上)，就改為整個重建
+        self._recipe_matrix = None
+        self._recipe_changes = set()
+        self._recipe_changes_token = None
+        self._recipe_changes_lock = threading.Lock()
+        self.replica: Optional[MemoryReplica] = None
+        self._replica_write_lock = threading.Lock()
+        self._replica_token = None  # 記憶體副本目前內容對應的變動標記
+        self._local = threading.local()
         self.init_database()
+        if replica:
+            self.replica = MemoryReplica(self._open_connection, self.pool.pragmas if self.pool is not None else ())
+            for name in REPLICA_WRITE_METHODS:
+                setattr(self, name, self._write_through(getattr(self, name)))
+            self.change_token()  # 第一次載入副本
     
     def get_connection(self):
-        return sqlite3.connect(self.db_path)
+        # 副本模式下，寫入方法以外的查詢都由記憶體副本提供；先確認磁碟檔案沒有被其他行程修改
+        if self.replica is not None:
+            writing = getattr(self._local, 'writing', None)
+            if writing == 'replica':
+                return self.replica.writer()
+            if writing is None:
+                self.change_token()
+                return self.replica.checkout()
+        # 連線池模式回傳取用區塊：`with` 期間獨占一條連線，結束時 commit/rollback 並歸還，不會關閉它
+        if self.pool is not None:
+            return self.pool.checkout()
+        return self._open_connection()
+
+    def _open_connection(self, database: Optional[str] = None, **kwargs) -> sqlite3.Connection:
+        if database is None and self.read_only:
+            database, kwargs['uri'] = read_only_uri(self.db_path), True
+        database = database or self.db_path
+        if self.instrument is not None:
+            return self.instrument.connect(database, **kwargs)
+        return sqlite3.connect(database, **kwargs)
+
+    def _write_through(self, method):
+        """
+        包裝寫入方法：先寫入磁碟，成功後以同一個方法再寫入記憶體副本 (結構、觸發器與自動編號都相同，
+        結果一致)。本行程的寫入在同一把鎖內依序完成兩個階段，副本的寫入順序與磁碟相同；
+        結束時比對寫入計數，只有其他行程也寫入過、或套用失敗時才整份重新載入。
+        """
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if getattr(self._local, 'writing', None):
+                return method(*args, **kwargs)  # 寫入方法內呼叫的其他寫入方法
+            with self._replica_write_lock:
+                self._local.writing = 'disk'
+                try:
+                    result = method(*args, **kwargs)
+                    self._local.writing = 'replica'
+                    try:
+                        method(*args, **kwargs)
+                    except Exception:
+                        logger.warning("記憶體副本套用 %s 失敗，下次讀取前整份重新載入", method.__name__, exc_info=True)
+                        self.replica.stale = True
+                finally:
+                    self._local.writing = None
+                self._change_token(sync_replica=True)
+            return result
+        return wrapper
+
+    @contextmanager
+    def query_log(self):
+        """
+        收集期間本執行緒的所有查詢，例如包住一次 Streamlit 重新執行。
+        未開啟查詢追蹤時 yield None。
+        """
+        if self.instrument is None:
+            yield None
+            return
+        with self.instrument.recording() as log:
+            yield log
     
+    def change_token(self) -> Tuple[int, int]:
+        """
+        目錄變動標記，可作為快取鍵；只隨食材、食譜、套餐 (CATALOG_VERSION_TABLES) 改變，
+        今日菜單的寫入不會讓快取失效。
+
+        以一條只用來觀察的連線讀取 PRAGMA data_version：任何其他連線 (包含本行程的
+        連線池與其他行程的匯入工具) commit 後數值就會改變，本身不讀取任何資料表；
+        只有數值改變時才讀取由觸發器維護的 catalog_version。
+        目錄版本改變時也會讓記憶體中的食材目錄失效。
+        """
+        if self.replica is not None and not getattr(self._local, 'writing', None):
+            # 本行程的寫入 (磁碟與副本兩個階段) 進行中：沿用副本目前內容對應的標記，寫入結束時會再比對；
+            # 不等待寫入鎖，避免與持有目錄鎖、正在載入的讀取互相等待
+            if not self._replica_write_lock.acquire(blocking=False):
+                return self._replica_token
+            try:
+                return self._change_token(sync_replica=True)
+            finally:
+                self._replica_write_lock.release()
+        return self._change_token(sync_replica=False)
+
+    def _change_token(self, sync_replica: bool) -> Tuple[int, int]:
+        with self._watch_lock:
+            if self._watch_conn is None:
+                self._watch_conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._watch_generation += 1
+                self._watch_data_version = None
+            data_version = self._watch_conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._watch_data_version:
+                self._watch_data_version = data_version
+                self._catalog_version = self._watch_conn.execute(
+                    "SELECT version FROM catalog_version").fetchone()[0]
+            token = (self._watch_generation, self._catalog_version)
+            changed = self._last_token is not None and token != self._last_token
+            self._last_token = token
+            # 在鎖內同步副本：拿到新標記的呼叫者一定讀得到對應的資料，衍生索引不會以舊資料快取在新標記下。
+            # 磁碟有新的 commit 時比對寫入計數：與副本相同代表都是本行程已套用的寫入，不需要重新載入
+            file_token = (self._watch_generation, data_version)
+            if sync_replica and file_token != self.replica.token:
+                if self.replica.stale or (tuple(self._watch_conn.execute(REPLICA_SIGNATURE_SQL).fetchone())
+                                          != self.replica.signature()):
+                    self.replica.refresh(self._watch_conn)
+                self.replica.token = file_token
+            if sync_replica:
+                self._replica_token = token
+        if changed:
+            self.catalog.invalidate()
+        return token
+
+    def _derived_index(self, name: str, builder):
+        """取得由資料表推導出的記憶體索引，資料庫變動後才重建"""
+        token = self.change_token()
+        cached = self._derived.get(name)
+        if cached is not None and cached[0] == token:
+            return cached[1]
+        index = builder()
+        self._derived[name] = (token, index)
+        return index
+
+    def _note_recipe_change(self, token_before: Tuple[int, int], recipe_id: Optional[int]):
+        """記錄一筆食譜寫入；token_before 為寫入前的變動標記"""
+        with self._recipe_changes_lock:
+            if self._recipe_changes is not None and token_before == self._recipe_changes_token:
+                if recipe_id is not None:
+                    self._recipe_changes.add(recipe_id)
+            else:
+                self._recipe_changes = None  # 無法確認中間沒有其他寫入，下次整個重建
+            self._recipe_changes_token = self.change_token()
+
     def init_database(self):
+        # 結構已是最新版本時 (一般的開啟) 只讀取狀態，不執行任何 DDL
+        version = self._schema_state()
+        if self.read_only:
+            if version < SCHEMA_VERSION:
+                raise ValueError(f"唯讀資料庫的結構版本為 {version}，需要 {SCHEMA_VERSION} 以上")
+            return
+        if version >= SCHEMA_VERSION:
+            return
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
@@ -80,6 +1146,101 @@ class DatabaseManager:
             """)
             
             conn.commit()
+
+        self.fts_enabled = self.init_fts()
+        self.migrate()
+
+    def _schema_state(self) -> int:
+        """讀取結構版本 (PRAGMA user_version) 與全文檢索索引是否存在"""
+        with self.get_connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            self.fts_enabled = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLES['recipes'][0],)
+            ).fetchone() is not None
+        return version
+
+    def migrate(self) -> int:
+        """套用尚未執行的結構變更，每個版本在自己的交易內完成；回傳目前的結構版本"""
+        with self.get_connection() as conn:
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            for version, description, steps in MIGRATIONS:
+                if version <= current:
+                    continue
+                conn.execute("BEGIN")
+                try:
+                    for step in steps:
+                        if callable(step):
+                            step(conn)
+                        else:
+                            conn.execute(step)
+                    conn.execute(f"PRAGMA user_version = {version}")
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                current = version
+            return current
+
+    def init_fts(self) -> bool:
+        """建立全文檢索索引與同步觸發器；SQLite 不支援 FTS5 時回傳 False，搜尋改走 LIKE"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for table, (fts, columns) in FTS_TABLES.items():
+                    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,))
+                    exists = cursor.fetchone() is not None
+                    cursor.execute(f"""
+                        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                            {', '.join(columns)},
+                            content='{table}', content_rowid='id', tokenize='trigram'
+                        )
+                    """)
+                    for trigger in fts_trigger_sql(table):
+                        cursor.execute(trigger)
+                    # 既有資料庫第一次建立索引時，從來源表回填
+                    if not exists:
+                        cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+                conn.commit()
+                return True
+            except sqlite3.OperationalError:
+                conn.rollback()
+                return False
+
+    @contextmanager
+    def deferred_index_maintenance(self, conn: sqlite3.Connection, table: str):
+        """
+        大量寫入 table 期間暫停次要索引、FTS 同步與目錄版本觸發器，寫入完成後一次重建，
+        目錄版本只遞增一次。
+
+        須在呼叫端的交易內使用；區塊內發生例外時不會重建，由呼叫端 rollback 還原。
+        """
+        indexes = SECONDARY_INDEXES.get(table, [])
+        use_fts = self.fts_enabled and table in FTS_TABLES
+
+        for name, _ in indexes:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        if use_fts:
+            for suffix in ('ai', 'ad', 'au'):
+                conn.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+        versioned = table in CATALOG_VERSION_TABLES
+        if versioned:
+            for suffix in ('ai', 'ad', 'au'):
+                conn.execute(f"DROP TRIGGER IF EXISTS {table}_version_{suffix}")
+        yield
+        for _, ddl in indexes:
+            conn.execute(ddl)
+        if versioned:
+            for trigger in catalog_version_trigger_sql(table):
+                conn.execute(trigger)
+            conn.execute("UPDATE catalog_version SET version = version + 1")
+        if use_fts:
+            fts, _ = FTS_TABLES[table]
+            for trigger in fts_trigger_sql(table):
+                conn.execute(trigger)
+            conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    def _use_fts(self, keyword: str) -> bool:
+        return self.fts_enabled and len(keyword) >= FTS_MIN_KEYWORD_LENGTH
     
     # --- Ingredients CRUD ---
     def add_ingredient(self, name: str, category: str, five_color: str, 
@@ -91,7 +1252,19 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (name, category, five_color, nature, effects, is_condiment))
             conn.commit()
-            return cursor.lastrowid
+            ingredient_id = cursor.lastrowid
+        self.catalog.upsert(IngredientRecord(ingredient_id, name, category, five_color,
+                                             nature, effects, is_condiment))
+        return ingredient_id
+
+    def _load_ingredient_rows(self) -> List[Tuple]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, name, category, five_color, nature, effects, is_condiment
+                FROM ingredients ORDER BY category, name
+            """)
+            return cursor.fetchall()
     
     def get_all_ingredients(self) -> List[Dict]:
         with self.get_connection() as conn:
@@ -135,34 +1308,57 @@ class DatabaseManager:
                 WHERE id = ?
             """, (name, category, five_color, nature, effects, is_condiment, ingredient_id))
             conn.commit()
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+        if updated:
+            self.catalog.upsert(IngredientRecord(ingredient_id, name, category, five_color,
+                                                 nature, effects, is_condiment))
+        return updated
     
     def delete_ingredient(self, ingredient_id: int) -> bool:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM ingredients WHERE id = ?", (ingredient_id,))
             conn.commit()
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
+        if deleted:
+            self.catalog.remove(ingredient_id)
+        return deleted
     
-    def search_ingredients(self, keyword: str) -> List[Dict]:
+    def search_ingredients(self, keyword: str, category: Optional[str] = None) -> List[Dict]:
+        """依名稱或功效搜尋食材，結果依相關度 (bm25) 排序"""
+        keyword = keyword.strip()
         with self.get_connection() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM ingredients 
-                WHERE name LIKE ? OR effects LIKE ?
-                ORDER BY category, name
-            """, (f"%{keyword}%", f"%{keyword}%"))
+            cat_filter = "AND i.category = ?" if category else ""
+            cat_params = [category] if category else []
+            if self._use_fts(keyword):
+                cursor.execute(f"""
+                    SELECT i.* FROM ingredients_fts f
+                    JOIN ingredients i ON i.id = f.rowid
+                    WHERE ingredients_fts MATCH ? {cat_filter}
+                    ORDER BY f.rank, i.category, i.name
+                """, [fts_query(keyword)] + cat_params)
+            else:
+                cursor.execute(f"""
+                    SELECT i.* FROM ingredients i
+                    WHERE (i.name LIKE ? ESCAPE '\\' OR i.effects LIKE ? ESCAPE '\\') {cat_filter}
+                    ORDER BY i.category, i.name
+                """, [like_pattern(keyword)] * 2 + cat_params)
             return [dict(row) for row in cursor.fetchall()]
     
     # --- Recipes CRUD ---
-    def add_recipe(self, name: str, category: str, description: str = "") -> int:
+    def add_recipe(self, name: str, category: str, description: str = "",
+                   servings: Optional[int] = None) -> int:
+        token = self.change_token()
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("INSERT INTO recipes (name, category, description) VALUES (?, ?, ?)", 
-                           (name, category, description))
+            cursor.execute("INSERT INTO recipes (name, category, description, servings) VALUES (?, ?, ?, ?)", 
+                           (name, category, description, servings))
             conn.commit()
-            return cursor.lastrowid
+            recipe_id = cursor.lastrowid
+        self._note_recipe_change(token, recipe_id)
+        return recipe_id
     
     def get_all_recipes(self) -> List[Dict]:
         with self.get_connection() as conn:
@@ -170,7 +1366,99 @@ class DatabaseManager:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM recipes ORDER BY name")
             return [dict(row) for row in cursor.fetchall()]
+
+    def get_recipes_by_category(self, category: str) -> List[Dict]:
+        with self.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM recipes WHERE category = ? ORDER BY name", (category,))
+            return [dict(row) for row in cursor.fetchall()]
     
+    def search_recipes(self, keyword: str, category: Optional[str] = None) -> List[Dict]:
+        """依名稱或描述搜尋食譜，結果依相關度 (bm25) 排序"""
+        keyword = keyword.strip()
+        with self.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cat_filter = "AND r.category = ?" if category else ""
+            cat_params = [category] if category else []
+            if self._use_fts(keyword):
+                cursor.execute(f"""
+                    SELECT r.* FROM recipes_fts f
+                    JOIN recipes r ON r.id = f.rowid
+                    WHERE recipes_fts MATCH ? {cat_filter}
+                    ORDER BY f.rank, r.name
+                """, [fts_query(keyword)] + cat_params)
+            else:
+                cursor.execute(f"""
+                    SELECT r.* FROM recipes r
+                    WHERE (r.name LIKE ? ESCAPE '\\' OR r.description LIKE ? ESCAPE '\\') {cat_filter}
+                    ORDER BY r.name
+                """, [like_pattern(keyword)] * 2 + cat_params)
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_recipe_page(self, category: Optional[str] = None, after: Optional[Tuple[str, str, int]] = None,
+                        limit: int = RECIPE_PAGE_SIZE) -> Dict:
+        """
+        依 (分類, 名稱, id) 排序的食譜分頁 (keyset pagination)：從索引上一頁的最後位置往後讀，
+        不論翻到第幾頁、目錄有多大，每頁都只讀 limit 筆食譜與它們的食材。
+
+        Args:
+            category: 只列出此分類
+            after: 上一頁回傳的 next；None 為第一頁
+            limit: 每頁筆數
+
+        Returns:
+            Dict: recipes (含 ingredient_names 食材名稱清單) 與 next (下一頁的 after，已是最後一頁時為 None)
+        """
+        conditions, params = [], []
+        if category:
+            conditions.append("category = ?")
+            params.append(category)
+        if after is not None:
+            after_category, after_name, after_id = after
+            # 有分類條件時只比較 (名稱, id)，才能直接在 (category, name) 索引上定位
+            if category:
+                conditions.append("(name, id) > (?, ?)")
+                params.extend([after_name, after_id])
+            else:
+                conditions.append("(category, name, id) > (?, ?, ?)")
+                params.extend([after_category, after_name, after_id])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            # 多取一筆，用來判斷是否還有下一頁
+            cursor.execute(f"""
+                WITH page AS (
+                    SELECT id, name, category, description FROM recipes
+                    {where}
+                    ORDER BY category, name, id
+                    LIMIT ?
+                )
+                SELECT p.id, p.name, p.category, p.description, i.name AS ingredient_name
+                FROM page p
+                LEFT JOIN recipe_ingredients ri ON ri.recipe_id = p.id
+                LEFT JOIN ingredients i ON i.id = ri.ingredient_id
+                ORDER BY p.category, p.name, p.id, i.category, i.name
+            """, params + [limit + 1])
+
+            recipes = []
+            for row in cursor:
+                if not recipes or recipes[-1]['id'] != row['id']:
+                    recipes.append({'id': row['id'], 'name': row['name'], 'category': row['category'],
+                                    'description': row['description'], 'ingredient_names': []})
+                if row['ingredient_name'] is not None:
+                    recipes[-1]['ingredient_names'].append(row['ingredient_name'])
+
+        next_after = None
+        if len(recipes) > limit:
+            recipes = recipes[:limit]
+            last = recipes[-1]
+            next_after = (last['category'], last['name'], last['id'])
+        return {'recipes': recipes, 'next': next_after}
+
     def get_recipe_by_id(self, recipe_id: int) -> Optional[Dict]:
         with self.get_connection() as conn:
             conn.row_factory = sqlite3.Row
@@ -194,45 +1482,113 @@ class DatabaseManager:
             
             # 獲取食譜的食材
             cursor.execute("""
-                SELECT i.* FROM ingredients i
+                SELECT i.*, ri.quantity, ri.unit FROM ingredients i
                 JOIN recipe_ingredients ri ON i.id = ri.ingredient_id
                 WHERE ri.recipe_id = ?
                 ORDER BY i.category, i.name
             """, (recipe_id,))
             recipe_dict['ingredients'] = [dict(row) for row in cursor.fetchall()]
-            
+
             return recipe_dict
-    
+
+    def get_recipes_with_ingredients(self, recipe_ids: Optional[List[int]] = None,
+                                     category: Optional[str] = None) -> List[Dict]:
+        """一次 JOIN 查詢取回多道食譜及其食材，避免逐筆呼叫 get_recipe_with_ingredients。"""
+        if recipe_ids is not None and not recipe_ids:
+            return []
+
+        conditions, params = [], []
+        if recipe_ids is not None:
+            conditions.append(f"r.id IN ({','.join('?' for _ in recipe_ids)})")
+            params.extend(recipe_ids)
+        if category:
+            conditions.append("r.category = ?")
+            params.append(category)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT r.id AS r_id, r.name AS r_name, r.category AS r_category,
+                       r.description AS r_description, r.servings AS r_servings,
+                       ri.quantity, ri.unit, i.*
+                FROM recipes r
+                LEFT JOIN recipe_ingredients ri ON ri.recipe_id = r.id
+                LEFT JOIN ingredients i ON i.id = ri.ingredient_id
+                {where}
+                ORDER BY r.name, r.id, i.category, i.name
+            """, params)
+
+            # 結果已依食譜排序，單次掃描即可分組
+            recipes = []
+            current = None
+            for row in cursor:
+                if current is None or current['id'] != row['r_id']:
+                    current = {
+                        'id': row['r_id'],
+                        'name': row['r_name'],
+                        'category': row['r_category'],
+                        'description': row['r_description'],
+                        'servings': row['r_servings'],
+                        'ingredients': [],
+                    }
+                    recipes.append(current)
+                if row['id'] is not None:
+                    current['ingredients'].append({
+                        'id': row['id'],
+                        'name': row['name'],
+                        'category': row['category'],
+                        'five_color': row['five_color'],
+                        'nature': row['nature'],
+                        'effects': row['effects'],
+                        'is_condiment': row['is_condiment'],
+                        'quantity': row['quantity'],
+                        'unit': row['unit'],
+                    })
+            return recipes
+
     def update_recipe(self, recipe_id: int, name: str, category: str, description: str = "") -> bool:
+        token = self.change_token()
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("UPDATE recipes SET name = ?, category = ?, description = ? WHERE id = ?", 
                            (name, category, description, recipe_id))
             conn.commit()
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+        self._note_recipe_change(token, recipe_id)
+        return updated
     
     def delete_recipe(self, recipe_id: int) -> bool:
+        token = self.change_token()
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM recipes WHERE id = ?", (recipe_id,))
             conn.commit()
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
+        self._note_recipe_change(token, recipe_id)
+        return deleted
     
     # --- Recipe-Ingredients 關聯管理 ---
-    def add_ingredient_to_recipe(self, recipe_id: int, ingredient_id: int) -> bool:
+    def add_ingredient_to_recipe(self, recipe_id: int, ingredient_id: int,
+                                 quantity: Optional[float] = None, unit: Optional[str] = None) -> bool:
+        token = self.change_token()
         with self.get_connection() as conn:
             cursor = conn.cursor()
             try:
                 cursor.execute("""
-                    INSERT OR IGNORE INTO recipe_ingredients (recipe_id, ingredient_id)
-                    VALUES (?, ?)
-                """, (recipe_id, ingredient_id))
+                    INSERT OR IGNORE INTO recipe_ingredients (recipe_id, ingredient_id, quantity, unit)
+                    VALUES (?, ?, ?, ?)
+                """, (recipe_id, ingredient_id, quantity, unit))
                 conn.commit()
-                return True
+                added = True
             except sqlite3.IntegrityError:
-                return False
+                added = False
+        self._note_recipe_change(token, recipe_id)
+        return added
     
     def remove_ingredient_from_recipe(self, recipe_id: int, ingredient_id: int) -> bool:
+        token = self.change_token()
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
@@ -240,9 +1596,18 @@ class DatabaseManager:
                 WHERE recipe_id = ? AND ingredient_id = ?
             """, (recipe_id, ingredient_id))
             conn.commit()
-            return cursor.rowcount > 0
+            removed = cursor.rowcount > 0
+        self._note_recipe_change(token, recipe_id)
+        return removed
     
-    def set_recipe_ingredients(self, recipe_id: int, ingredient_ids: List[int]) -> bool:
+    def set_recipe_ingredients(self, recipe_id: int, ingredient_ids: List[int],
+                               quantities: Optional[Dict[int, Tuple[Optional[float], Optional[str]]]] = None) -> bool:
+        """
+        Args:
+            quantities: 食材 id -> (數量, 單位)，未列出的食材不記錄用量
+        """
+        quantities = quantities or {}
+        token = self.change_token()
         with self.get_connection() as conn:
             cursor = conn.cursor()
             try:
@@ -252,16 +1617,78 @@ class DatabaseManager:
                 
                 # 添加新關聯
                 for ingredient_id in ingredient_ids:
+                    quantity, unit = quantities.get(ingredient_id, (None, None))
                     cursor.execute("""
-                        INSERT INTO recipe_ingredients (recipe_id, ingredient_id)
-                        VALUES (?, ?)
-                    """, (recipe_id, ingredient_id))
+                        INSERT INTO recipe_ingredients (recipe_id, ingredient_id, quantity, unit)
+                        VALUES (?, ?, ?, ?)
+                    """, (recipe_id, ingredient_id, quantity, unit))
                 
                 conn.commit()
-                return True
+                saved = True
             except sqlite3.IntegrityError:
-                return False
+                # 整組取代：任何一筆關聯寫入失敗，就連同前面的 DELETE 一起撤銷，保留原本的食材
+                conn.rollback()
+                saved = False
+        self._note_recipe_change(token, recipe_id)
+        return saved
     
+    # --- 冰箱食材反查食譜 ---
+    def rank_recipes_by_pantry(self, ingredient_ids: List[int], ignore_condiments: bool = True,
+                               limit: int = 20) -> List[Dict]:
+        """依現有食材的涵蓋率排序食譜，見 RecipeMatrix.rank_by_pantry"""
+        return self.get_recipe_matrix().rank_by_pantry(ingredient_ids, ignore_condiments, limit)
+
+    def get_quantity_table(self):
+        """食材用量陣列 (見 recipe_matrix.QuantityTable)，一次查詢建立，資料庫變動後才重建"""
+        from recipe_matrix import QuantityTable  # numpy 只在需要時載入
+
+        def build():
+            with self.get_connection() as conn:
+                return QuantityTable.load(conn)
+        return self._derived_index('quantities', build)
+
+    def get_purchase_totals(self, dishes: List[Tuple[int, float]]) -> List[Dict]:
+        """
+        依用餐人數放大食譜用量，加總每種食材的採購量
+
+        Args:
+            dishes: (食譜 id, 用餐人數) 的清單，同一道食譜可重複出現
+
+        Returns:
+            List[Dict]: 依 調味品與否 → 分類 → 名稱 排序；每種食材、每個基準單位一筆，
+                        含 name、category、is_condiment、unit、amount、dishes
+        """
+        totals = self.get_quantity_table().totals(dishes)
+        for row in totals:
+            record = self.catalog.get(row['ingredient_id'])
+            row.update(name=record.name, category=record.category, is_condiment=record.is_condiment)
+        totals.sort(key=lambda r: (r['is_condiment'], r['category'], r['name'], r['unit'] or ''))
+        return totals
+
+    def get_recipe_matrix(self):
+        """
+        食譜屬性矩陣 (見 recipe_matrix.RecipeMatrix)。
+
+        第一次使用時一次查詢建立；之後若只有本行程的食譜寫入，只重算那幾列，
+        其他任何變動 (食材修改、外部匯入…) 則整個重建。
+        """
+        from recipe_matrix import RecipeMatrix  # numpy 只在需要矩陣時載入
+
+        with self._recipe_changes_lock:
+            token = self.change_token()
+            matrix = self._recipe_matrix
+            if matrix is not None and token == self._recipe_changes_token and self._recipe_changes is not None:
+                if self._recipe_changes:
+                    with self.get_connection() as conn:
+                        matrix.refresh(conn, self._recipe_changes)
+            else:
+                with self.get_connection() as conn:
+                    matrix = RecipeMatrix.load(conn)
+            self._recipe_matrix = matrix
+            self._recipe_changes = set()
+            self._recipe_changes_token = token
+            return matrix
+
     # --- Menu Sets CRUD ---
     def add_menu_set(self, name: str, description: str = "") -> int:
         with self.get_connection() as conn:
@@ -278,12 +1705,15 @@ class DatabaseManager:
             cursor.execute("SELECT * FROM menu_sets ORDER BY name")
             return [dict(row) for row in cursor.fetchall()]
     
-    def get_menu_set_with_recipes(self, menu_set_id: int) -> Dict:
+    def get_menu_set_with_recipes(self, menu_set_id: int) -> Optional[Dict]:
         with self.get_connection() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM menu_sets WHERE id = ?", (menu_set_id,))
-            menu_set = dict(cursor.fetchone())
+            row = cursor.fetchone()
+            if not row:
+                return None
+            menu_set = dict(row)
             
             cursor.execute("""
                 SELECT r.* FROM recipes r
@@ -405,22 +1835,191 @@ class DatabaseManager:
             conn.commit()
             return cursor.rowcount > 0
     
+    # --- 依工作階段保存的今日菜單 ---
+    def load_workspace(self, session_id: str) -> List[Dict]:
+        """
+        以單一查詢載入某個工作階段的今日菜單，格式同 st.session_state.menu_workspace：
+        食譜為 {'type': 'recipe', id, name, category, description}，
+        自訂菜色為 {'type': 'custom', name, ingredients (食材 id), category}
+        """
+        with self.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT mw.recipe_id, mw.custom_name, mw.ingredients_json, mw.category,
+                       r.name, r.category, r.description
+                FROM menu_workspace mw
+                LEFT JOIN recipes r ON r.id = mw.recipe_id
+                WHERE mw.session_id = ?
+                ORDER BY mw.position
+            """, (session_id,)).fetchall()
+
+        items = []
+        for recipe_id, custom_name, ingredients_json, category, r_name, r_category, r_description in rows:
+            if recipe_id is not None and r_name is not None:
+                items.append({'type': 'recipe', 'id': recipe_id, 'name': r_name,
+                              'category': r_category, 'description': r_description})
+            elif custom_name:
+                # 自訂菜色的食材以 id 保存 (與 get_menu_item_with_details 相同)；略過已被刪除的食材
+                ids = [i for i in json.loads(ingredients_json or '[]') if self.catalog.get(i)]
+                items.append({'type': 'custom', 'name': custom_name, 'ingredients': ids,
+                              'category': category or '自訂'})
+            # 食譜已被刪除 (recipe_id 被設為 NULL) 的項目直接略過
+        return items
+
+    def _workspace_rows(self, session_id: str, items: List[Dict]) -> List[tuple]:
+        rows = []
+        for position, item in enumerate(items):
+            if item['type'] == 'recipe':
+                rows.append((session_id, position, item['id'], None, None, item.get('category')))
+            else:
+                rows.append((session_id, position, None, item['name'], json.dumps(item.get('ingredients', [])),
+                             item.get('category', '自訂')))
+        return rows
+
+    def save_workspaces(self, workspaces: Dict[str, List[Dict]]):
+        """在單一交易內以新內容取代多個工作階段的今日菜單"""
+        if not workspaces:
+            return
+        rows = [row for session_id, items in workspaces.items() for row in self._workspace_rows(session_id, items)]
+        with self.get_connection() as conn:
+            conn.executemany("DELETE FROM menu_workspace WHERE session_id = ?",
+                             [(session_id,) for session_id in workspaces])
+            conn.executemany("""
+                INSERT INTO menu_workspace (session_id, position, recipe_id, custom_name, ingredients_json, category)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+
+    # --- 採購清單 ---
+    def iter_shopping_list(self, plan: List[Tuple[str, str, object]]) -> Iterator[Dict]:
+        """
+        彙總多天、多份菜單的採購清單，逐列回傳而不一次載入全部結果
+
+        Args:
+            plan: (日期, 種類, 參照) 的清單；種類為 'menu_set' (套餐 id)、'recipe' (食譜 id)
+                  或 'workspace' (今日菜單的工作階段 id)。同一天可以有多筆
+
+        Returns:
+            Iterator[Dict]: 依 調味品與否 → 分類 → 名稱 排序，每樣食材一列：
+                id / category / name / is_condiment / dishes (用到的菜色道數) /
+                recipes (不重複的菜色數) / days (天數) / day_list (以逗號分隔的日期)
+        """
+        for _, kind, _ in plan:
+            if kind not in SHOPPING_PLAN_KINDS:
+                raise ValueError(f"不支援的規劃種類: {kind}")
+        # 逐列讀取期間一直占用這條連線，直到讀完 (或產生器被關閉) 才歸還連線池；
+        # 非連線池模式 (例如 shopping_list.py 命令列) 的臨時連線在結束時關閉
+        conn = self.get_connection()
+        try:
+            with conn as c:
+                cursor = c.cursor()
+                cursor.row_factory = sqlite3.Row
+                cursor.execute(SHOPPING_LIST_SQL, (json.dumps([list(entry) for entry in plan], ensure_ascii=False),))
+                for row in cursor:
+                    yield dict(row)
+        finally:
+            if self.pool is None and self.replica is None:
+                conn.close()
+
     # --- Utility functions ---
     def get_categories(self) -> List[str]:
-        return ['葉菜類', '根莖類', '菇菌類', '豆製品', '蛋奶類', '五穀雜糧', '水果類', '調味品', '堅果種子類', '藻類', '甜品/點心類', '其他']
+        return list(INGREDIENT_CATEGORIES)
     
     def get_recipe_categories(self) -> List[str]:
-        return ['主食', '主菜', '配菜', '湯品', '甜點/飲料', '醬料/醃料', '高湯/湯底']
+        return list(RECIPE_CATEGORIES)
     
     def get_five_colors(self) -> List[str]:
-        return ['青', '赤', '黃', '白', '黑']
+        return list(FIVE_COLORS)
     
     def get_natures(self) -> List[str]:
-        return ['寒', '涼', '平', '溫', '熱']
+        return list(NATURES)
     
     def close(self):
-        # SQLite 不需要明確關閉連接
-        pass
+        # 非連線池模式下每次查詢的連線都是臨時的，不需要明確關閉
+        if self.pool is not None:
+            self.pool.close_all()
+        if self.replica is not None:
+            self.replica.close()
+        with self._watch_lock:
+            if self._watch_conn is not None:
+                self._watch_conn.close()
+                self._watch_conn = None
+
+class WorkspaceWriter:
+    """
+    合併今日菜單的寫入：schedule() 只記下各工作階段的最新內容，
+    第一筆待寫入資料出現後 delay 秒，再把期間所有變動以單一交易寫入。
+    連續快速的新增、移除只會產生一次 commit。
+    """
+
+    def __init__(self, db: 'DatabaseManager', delay: float = 0.5):
+        self.db = db
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[Dict]] = {}
+        self._timer: Optional[threading.Timer] = None
+        atexit.register(self.flush)
+
+    def schedule(self, session_id: str, items: List[Dict]):
+        with self._lock:
+            self._pending[session_id] = list(items)
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def load(self, session_id: str) -> List[Dict]:
+        """尚未寫入的內容優先，否則從資料庫載入"""
+        with self._lock:
+            if session_id in self._pending:
+                return list(self._pending[session_id])
+        return self.db.load_workspace(session_id)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return
+        try:
+            self.db.save_workspaces(pending)
+        except sqlite3.Error:
+            # 寫入失敗時放回佇列 (不覆蓋期間的新變動)，下一次排程再試
+            with self._lock:
+                for session_id, items in pending.items():
+                    self._pending.setdefault(session_id, items)
+            raise
+
+class LazyDatabaseManager:
+    """
+    第一次存取屬性時才建立 DatabaseManager；import db_manager 本身不連線、不檢查結構。
+    只用到類別或常數的模組 (匯入工具、benchmark…) 因此不會碰到預設的資料庫檔案。
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance: Optional[DatabaseManager] = None
+        self._lock = threading.Lock()
+
+    @property
+    def instance(self) -> DatabaseManager:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.instance, name)
+
+    def close(self):
+        if self._instance is not None:
+            self._instance.close()
+
+def _default_manager() -> DatabaseManager:
+    return DatabaseManager(use_pool=True, instrument=os.environ.get(INSTRUMENT_ENV) == '1',
+                           replica=os.environ.get(REPLICA_ENV) == '1', snapshot=os.environ.get(SNAPSHOT_ENV))
 
-# 全域資料庫管理器實例
-db = DatabaseManager()
\ No newline at end of file
+# 全域資料庫管理器實例 (延遲建立)
+db = LazyDatabaseManager(_default_manager)
+atexit.register(db.close)
\ No newline at end of file
@@ -0,0 +1,269 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from typing import Dict, List
+
+from db_manager import (DatabaseManager, FIVE_COLORS, INGREDIENT_CATEGORIES, NATURES,
+                        RECIPE_CATEGORIES)
+from import_digest import content_digest, ensure_digest_table, recipe_digests, split_names
+from quantities import parse_ingredient_tokens, parse_servings
+
+DB_PATH = 'vegetarian_diet.db'
+INGREDIENTS_CSV = 'ingredients.csv'
+RECIPES_CSV = 'recipes.csv'
+SET_MENUS_CSV = 'set_menus.csv'
+
+# 整批重建時會清空的資料表 (menu_workspace 屬於使用者資料，不在此列；其中的 id 參照會依名稱更新)
+CATALOG_TABLES = ('recipe_ingredients', 'menu_set_items', 'ingredients', 'recipes', 'menu_sets')
+
+# --- 1. CSV 解析 (在子行程中執行，只回傳可序列化的基本型別) ---
+
+def parse_ingredients(path: str) -> List[tuple]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [
+            (line_no, row['name'].strip(), row['category'].strip(), row['five_color'].strip(),
+             row['nature'].strip(), (row.get('effects') or '').strip() or None,
+             (row.get('is_condiment') or '').strip().lower() in ('true', '1', 'yes'))
+            for line_no, row in enumerate(csv.DictReader(f), start=2)
+        ]
+
+def parse_recipes(path: str) -> List[tuple]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [
+            (line_no, row['name'].strip(), row['category'].strip(),
+             (row.get('description') or '').strip(), parse_servings(row.get('servings')),
+             parse_ingredient_tokens(row['ingredients']))
+            for line_no, row in enumerate(csv.DictReader(f), start=2)
+        ]
+
+def parse_set_menus(path: str) -> List[tuple]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [
+            (line_no, row['name'].strip(), (row.get('description') or '').strip(),
+             split_names(row['recipes']))
+            for line_no, row in enumerate(csv.DictReader(f), start=2)
+        ]
+
+# --- 2. 在記憶體中解析 食材 -> 食譜 -> 套餐 的參照 ---
+
+class ImportPlan:
+    """整批匯入的完整內容：已配好 id 的資料列，以及所有無法匯入或無法對應的項目"""
+
+    def __init__(self):
+        self.ingredients: List[tuple] = []
+        self.recipes: List[tuple] = []
+        self.recipe_links: List[tuple] = []
+        self.menu_sets: List[tuple] = []
+        self.set_links: List[tuple] = []
+        self.digests: List[tuple] = []
+        self.invalid_rows: List[str] = []
+        self.unresolved: List[str] = []
+
+    def report(self):
+        print(f"食材 {len(self.ingredients)} 筆、食譜 {len(self.recipes)} 筆 "
+              f"({len(self.recipe_links)} 個食材關聯)、套餐 {len(self.menu_sets)} 筆 "
+              f"({len(self.set_links)} 個食譜關聯)")
+        for message in self.invalid_rows:
+            print(f"  [ERROR] {message}")
+        for message in self.unresolved:
+            print(f"  ⚠️ {message}")
+
+def build_plan(ingredient_rows, recipe_rows, set_rows) -> ImportPlan:
+    plan = ImportPlan()
+
+    ingredient_ids: Dict[str, int] = {}
+    for line_no, name, category, five_color, nature, effects, is_condiment in ingredient_rows:
+        problems = []
+        if not name:
+            problems.append("name 不可為空")
+        elif name in ingredient_ids:
+            problems.append(f"name 重複: {name}")
+        if category not in INGREDIENT_CATEGORIES:
+            problems.append(f"category 不合法: {category}")
+        if five_color not in FIVE_COLORS:
+            problems.append(f"five_color 不合法: {five_color}")
+        if nature not in NATURES:
+            problems.append(f"nature 不合法: {nature}")
+        if problems:
+            plan.invalid_rows.append(f"ingredients.csv 第 {line_no} 行: {'; '.join(problems)}")
+            continue
+        ingredient_id = len(plan.ingredients) + 1
+        ingredient_ids[name] = ingredient_id
+        plan.ingredients.append((ingredient_id, name, category, five_color, nature, effects, int(is_condiment)))
+
+    recipe_ids: Dict[str, int] = {}
+    for line_no, name, category, description, servings, tokens in recipe_rows:
+        problems = []
+        if not name:
+            problems.append("name 不可為空")
+        elif name in recipe_ids:
+            problems.append(f"name 重複: {name}")
+        if category not in RECIPE_CATEGORIES:
+            problems.append(f"category 不合法: {category}")
+        if problems:
+            plan.invalid_rows.append(f"recipes.csv 第 {line_no} 行: {'; '.join(problems)}")
+            continue
+        recipe_id = len(plan.recipes) + 1
+        recipe_ids[name] = recipe_id
+        plan.recipes.append((recipe_id, name, category, description, servings))
+
+        links = {}
+        for ing_name, quantity, unit in tokens:
+            if ing_name in ingredient_ids:
+                links.setdefault(ingredient_ids[ing_name], (quantity, unit))
+            else:
+                plan.unresolved.append(f"找不到食材 '{ing_name}' (食譜：{name})")
+        plan.recipe_links.extend((recipe_id, ing_id, *links[ing_id]) for ing_id in sorted(links))
+        # 與 import_recipes 的摘要一致，之後的增量匯入才會判定為未變動
+        plan.digests.append(('recipe', name, *recipe_digests(category, description, servings, links)))
+
+    set_names = set()
+    for line_no, name, description, recipe_names in set_rows:
+        if not name or name in set_names:
+            problem = f"name 重複: {name}" if name else "name 不可為空"
+            plan.invalid_rows.append(f"set_menus.csv 第 {line_no} 行: {problem}")
+            continue
+        set_names.add(name)
+        set_id = len(plan.menu_sets) + 1
+        plan.menu_sets.append((set_id, name, description))
+
+        linked_ids = []
+        for rec_name in recipe_names:
+            if rec_name in recipe_ids:
+                linked_ids.append(recipe_ids[rec_name])
+            else:
+                plan.unresolved.append(f"找不到食譜 '{rec_name}' (套餐：{name})")
+        plan.set_links.extend((set_id, rec_id) for rec_id in linked_ids)
+        plan.digests.append(('menu_set', name, content_digest(description), content_digest(linked_ids)))
+
+    return plan
+
+# --- 3. 單一交易寫入 ---
+
+def remap_workspace(conn: sqlite3.Connection, plan: ImportPlan, old_recipes: Dict[int, str],
+                    old_ingredients: Dict[int, str]) -> int:
+    """
+    整批重建會重新編號：把今日菜單 (menu_workspace) 參照的食譜與自訂菜色食材，依名稱換成新的 id。
+    新目錄中已沒有的食譜設為 NULL (載入時略過)，食材則從清單中移除。
+
+    Returns:
+        int: 更新的列數
+    """
+    recipe_ids = {row[1]: row[0] for row in plan.recipes}
+    ingredient_ids = {row[1]: row[0] for row in plan.ingredients}
+    updates = []
+    for row_id, recipe_id, ingredients_json in conn.execute(
+            "SELECT id, recipe_id, ingredients_json FROM menu_workspace").fetchall():
+        new_recipe_id = recipe_ids.get(old_recipes.get(recipe_id)) if recipe_id is not None else None
+        new_json = ingredients_json
+        if ingredients_json:
+            try:
+                old_ids = json.loads(ingredients_json)
+            except ValueError:
+                old_ids = []
+            names = [old_ingredients.get(i) for i in old_ids if isinstance(i, int)]
+            new_json = json.dumps([ingredient_ids[name] for name in names if name in ingredient_ids])
+        if new_recipe_id != recipe_id or new_json != ingredients_json:
+            updates.append((new_recipe_id, new_json, row_id))
+    conn.executemany("UPDATE menu_workspace SET recipe_id = ?, ingredients_json = ? WHERE id = ?", updates)
+    return len(updates)
+
+def write_plan(plan: ImportPlan, db_path: str):
+    manager = DatabaseManager(db_path)  # 確保資料表與索引存在
+
+    conn = sqlite3.connect(db_path)
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        with ExitStack() as stack:
+            for table in CATALOG_TABLES:
+                stack.enter_context(manager.deferred_index_maintenance(conn, table))
+            # 清空前記下舊 id 對應的名稱，寫入後用來更新今日菜單的參照
+            old_recipes = dict(conn.execute("SELECT id, name FROM recipes"))
+            old_ingredients = dict(conn.execute("SELECT id, name FROM ingredients"))
+            for table in CATALOG_TABLES:
+                conn.execute(f"DELETE FROM {table}")
+            conn.execute(f"DELETE FROM sqlite_sequence WHERE name IN ({','.join('?' for _ in CATALOG_TABLES)})",
+                         CATALOG_TABLES)
+
+            conn.executemany("""
+                INSERT INTO ingredients (id, name, category, five_color, nature, effects, is_condiment)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, plan.ingredients)
+            conn.executemany("INSERT INTO recipes (id, name, category, description, servings) VALUES (?, ?, ?, ?, ?)",
+                             plan.recipes)
+            conn.executemany("""
+                INSERT INTO recipe_ingredients (recipe_id, ingredient_id, quantity, unit) VALUES (?, ?, ?, ?)
+            """, plan.recipe_links)
+            conn.executemany("INSERT INTO menu_sets (id, name, description) VALUES (?, ?, ?)",
+                             plan.menu_sets)
+            conn.executemany("INSERT INTO menu_set_items (menu_set_id, recipe_id) VALUES (?, ?)",
+                             plan.set_links)
+            remap_workspace(conn, plan, old_recipes, old_ingredients)
+
+            ensure_digest_table(conn)
+            conn.execute("DELETE FROM import_digests WHERE kind IN ('recipe', 'menu_set')")
+            conn.executemany("""
+                INSERT INTO import_digests (kind, name, meta_digest, link_digest) VALUES (?, ?, ?, ?)
+            """, plan.digests)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+        manager.close()
+
+def import_all(db_path=DB_PATH, ingredients_csv=INGREDIENTS_CSV, recipes_csv=RECIPES_CSV,
+               set_menus_csv=SET_MENUS_CSV, dry_run=False, parallel=True) -> ImportPlan:
+    """
+    一次完成食材、食譜、套餐的整批重建
+
+    Args:
+        db_path (str): 目標資料庫路徑
+        dry_run (bool): 只解析並回報不合法或無法對應的項目，不寫入資料庫
+        parallel (bool): 以多個行程同時解析三個 CSV 檔案
+
+    Returns:
+        ImportPlan: 本次匯入的內容與問題清單
+    """
+    print("=== 全量匯入工具 ===")
+    for path in (ingredients_csv, recipes_csv, set_menus_csv):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"找不到檔案：{path}")
+
+    if parallel:
+        with ProcessPoolExecutor(max_workers=3) as pool:
+            futures = (pool.submit(parse_ingredients, ingredients_csv),
+                       pool.submit(parse_recipes, recipes_csv),
+                       pool.submit(parse_set_menus, set_menus_csv))
+            ingredient_rows, recipe_rows, set_rows = (f.result() for f in futures)
+    else:
+        ingredient_rows = parse_ingredients(ingredients_csv)
+        recipe_rows = parse_recipes(recipes_csv)
+        set_rows = parse_set_menus(set_menus_csv)
+
+    plan = build_plan(ingredient_rows, recipe_rows, set_rows)
+    plan.report()
+
+    if dry_run:
+        print("\n[DRY RUN] 未寫入資料庫")
+    else:
+        write_plan(plan, db_path)
+        print(f"\n[SUCCESS] 已寫入 {db_path}")
+    return plan
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="一次匯入 ingredients.csv、recipes.csv 與 set_menus.csv")
+    parser.add_argument('--db', default=DB_PATH, help="目標資料庫路徑")
+    parser.add_argument('--ingredients', default=INGREDIENTS_CSV)
+    parser.add_argument('--recipes', default=RECIPES_CSV)
+    parser.add_argument('--set-menus', default=SET_MENUS_CSV)
+    parser.add_argument('--dry-run', action='store_true', help="只檢查，不寫入資料庫")
+    args = parser.parse_args()
+
+    import_all(args.db, args.ingredients, args.recipes, args.set_menus, dry_run=args.dry_run)
@@ -2,32 +2,54 @@ import sqlite3
 import pandas as pd
 from db_manager import db
 
-def import_ingredients_from_csv(csv_file_path="ingredients.csv"):
+INGREDIENT_COLUMNS = ['name', 'category', 'five_color', 'nature', 'effects', 'is_condiment']
+
+def validate_ingredients(df):
+    """
+    以向量化方式檢查 CSV 內容是否符合資料表的 CHECK 限制
+
+    Args:
+        df (pd.DataFrame): 讀入的食材資料
+
+    Returns:
+        pd.Series: 每一行的錯誤訊息 (索引與 df 相同)，沒有錯誤的行不會出現
+    """
+    allowed = {
+        'category': db.get_categories(),
+        'five_color': db.get_five_colors(),
+        'nature': db.get_natures(),
+    }
+    errors = pd.Series('', index=df.index)
+
+    blank_name = df['name'].isna() | (df['name'].astype(str).str.strip() == '')
+    errors[blank_name] += 'name 不可為空; '
+    dup_name = df['name'].duplicated(keep='first') & ~blank_name
+    errors[dup_name] += 'name 重複: ' + df.loc[dup_name, 'name'].astype(str) + '; '
+
+    for col, values in allowed.items():
+        bad = ~df[col].isin(values)
+        errors[bad] += col + ' 不合法: ' + df.loc[bad, col].astype(str) + '; '
+
+    return errors[errors != ''].str.rstrip('; ')
+
+def import_ingredients_from_csv(csv_file_path="ingredients.csv", bulk=True):
     """
     從 CSV 檔案匯入食材資料到 SQLite 資料庫
     
     Args:
         csv_file_path (str): CSV 檔案路徑，預設為 "ingredients.csv"
+        bulk (bool): 批次模式 (預設)。先一次檢查所有資料並列出所有錯誤行，
+            再以 executemany 在單一交易中寫入有效資料，全文索引延後到最後重建；
+            設為 False 則使用逐筆插入的舊流程
     """
     try:
-        # 連線到資料庫
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
-        
-        # 清空舊資料
-        print("正在清空舊的食材資料...")
-        cursor.execute("DELETE FROM ingredients")
-        conn.commit()
-        print("[OK] 已清空舊資料")
-        
         # 讀取 CSV 檔案 (utf-8 編碼)
         print(f"正在讀取 CSV 檔案: {csv_file_path}")
         df = pd.read_csv(csv_file_path, encoding='utf-8')
         print(f"[OK] 成功讀取 {len(df)} 筆資料")
         
         # 檢查必要的欄位
-        required_columns = ['name', 'category', 'five_color', 'nature', 'effects', 'is_condiment']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in INGREDIENT_COLUMNS if col not in df.columns]
         
         if missing_columns:
             print(f"[ERROR] CSV 檔案缺少必要欄位: {missing_columns}")
@@ -35,35 +57,14 @@ def import_ingredients_from_csv(csv_file_path="ingredients.csv"):
         
         # 轉換 is_condiment 欄位為布林值
         df['is_condiment'] = df['is_condiment'].astype(bool)
-        
-        # 逐筆插入資料
-        success_count = 0
-        error_count = 0
-        
-        print("正在匯入資料...")
-        for index, row in df.iterrows():
-            try:
-                cursor.execute("""
-                    INSERT INTO ingredients (name, category, five_color, nature, effects, is_condiment)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    row['name'],
-                    row['category'],
-                    row['five_color'],
-                    row['nature'],
-                    row['effects'],
-                    row['is_condiment']
-                ))
-                success_count += 1
-            except Exception as e:
-                print(f"[ERROR] 第 {index + 1} 行匯入失敗: {e}")
-                error_count += 1
-        
-        # 提交交易
-        conn.commit()
-        
-        # 關閉連線
-        conn.close()
+
+        if bulk:
+            success_count, error_count = _bulk_insert(df)
+        else:
+            success_count, error_count = _row_by_row_insert(df)
+
+        # 繞過 DatabaseManager 寫入，記憶體中的食材目錄需要重新載入
+        db.catalog.invalidate()
         
         # 印出結果
         print(f"\n匯入完成！")
@@ -80,6 +81,86 @@ def import_ingredients_from_csv(csv_file_path="ingredients.csv"):
         print(f"[ERROR] 匯入過程發生錯誤: {e}")
         return False
 
+def _bulk_insert(df):
+    df['name'] = df['name'].where(df['name'].isna(), df['name'].astype(str).str.strip())
+    errors = validate_ingredients(df)
+    for index, message in errors.items():
+        print(f"[ERROR] 第 {index + 1} 行資料不合法: {message}")
+
+    valid = df.drop(index=errors.index)
+    effects = valid['effects'].astype(object).where(valid['effects'].notna(), None)
+    records = list(zip(
+        valid['name'].tolist(),
+        valid['category'].tolist(),
+        valid['five_color'].tolist(),
+        valid['nature'].tolist(),
+        effects.tolist(),
+        valid['is_condiment'].astype(int).tolist(),
+    ))
+
+    conn = sqlite3.connect(db.db_path)
+    # 手動管理交易，讓清空、寫入與索引重建落在同一個交易內
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        print("正在清空舊的食材資料並匯入...")
+        with db.deferred_index_maintenance(conn, 'ingredients'):
+            conn.execute("DELETE FROM ingredients")
+            conn.executemany("""
+                INSERT INTO ingredients (name, category, five_color, nature, effects, is_condiment)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, records)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    return len(records), len(errors)
+
+def _row_by_row_insert(df):
+    # 連線到資料庫
+    conn = sqlite3.connect(db.db_path)
+    cursor = conn.cursor()
+    
+    # 清空舊資料
+    print("正在清空舊的食材資料...")
+    cursor.execute("DELETE FROM ingredients")
+    conn.commit()
+    print("[OK] 已清空舊資料")
+    
+    # 逐筆插入資料
+    success_count = 0
+    error_count = 0
+    
+    print("正在匯入資料...")
+    for index, row in df.iterrows():
+        try:
+            cursor.execute("""
+                INSERT INTO ingredients (name, category, five_color, nature, effects, is_condiment)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                row['name'],
+                row['category'],
+                row['five_color'],
+                row['nature'],
+                row['effects'],
+                row['is_condiment']
+            ))
+            success_count += 1
+        except Exception as e:
+            print(f"[ERROR] 第 {index + 1} 行匯入失敗: {e}")
+            error_count += 1
+    
+    # 提交交易
+    conn.commit()
+    
+    # 關閉連線
+    conn.close()
+
+    return success_count, error_count
+
 def create_sample_csv():
     """
     創建範例 CSV 檔案
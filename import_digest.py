@@ -0,0 +1,95 @@
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+
+# 記錄每筆 CSV 資料上次匯入時的內容摘要，讓重複匯入只處理有變動的資料
+# meta_digest 涵蓋本體欄位 (分類、描述…)，link_digest 涵蓋關聯 (食材、食譜)
+DIGEST_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS import_digests (
+        kind TEXT NOT NULL,
+        name TEXT NOT NULL,
+        meta_digest TEXT NOT NULL,
+        link_digest TEXT NOT NULL,
+        PRIMARY KEY (kind, name)
+    )
+"""
+
+def ensure_digest_table(cursor):
+    cursor.execute(DIGEST_TABLE_SQL)
+
+def content_digest(*parts) -> str:
+    """將正規化後的內容轉成穩定的摘要字串"""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def recipe_digests(category: str, description: str, servings: Optional[int],
+                   links: Dict[int, Tuple]) -> Tuple[str, str]:
+    """
+    食譜的 (meta_digest, link_digest)；links 為 食材 id -> (數量, 單位)。
+    沒有份數與用量時與只記錄食材 id 的摘要相同，既有資料庫不會因此全部重新關聯。
+    """
+    meta = content_digest(category, description) if servings is None else \
+        content_digest(category, description, servings)
+    ids = sorted(links)
+    if any(q is not None or u is not None for q, u in links.values()):
+        link = content_digest([[i, *links[i]] for i in ids])
+    else:
+        link = content_digest(ids)
+    return meta, link
+
+def split_names(value: Optional[str]) -> List[str]:
+    """拆開以 | 分隔的名稱清單，去除空白與重複並保留原順序"""
+    names = []
+    for name in (value or '').split('|'):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def load_name_map(cursor, table: str) -> Dict[str, int]:
+    """一次查詢取得 名稱 -> id；同名時取最早建立的一筆"""
+    cursor.execute(f"SELECT name, MIN(id) FROM {table} GROUP BY name")
+    return {name: row_id for name, row_id in cursor.fetchall()}
+
+def load_digests(cursor, kind: str) -> Dict[str, Tuple[str, str]]:
+    cursor.execute("SELECT name, meta_digest, link_digest FROM import_digests WHERE kind = ?", (kind,))
+    return {name: (meta, link) for name, meta, link in cursor.fetchall()}
+
+def store_digests(cursor, kind: str, digests: Dict[str, Tuple[str, str]]):
+    cursor.executemany("""
+        INSERT OR REPLACE INTO import_digests (kind, name, meta_digest, link_digest)
+        VALUES (?, ?, ?, ?)
+    """, [(kind, name, meta, link) for name, (meta, link) in digests.items()])
+
+def prune_digests(cursor, kind: str, old: Dict[str, Tuple[str, str]], seen: Dict[str, Tuple[str, str]]) -> int:
+    """
+    刪除這次 CSV 已不再出現的摘要；否則日後同名資料重新加入 CSV 時，
+    會和期間在資料庫中被修改過的內容比對成「未變動」而被略過
+    """
+    stale = [(kind, name) for name in old if name not in seen]
+    cursor.executemany("DELETE FROM import_digests WHERE kind = ? AND name = ?", stale)
+    return len(stale)
+
+class ImportSummary:
+    """統計一次匯入中新增、更新、重新關聯與未變動的筆數"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.added = []
+        self.updated = []
+        self.relinked = []
+        self.unchanged = 0
+        self.unresolved = 0
+        self.pruned = 0
+
+    def report(self):
+        print(f"\n[SUCCESS] {self.label}匯入完成！")
+        print(f"  新增 {len(self.added)} 筆、更新 {len(self.updated)} 筆、"
+              f"重新關聯 {len(self.relinked)} 筆、未變動 {self.unchanged} 筆")
+        for title, names in (("新增", self.added), ("更新", self.updated), ("重新關聯", self.relinked)):
+            if names:
+                print(f"  {title}：{'、'.join(names)}")
+        if self.pruned:
+            print(f"  已清除 {self.pruned} 筆不在 CSV 中的匯入記錄")
+        if self.unresolved:
+            print(f"  ⚠️ 共有 {self.unresolved} 個名稱無法對應")
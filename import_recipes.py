@@ -1,86 +1,110 @@
-import csv
-import sqlite3
-import os
-
-# 設定資料庫路徑
-DB_PATH = 'vegetarian_diet.db'
-CSV_PATH = 'recipes.csv'
-
-def get_ingredient_id(cursor, name):
-    """根據食材名稱查找 ID"""
-    cursor.execute("SELECT id FROM ingredients WHERE name = ?", (name.strip(),))
-    result = cursor.fetchone()
-    return result[0] if result else None
-
-def import_recipes():
-    print("=== 食譜 CSV 匯入工具 ===")
-    
-    if not os.path.exists(CSV_PATH):
-        print(f"[ERROR] 找不到檔案：{CSV_PATH}")
-        return
-
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    try:
-        # 1. 讀取 CSV
-        with open(CSV_PATH, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            recipes_count = 0
-            
-            print("正在匯入食譜...")
-
-            for row in reader:
-                recipe_name = row['name'].strip()
-                category = row['category'].strip()
-                description = row['description'].strip()
-                ingredients_str = row['ingredients'] # 例如 "番茄|雞蛋|鹽"
-
-                # 2. 新增食譜本體 (寫入 recipes 表)
-                # 先檢查是否已存在，避免重複
-                cursor.execute("SELECT id FROM recipes WHERE name = ?", (recipe_name,))
-                existing = cursor.fetchone()
-                
-                if existing:
-                    print(f"[SKIP] 食譜已存在：{recipe_name}")
-                    recipe_id = existing[0]
-                    # 選擇性：如果要更新描述，可以在這裡寫 UPDATE
-                else:
-                    cursor.execute(
-                        "INSERT INTO recipes (name, category, description) VALUES (?, ?, ?)",
-                        (recipe_name, category, description)
-                    )
-                    recipe_id = cursor.lastrowid
-                    print(f"[NEW] 新增食譜：{recipe_name} ({category})")
-                    recipes_count += 1
-
-                # 3. 處理食材關聯 (寫入 recipe_ingredients 表)
-                # 先清空該食譜的舊關聯 (如果是更新模式)
-                cursor.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,))
-
-                ingredient_list = ingredients_str.split('|')
-                for ing_name in ingredient_list:
-                    ing_name = ing_name.strip()
-                    if not ing_name: continue
-
-                    ing_id = get_ingredient_id(cursor, ing_name)
-                    
-                    if ing_id:
-                        cursor.execute(
-                            "INSERT INTO recipe_ingredients (recipe_id, ingredient_id) VALUES (?, ?)",
-                            (recipe_id, ing_id)
-                        )
-                    else:
-                        print(f"  ⚠️ 警告：在資料庫中找不到食材 '{ing_name}' (食譜：{recipe_name})")
-
-        conn.commit()
-        print(f"\n[SUCCESS] 匯入完成！共新增 {recipes_count} 道食譜。")
-
-    except Exception as e:
-        print(f"[ERROR] 發生錯誤：{e}")
-        conn.rollback()
-    finally:
-        conn.close()
-
-if __name__ == "__main__":
-    import_recipes()
\ No newline at end of file
+import csv
+import sqlite3
+import os
+
+from db_manager import DatabaseManager
+from import_digest import (ImportSummary, ensure_digest_table, load_digests, load_name_map,
+                           prune_digests, recipe_digests, store_digests)
+from quantities import parse_ingredient_tokens, parse_servings
+
+# 設定資料庫路徑
+DB_PATH = 'vegetarian_diet.db'
+CSV_PATH = 'recipes.csv'
+
+def import_recipes(db_path=DB_PATH, csv_path=CSV_PATH, force=False):
+    """
+    增量匯入食譜：名稱對照表各只查詢一次，並以每筆資料的內容摘要比對上次匯入，
+    只新增、更新或重新關聯有變動的食譜。force=True 時忽略摘要，全部重寫。
+    """
+    print("=== 食譜 CSV 匯入工具 ===")
+
+    if not os.path.exists(csv_path):
+        print(f"[ERROR] 找不到檔案：{csv_path}")
+        return
+
+    DatabaseManager(db_path).close()  # 確保結構已升級 (用量、份數欄位)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        ensure_digest_table(cursor)
+        ingredient_ids = load_name_map(cursor, 'ingredients')
+        recipe_ids = load_name_map(cursor, 'recipes')
+        old_digests = load_digests(cursor, 'recipe')
+        new_digests = {}
+        summary = ImportSummary("食譜")
+
+        # 1. 讀取 CSV
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+
+            print("正在比對食譜...")
+
+            for row in reader:
+                recipe_name = row['name'].strip()
+                category = row['category'].strip()
+                description = row['description'].strip()
+                servings = parse_servings(row.get('servings'))
+                tokens = parse_ingredient_tokens(row['ingredients']) # 例如 "番茄:2顆|雞蛋:3顆|鹽:少許"
+
+                missing = [name for name, _, _ in tokens if name not in ingredient_ids]
+                summary.unresolved += len(missing)
+                links = {}
+                for name, quantity, unit in tokens:
+                    if name in ingredient_ids:
+                        links.setdefault(ingredient_ids[name], (quantity, unit))
+
+                meta_digest, link_digest = recipe_digests(category, description, servings, links)
+                new_digests[recipe_name] = (meta_digest, link_digest)
+                old_meta, old_link = old_digests.get(recipe_name, (None, None))
+
+                # 2. 食譜本體 (寫入 recipes 表)
+                recipe_id = recipe_ids.get(recipe_name)
+                if recipe_id is None:
+                    cursor.execute(
+                        "INSERT INTO recipes (name, category, description, servings) VALUES (?, ?, ?, ?)",
+                        (recipe_name, category, description, servings)
+                    )
+                    recipe_id = cursor.lastrowid
+                    recipe_ids[recipe_name] = recipe_id
+                    summary.added.append(recipe_name)
+                    relink = True
+                else:
+                    if force or meta_digest != old_meta:
+                        cursor.execute(
+                            "UPDATE recipes SET category = ?, description = ?, servings = ? WHERE id = ?",
+                            (category, description, servings, recipe_id)
+                        )
+                        summary.updated.append(recipe_name)
+                    relink = force or link_digest != old_link
+                    if relink:
+                        summary.relinked.append(recipe_name)
+                    elif meta_digest == old_meta:
+                        summary.unchanged += 1
+
+                # 3. 處理食材關聯 (寫入 recipe_ingredients 表)，只有關聯變動時才重寫
+                if relink:
+                    cursor.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,))
+                    cursor.executemany(
+                        "INSERT OR IGNORE INTO recipe_ingredients (recipe_id, ingredient_id, quantity, unit) "
+                        "VALUES (?, ?, ?, ?)",
+                        [(recipe_id, ing_id, *links[ing_id]) for ing_id in sorted(links)]
+                    )
+                    for ing_name in missing:
+                        print(f"  ⚠️ 警告：在資料庫中找不到食材 '{ing_name}' (食譜：{recipe_name})")
+
+        store_digests(cursor, 'recipe', new_digests)
+        summary.pruned = prune_digests(cursor, 'recipe', old_digests, new_digests)
+        conn.commit()
+        summary.report()
+        return summary
+
+    except Exception as e:
+        print(f"[ERROR] 發生錯誤：{e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    import sys
+    import_recipes(force='--force' in sys.argv)
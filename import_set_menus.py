@@ -1,86 +1,102 @@
-import csv
-import sqlite3
-import os
-
-# 設定資料庫路徑
-DB_PATH = 'vegetarian_diet.db'
-CSV_PATH = 'set_menus.csv'
-
-def get_recipe_id(cursor, recipe_name):
-    """根據食譜名稱查找 ID"""
-    cursor.execute("SELECT id FROM recipes WHERE name = ?", (recipe_name.strip(),))
-    result = cursor.fetchone()
-    return result[0] if result else None
-
-def import_set_menus():
-    print("=== 套餐 CSV 匯入工具 ===")
-    
-    if not os.path.exists(CSV_PATH):
-        print(f"[ERROR] 找不到檔案：{CSV_PATH}")
-        return
-
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    try:
-        # 1. 讀取 CSV
-        with open(CSV_PATH, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            sets_count = 0
-            
-            print("正在匯入套餐...")
-
-            for row in reader:
-                set_name = row['name'].strip()
-                description = row['description'].strip()
-                recipes_str = row['recipes'] # 例如 "紅燒獅子頭|三杯菇"
-
-                # 2. 新增套餐本體 (寫入 menu_sets)
-                # 檢查是否已存在
-                cursor.execute("SELECT id FROM menu_sets WHERE name = ?", (set_name,))
-                existing = cursor.fetchone()
-                
-                if existing:
-                    print(f"[SKIP] 套餐已存在：{set_name}")
-                    menu_set_id = existing[0]
-                    # 更新描述
-                    cursor.execute("UPDATE menu_sets SET description = ? WHERE id = ?", (description, menu_set_id))
-                else:
-                    cursor.execute(
-                        "INSERT INTO menu_sets (name, description) VALUES (?, ?)",
-                        (set_name, description)
-                    )
-                    menu_set_id = cursor.lastrowid
-                    print(f"[NEW] 新增套餐：{set_name}")
-                    sets_count += 1
-
-                # 3. 處理食譜關聯 (寫入 menu_set_items)
-                # 先清空該套餐的舊關聯 (重置內容)
-                cursor.execute("DELETE FROM menu_set_items WHERE menu_set_id = ?", (menu_set_id,))
-
-                recipe_list = recipes_str.split('|')
-                for rec_name in recipe_list:
-                    rec_name = rec_name.strip()
-                    if not rec_name: continue
-
-                    rec_id = get_recipe_id(cursor, rec_name)
-                    
-                    if rec_id:
-                        cursor.execute(
-                            "INSERT INTO menu_set_items (menu_set_id, recipe_id) VALUES (?, ?)",
-                            (menu_set_id, rec_id)
-                        )
-                    else:
-                        print(f"  ⚠️ 警告：找不到食譜 '{rec_name}' (屬於套餐：{set_name}) - 請確認 recipes.csv 有這道菜")
-
-        conn.commit()
-        print(f"\n[SUCCESS] 匯入完成！共處理 {sets_count} 組套餐。")
-
-    except Exception as e:
-        print(f"[ERROR] 發生錯誤：{e}")
-        conn.rollback()
-    finally:
-        conn.close()
-
-if __name__ == "__main__":
-    import_set_menus()
\ No newline at end of file
+import csv
+import sqlite3
+import os
+
+from db_manager import DatabaseManager
+from import_digest import (ImportSummary, content_digest, ensure_digest_table,
+                           load_digests, load_name_map, prune_digests, split_names, store_digests)
+
+# 設定資料庫路徑
+DB_PATH = 'vegetarian_diet.db'
+CSV_PATH = 'set_menus.csv'
+
+def import_set_menus(db_path=DB_PATH, csv_path=CSV_PATH, force=False):
+    """
+    增量匯入套餐：名稱對照表各只查詢一次，並以每筆資料的內容摘要比對上次匯入，
+    只新增、更新或重新關聯有變動的套餐。force=True 時忽略摘要，全部重寫。
+    """
+    print("=== 套餐 CSV 匯入工具 ===")
+
+    if not os.path.exists(csv_path):
+        print(f"[ERROR] 找不到檔案：{csv_path}")
+        return
+
+    DatabaseManager(db_path).close()  # 確保結構已建立或升級 (空資料庫也能直接匯入)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        ensure_digest_table(cursor)
+        recipe_ids = load_name_map(cursor, 'recipes')
+        set_ids = load_name_map(cursor, 'menu_sets')
+        old_digests = load_digests(cursor, 'menu_set')
+        new_digests = {}
+        summary = ImportSummary("套餐")
+
+        # 1. 讀取 CSV
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+
+            print("正在比對套餐...")
+
+            for row in reader:
+                set_name = row['name'].strip()
+                description = row['description'].strip()
+                recipe_names = split_names(row['recipes']) # 例如 "紅燒獅子頭|三杯菇"
+
+                missing = [n for n in recipe_names if n not in recipe_ids]
+                summary.unresolved += len(missing)
+                # 套餐內的菜色順序有意義，保留 CSV 中的順序
+                linked_ids = [recipe_ids[n] for n in recipe_names if n in recipe_ids]
+
+                meta_digest = content_digest(description)
+                link_digest = content_digest(linked_ids)
+                new_digests[set_name] = (meta_digest, link_digest)
+                old_meta, old_link = old_digests.get(set_name, (None, None))
+
+                # 2. 套餐本體 (寫入 menu_sets)
+                menu_set_id = set_ids.get(set_name)
+                if menu_set_id is None:
+                    cursor.execute(
+                        "INSERT INTO menu_sets (name, description) VALUES (?, ?)",
+                        (set_name, description)
+                    )
+                    menu_set_id = cursor.lastrowid
+                    set_ids[set_name] = menu_set_id
+                    summary.added.append(set_name)
+                    relink = True
+                else:
+                    if force or meta_digest != old_meta:
+                        cursor.execute("UPDATE menu_sets SET description = ? WHERE id = ?", (description, menu_set_id))
+                        summary.updated.append(set_name)
+                    relink = force or link_digest != old_link
+                    if relink:
+                        summary.relinked.append(set_name)
+                    elif meta_digest == old_meta:
+                        summary.unchanged += 1
+
+                # 3. 處理食譜關聯 (寫入 menu_set_items)，只有關聯變動時才重寫
+                if relink:
+                    cursor.execute("DELETE FROM menu_set_items WHERE menu_set_id = ?", (menu_set_id,))
+                    cursor.executemany(
+                        "INSERT INTO menu_set_items (menu_set_id, recipe_id) VALUES (?, ?)",
+                        [(menu_set_id, rec_id) for rec_id in linked_ids]
+                    )
+                    for rec_name in missing:
+                        print(f"  ⚠️ 警告：找不到食譜 '{rec_name}' (屬於套餐：{set_name}) - 請確認 recipes.csv 有這道菜")
+
+        store_digests(cursor, 'menu_set', new_digests)
+        summary.pruned = prune_digests(cursor, 'menu_set', old_digests, new_digests)
+        conn.commit()
+        summary.report()
+        return summary
+
+    except Exception as e:
+        print(f"[ERROR] 發生錯誤：{e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    import sys
+    import_set_menus(force='--force' in sys.argv)
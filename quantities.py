@@ -0,0 +1,81 @@
+import re
+from typing import List, Optional, Tuple
+
+# 食譜未填份數時，視為幾人份
+DEFAULT_SERVINGS = 4
+
+# 單位 -> (基準單位, 換算倍數)；重量統一為公克、容量統一為毫升，其他單位 (顆、把…) 各自加總
+UNITS = {
+    'g': ('g', 1.0), '克': ('g', 1.0), '公克': ('g', 1.0),
+    'kg': ('g', 1000.0), '公斤': ('g', 1000.0), '千克': ('g', 1000.0),
+    '斤': ('g', 600.0), '台斤': ('g', 600.0), '兩': ('g', 37.5),
+    'ml': ('ml', 1.0), '毫升': ('ml', 1.0), 'cc': ('ml', 1.0),
+    'l': ('ml', 1000.0), '公升': ('ml', 1000.0),
+    '大匙': ('ml', 15.0), '湯匙': ('ml', 15.0), '小匙': ('ml', 5.0), '茶匙': ('ml', 5.0),
+    '杯': ('ml', 240.0),
+}
+
+# 基準單位累積到此數量時，改以較大的單位顯示
+DISPLAY_UNITS = {'g': (1000.0, 'kg'), 'ml': (1000.0, 'L')}
+
+_TOKEN_RE = re.compile(r'^(?P<num>\d+(?:\.\d+)?)(?:/(?P<den>\d+))?\s*(?P<unit>.*)$')
+_HEADCOUNT_RE = re.compile(r'(\d+)(?:\s*-\s*(\d+))?\s*人')
+
+def parse_quantity(text: str) -> Tuple[Optional[float], Optional[str]]:
+    """
+    解析用量文字，例如 "300g"、"1/2杯"、"2 顆"；沒有數字的文字 (少許、適量) 只保留為單位
+
+    Returns:
+        Tuple[Optional[float], Optional[str]]: (數量, 單位)
+    """
+    text = (text or '').strip()
+    if not text:
+        return None, None
+    match = _TOKEN_RE.match(text)
+    if not match:
+        return None, text
+    quantity = float(match['num'])
+    if match['den']:
+        quantity /= int(match['den']) or 1
+    return quantity, match['unit'].strip() or None
+
+def parse_ingredient_tokens(value: Optional[str]) -> List[Tuple[str, Optional[float], Optional[str]]]:
+    """
+    拆開 recipes.csv 的食材欄位，每項可附上用量：白米:300g|雞蛋:2顆|鹽:少許
+
+    重複的食材只保留第一次出現的一筆，與 split_names 一致。
+    """
+    items, seen = [], set()
+    for token in (value or '').split('|'):
+        name, _, amount = token.replace('：', ':').partition(':')
+        name = name.strip()
+        if name and name not in seen:
+            seen.add(name)
+            items.append((name, *parse_quantity(amount)))
+    return items
+
+def parse_servings(text: Optional[str]) -> Optional[int]:
+    """recipes.csv 的 servings 欄位；空白或無法解析時為 None (視為 DEFAULT_SERVINGS)"""
+    text = (text or '').strip()
+    return int(text) if text.isdigit() and int(text) > 0 else None
+
+def normalize_unit(quantity: Optional[float], unit: Optional[str]) -> Tuple[Optional[float], Optional[str]]:
+    """換算成基準單位；不認得的單位原樣保留"""
+    if unit is None:
+        return quantity, (None if quantity is None else '個')  # 只有數字時視為個數
+    base, factor = UNITS.get(unit.lower(), (unit, 1.0))
+    return (None if quantity is None else quantity * factor), base
+
+def scenario_headcount(scenario: str, default: int = DEFAULT_SERVINGS) -> int:
+    """由情境名稱取得用餐人數，例如 '20人中型派對' -> 20、'3-4人小家庭' -> 4"""
+    match = _HEADCOUNT_RE.search(scenario or '')
+    if not match:
+        return default
+    return int(match[2] or match[1])
+
+def format_amount(amount: float, unit: str) -> str:
+    threshold, larger = DISPLAY_UNITS.get(unit, (None, None))
+    if threshold and amount >= threshold:
+        amount, unit = amount / threshold, larger
+    text = f"{amount:.1f}".rstrip('0').rstrip('.')
+    return f"{text} {unit}"
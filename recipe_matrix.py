@@ -0,0 +1,330 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from db_manager import FIVE_COLORS, NATURE_SCORES
+from quantities import DEFAULT_SERVINGS, normalize_unit
+
+# 每道食譜一列；五色欄位為該色食材數，nature 為平均食性分數 (熱 2 … 寒 -2)
+COLUMNS = ('青', '赤', '黃', '白', '黑', 'nature', 'condiments', 'ingredients')
+COLOR_COLUMNS = COLUMNS[:5]
+COLUMN_INDEX = {name: i for i, name in enumerate(COLUMNS)}
+
+# 在 SQL 端就把五色與食性轉成數值，Python 端只需要把結果整批轉成陣列
+RECIPE_SQL = "SELECT id, name, category FROM recipes {where} ORDER BY id"
+LINK_SQL = f"""
+    SELECT ri.recipe_id,
+           CASE i.five_color {' '.join(f"WHEN '{c}' THEN {i}" for i, c in enumerate(FIVE_COLORS))} ELSE -1 END,
+           CASE i.nature {' '.join(f"WHEN '{n}' THEN {v}" for n, v in NATURE_SCORES.items())} ELSE 0 END,
+           COALESCE(i.is_condiment, 0),
+           ri.ingredient_id
+    FROM recipe_ingredients ri
+    JOIN ingredients i ON i.id = ri.ingredient_id
+    {{where}}
+"""
+
+def _compute_rows(recipe_ids: np.ndarray, links: List[Tuple]) -> np.ndarray:
+    """由 (recipe_id, 五色索引, 食性分數, 是否調味品, ingredient_id) 的關聯列一次算出特徵矩陣"""
+    values = np.zeros((len(recipe_ids), len(COLUMNS)), dtype=np.float64)
+    if not links or not len(recipe_ids):
+        return values
+
+    link_arr = np.asarray(links, dtype=np.int64)
+    pos = np.searchsorted(recipe_ids, link_arr[:, 0])
+    known = (pos < len(recipe_ids)) & (recipe_ids[np.minimum(pos, len(recipe_ids) - 1)] == link_arr[:, 0])
+    pos, link_arr = pos[known], link_arr[known]
+
+    colored = link_arr[:, 1] >= 0
+    np.add.at(values, (pos[colored], link_arr[colored, 1]), 1)
+    np.add.at(values[:, COLUMN_INDEX['condiments']], pos, link_arr[:, 3])
+    counts = np.bincount(pos, minlength=len(recipe_ids)).astype(np.float64)
+    nature_sum = np.bincount(pos, weights=link_arr[:, 2], minlength=len(recipe_ids))
+    values[:, COLUMN_INDEX['ingredients']] = counts
+    values[:, COLUMN_INDEX['nature']] = np.divide(nature_sum, counts, out=np.zeros_like(nature_sum),
+                                                  where=counts > 0)
+    return values
+
+def _link_arrays(links: List[Tuple]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """關聯列的 (recipe_id, ingredient_id, 是否調味品) 三個陣列"""
+    if not links:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+    link_arr = np.asarray(links, dtype=np.int64)
+    return link_arr[:, 0], link_arr[:, 4], link_arr[:, 3].astype(bool)
+
+class RecipeMatrix:
+    """
+    食譜屬性矩陣 (NumPy)，一列一道食譜，欄位見 COLUMNS；另存每道食譜的食材關聯 (依列排序的扁平陣列)。
+
+    提供向量化的篩選、加權排序與現有食材涵蓋率排序，讓排序、建議與規劃器用矩陣運算取代逐筆迴圈。
+    """
+
+    def __init__(self, ids: np.ndarray, names: List[str], categories: np.ndarray, values: np.ndarray,
+                 link_recipes: np.ndarray, link_ingredients: np.ndarray, link_condiments: np.ndarray):
+        self.ids = ids
+        self.names = names
+        self.categories = categories
+        self.values = values
+        self._set_links(link_recipes, link_ingredients, link_condiments)
+
+    def _set_links(self, link_recipes: np.ndarray, link_ingredients: np.ndarray, link_condiments: np.ndarray):
+        # 依所屬的列排序：第 k 列的關聯位於 [link_offsets[k], link_offsets[k + 1])
+        rows = np.searchsorted(self.ids, link_recipes)
+        order = np.argsort(rows, kind='stable')
+        self.link_rows = rows[order]
+        self.link_ingredients = link_ingredients[order]
+        self.link_condiments = link_condiments[order]
+        self.link_offsets = np.searchsorted(self.link_rows, np.arange(len(self.ids) + 1))
+
+    @classmethod
+    def load(cls, conn) -> 'RecipeMatrix':
+        recipes = conn.execute(RECIPE_SQL.format(where="")).fetchall()
+        links = conn.execute(LINK_SQL.format(where="")).fetchall()
+        ids = np.array([r[0] for r in recipes], dtype=np.int64)
+        return cls(ids, [r[1] for r in recipes], np.array([r[2] for r in recipes], dtype=object),
+                   _compute_rows(ids, links), *_link_arrays(links))
+
+    def refresh(self, conn, recipe_ids: Iterable[int]):
+        """只重新計算指定的食譜 (新增、修改或刪除)，其餘列保持不變"""
+        recipe_ids = sorted(set(recipe_ids))
+        if not recipe_ids:
+            return
+        placeholders = ','.join('?' for _ in recipe_ids)
+        recipes = conn.execute(RECIPE_SQL.format(where=f"WHERE id IN ({placeholders})"), recipe_ids).fetchall()
+        links = conn.execute(LINK_SQL.format(where=f"WHERE ri.recipe_id IN ({placeholders})"), recipe_ids).fetchall()
+
+        fresh_ids = np.array([r[0] for r in recipes], dtype=np.int64)
+        fresh_values = _compute_rows(fresh_ids, links)
+
+        changed = np.asarray(recipe_ids, dtype=np.int64)
+        keep = ~np.isin(self.ids, changed)
+        ids = np.concatenate([self.ids[keep], fresh_ids])
+        order = np.argsort(ids, kind='stable')
+        names = [n for n, k in zip(self.names, keep) if k] + [r[1] for r in recipes]
+        categories = np.concatenate([self.categories[keep], np.array([r[2] for r in recipes], dtype=object)])
+
+        link_keep = keep[self.link_rows]
+        fresh = set(fresh_ids.tolist())
+        fresh_links = _link_arrays([link for link in links if link[0] in fresh])
+        link_arrays = [np.concatenate([old[link_keep], new]) for old, new in zip(
+            (self.ids[self.link_rows], self.link_ingredients, self.link_condiments), fresh_links)]
+
+        self.ids = ids[order]
+        self.names = [names[i] for i in order]
+        self.categories = categories[order]
+        self.values = np.concatenate([self.values[keep], fresh_values])[order]
+        self._set_links(*link_arrays)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, COLUMN_INDEX[name]]
+
+    def position(self, recipe_id: int) -> Optional[int]:
+        pos = int(np.searchsorted(self.ids, recipe_id))
+        if pos < len(self.ids) and self.ids[pos] == recipe_id:
+            return pos
+        return None
+
+    def row(self, recipe_id: int) -> Optional[np.ndarray]:
+        pos = self.position(recipe_id)
+        return None if pos is None else self.values[pos]
+
+    def name(self, recipe_id: int) -> Optional[str]:
+        pos = self.position(recipe_id)
+        return None if pos is None else self.names[pos]
+
+    def mask(self, filters: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+             categories: Optional[Iterable[str]] = None,
+             exclude_ids: Optional[Iterable[int]] = None) -> np.ndarray:
+        """
+        Args:
+            filters: 欄位 -> (下限, 上限)，None 表示不限，例如 {'ingredients': (3, None)}
+            categories: 只保留這些食譜分類
+            exclude_ids: 排除的食譜
+        """
+        keep = np.ones(len(self.ids), dtype=bool)
+        for name, (low, high) in (filters or {}).items():
+            col = self.column(name)
+            if low is not None:
+                keep &= col >= low
+            if high is not None:
+                keep &= col <= high
+        if categories is not None:
+            keep &= np.isin(self.categories, list(categories))
+        if exclude_ids is not None:
+            keep &= ~np.isin(self.ids, np.fromiter(exclude_ids, dtype=np.int64))
+        return keep
+
+    def scores(self, weights: Dict[str, float]) -> np.ndarray:
+        w = np.zeros(len(COLUMNS))
+        for name, weight in weights.items():
+            w[COLUMN_INDEX[name]] = weight
+        return self.values @ w
+
+    def rank(self, weights: Dict[str, float], limit: Optional[int] = None, **mask_args) -> List[Tuple[int, float]]:
+        """
+        依加權分數排序所有食譜 (分數 = 各欄位值 × 權重 的總和)
+
+        Args:
+            weights: 欄位 -> 權重，例如 {'青': 1, '黑': 1, 'condiments': -0.5}
+            limit: 只取前幾名
+            mask_args: 傳給 mask() 的篩選條件
+
+        Returns:
+            List[Tuple[int, float]]: (recipe_id, 分數)，分數高者在前
+        """
+        keep = np.flatnonzero(self.mask(**mask_args))
+        if not len(keep):
+            return []
+        s = self.scores(weights)[keep]
+        if limit is not None and limit < len(keep):
+            top = np.argpartition(-s, limit - 1)[:limit]
+            top = top[np.argsort(-s[top], kind='stable')]
+        else:
+            top = np.argsort(-s, kind='stable')
+        return [(int(self.ids[keep[i]]), float(s[i])) for i in top]
+
+    def link_counts(self, links: np.ndarray) -> np.ndarray:
+        """每一列中符合條件 (與關聯陣列等長的布林陣列) 的關聯數"""
+        return np.bincount(self.link_rows[links], minlength=len(self.ids))
+
+    def ingredients_of(self, positions: Iterable[int], condiments: bool = True) -> np.ndarray:
+        """指定各列的食材 id (可重複)；condiments=False 時不含調味品"""
+        positions = list(positions)
+        if not positions:
+            return np.zeros(0, dtype=np.int64)
+        picked = np.concatenate([np.arange(self.link_offsets[p], self.link_offsets[p + 1]) for p in positions])
+        if not condiments:
+            picked = picked[~self.link_condiments[picked]]
+        return self.link_ingredients[picked]
+
+    def rank_by_pantry(self, pantry_ids: Iterable[int], ignore_condiments: bool = True,
+                       limit: int = 20) -> List[Dict]:
+        """
+        依現有食材的涵蓋率排序食譜 (涵蓋率相同時，缺少的食材越少、用到的現有食材越多越前面)
+
+        Returns:
+            List[Dict]: id / name / category / coverage / matched / total / missing_ids
+        """
+        counted = ~self.link_condiments if ignore_condiments else np.ones(len(self.link_rows), dtype=bool)
+        have = counted & np.isin(self.link_ingredients, np.fromiter(pantry_ids, dtype=np.int64))
+        total = self.link_counts(counted)
+        matched = self.link_counts(have)
+        candidates = np.flatnonzero(matched > 0)
+        if not len(candidates):
+            return []
+        t, m = total[candidates], matched[candidates]
+        names = np.array([self.names[i] for i in candidates], dtype=str)
+        # lexsort 以最後一個鍵為主：涵蓋率 → 缺少數 → 用到數 → 名稱
+        order = np.lexsort((names, -m, t - m, -(m / t)))[:limit]
+
+        results = []
+        for i in order:
+            pos = candidates[i]
+            links = slice(self.link_offsets[pos], self.link_offsets[pos + 1])
+            missing = self.link_ingredients[links][counted[links] & ~have[links]]
+            results.append({
+                'id': int(self.ids[pos]),
+                'name': self.names[pos],
+                'category': self.categories[pos],
+                'coverage': float(m[i] / t[i]),
+                'matched': int(m[i]),
+                'total': int(t[i]),
+                'missing_ids': sorted(missing.tolist()),
+            })
+        return results
+
+    def __len__(self):
+        return len(self.ids)
+
+QUANTITY_SQL = """
+    SELECT ri.recipe_id, ri.ingredient_id, ri.quantity, ri.unit, COALESCE(r.servings, ?)
+    FROM recipe_ingredients ri
+    JOIN recipes r ON r.id = ri.recipe_id
+    ORDER BY ri.recipe_id, ri.ingredient_id
+"""
+
+class QuantityTable:
+    """
+    recipe_ingredients 的用量，整批轉成 NumPy 陣列 (依食譜排序，每道食譜佔連續一段)。
+
+    totals() 把多道菜依人數放大後，一次以 bincount 加總每種食材、每個基準單位的採購量，
+    數百道菜、數百位賓客也只需要幾次陣列運算。
+    """
+
+    def __init__(self, recipe_ids: np.ndarray, offsets: np.ndarray, servings: np.ndarray,
+                 ingredients: np.ndarray, amounts: np.ndarray, unit_codes: np.ndarray, units: List[str]):
+        self.recipe_ids = recipe_ids    # 有食材關聯的食譜 id (遞增)
+        self.offsets = offsets          # 第 k 道食譜的關聯位於 [offsets[k], offsets[k + 1])
+        self.servings = servings        # 每道食譜的份數
+        self.ingredients = ingredients  # 每個關聯的食材 id
+        self.amounts = amounts          # 換算成基準單位後的用量，未填為 NaN
+        self.unit_codes = unit_codes    # 基準單位在 units 中的索引，沒有單位為 -1
+        self.units = units
+
+    @classmethod
+    def load(cls, conn) -> 'QuantityTable':
+        rows = conn.execute(QUANTITY_SQL, (DEFAULT_SERVINGS,)).fetchall()
+        unit_index: Dict[str, int] = {}
+        recipe_col, ingredients, amounts, unit_codes, servings_col = [], [], [], [], []
+        for recipe_id, ingredient_id, quantity, unit, servings in rows:
+            amount, base = normalize_unit(quantity, unit)
+            recipe_col.append(recipe_id)
+            ingredients.append(ingredient_id)
+            amounts.append(np.nan if amount is None else amount)
+            unit_codes.append(-1 if base is None else unit_index.setdefault(base, len(unit_index)))
+            servings_col.append(servings or DEFAULT_SERVINGS)
+
+        recipe_arr = np.asarray(recipe_col, dtype=np.int64)
+        recipe_ids, starts = np.unique(recipe_arr, return_index=True)
+        offsets = np.append(starts, len(recipe_arr)).astype(np.int64)
+        servings = np.asarray(servings_col, dtype=np.float64)[starts] if len(starts) else np.zeros(0)
+        return cls(recipe_ids, offsets, servings, np.asarray(ingredients, dtype=np.int64),
+                   np.asarray(amounts, dtype=np.float64), np.asarray(unit_codes, dtype=np.int64),
+                   list(unit_index))
+
+    def totals(self, dishes: Iterable[Tuple[int, float]]) -> List[Dict]:
+        """
+        依人數放大並加總採購量
+
+        Args:
+            dishes: (食譜 id, 用餐人數) 的序列；同一道食譜可出現多次 (例如多天都有)
+
+        Returns:
+            List[Dict]: 每種食材、每個基準單位一筆：ingredient_id、unit、amount、dishes；
+                        未填用量的關聯 unit 為 None、amount 為 0，只計入 dishes
+        """
+        dish_arr = np.asarray(list(dishes), dtype=np.float64).reshape(-1, 2)
+        if not len(dish_arr) or not len(self.recipe_ids):
+            return []
+
+        recipe = dish_arr[:, 0].astype(np.int64)
+        pos = np.searchsorted(self.recipe_ids, recipe)
+        known = (pos < len(self.recipe_ids)) & (self.recipe_ids[np.minimum(pos, len(self.recipe_ids) - 1)] == recipe)
+        pos = pos[known]
+        scale = dish_arr[known, 1] / self.servings[pos]
+
+        # 每道菜展開成它的所有關聯：row = 該食譜的起點 + 0..長度-1
+        lengths = self.offsets[pos + 1] - self.offsets[pos]
+        if not lengths.sum():
+            return []
+        starts = np.repeat(self.offsets[pos], lengths)
+        within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        rows = starts + within
+        amounts = self.amounts[rows] * np.repeat(scale, lengths)
+
+        # 以 (食材, 單位) 為鍵分組加總；未填用量者歸入單位 -1
+        codes = np.where(np.isnan(amounts), -1, self.unit_codes[rows])
+        keys = self.ingredients[rows] * (len(self.units) + 1) + (codes + 1)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=np.nan_to_num(amounts))
+        counts = np.bincount(inverse)
+
+        result = []
+        for key, amount, count in zip(unique_keys.tolist(), sums.tolist(), counts.tolist()):
+            ingredient_id, code = divmod(key, len(self.units) + 1)
+            result.append({
+                'ingredient_id': ingredient_id,
+                'unit': self.units[code - 1] if code else None,
+                'amount': amount,
+                'dishes': count,
+            })
+        return result
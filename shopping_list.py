@@ -0,0 +1,74 @@
+import argparse
+import csv
+import sys
+from typing import Dict, Iterable, List, TextIO, Tuple
+
+CSV_COLUMNS = ('category', 'name', 'is_condiment', 'dishes', 'recipes', 'days', 'day_list')
+
+def write_csv(rows: Iterable[Dict], out: TextIO) -> int:
+    """把 iter_shopping_list 的結果逐列寫成 CSV；回傳寫出的食材數"""
+    writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+def write_text(rows: Iterable[Dict], out: TextIO) -> int:
+    """
+    寫成可直接貼上的文字清單：核心食材與調味品分開，各自依分類分組。
+    結果已依 調味品與否 → 分類 排序，只需在分組改變時輸出標題。
+    """
+    section = category = None
+    count = 0
+    for row in rows:
+        row_section = '調味品' if row['is_condiment'] else '核心食材'
+        if row_section != section:
+            if section is not None:
+                out.write("\n")
+            section, category = row_section, None
+            out.write(f"【{section}】\n")
+        if row['category'] != category:
+            category = row['category']
+            out.write(f"  {category}\n")
+        days = f"，{row['days']} 天" if row['days'] > 1 else ""
+        out.write(f"    - {row['name']} ({row['dishes']} 道{days})\n")
+        count += 1
+    return count
+
+def parse_plan(entries: List[str]) -> List[Tuple[str, str, object]]:
+    """
+    解析命令列的規劃，每筆格式為 日期:種類:參照，例如 週一:menu_set:1、週二:workspace:<ws id>
+
+    Returns:
+        List[Tuple[str, str, object]]: 可直接傳給 DatabaseManager.iter_shopping_list
+    """
+    plan = []
+    for entry in entries:
+        parts = entry.split(':', 2)
+        if len(parts) != 3:
+            raise ValueError(f"格式應為 日期:種類:參照 — {entry}")
+        day, kind, ref = parts
+        plan.append((day, kind, int(ref) if kind in ('menu_set', 'recipe') else ref))
+    return plan
+
+if __name__ == "__main__":
+    from db_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="彙總多天、多份菜單的採購清單")
+    parser.add_argument('plan', nargs='+', help="日期:種類:參照，種類為 menu_set、recipe 或 workspace")
+    parser.add_argument('--db', default='vegetarian_diet.db', help="資料庫路徑")
+    parser.add_argument('--format', choices=('csv', 'text'), default='text')
+    parser.add_argument('-o', '--output', help="輸出檔案，預設為標準輸出")
+    args = parser.parse_args()
+
+    manager = DatabaseManager(args.db)
+    rows = manager.iter_shopping_list(parse_plan(args.plan))
+    write = write_csv if args.format == 'csv' else write_text
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            count = write(rows, f)
+        print(f"[OK] 已寫入 {count} 項食材到 {args.output}")
+    else:
+        write(rows, sys.stdout)
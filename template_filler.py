@@ -0,0 +1,140 @@
+import random
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from recipe_matrix import COLOR_COLUMNS, RecipeMatrix
+
+# 目標函數權重：五色涵蓋越多越好、平均食性越接近「平」越好、重複食材越少越好
+COLOR_WEIGHT = 3.0
+BALANCE_WEIGHT = 0.2
+NATURE_WEIGHT = 4.0
+REPEAT_WEIGHT = 1.0
+
+# 局部改善時每個空位最多嘗試的候選數，以及最多掃描幾輪
+MAX_SWAP_CANDIDATES = 300
+MAX_PASSES = 3
+
+class _Totals:
+    """已選菜色的彙總：五色數量、食性總和與筆數、重複的食材數、非調味品食材的聯集"""
+
+    __slots__ = ('colors', 'nature_sum', 'nature_count', 'repeats', 'union')
+
+    def __init__(self, colors: np.ndarray, nature_sum: float, nature_count: float, repeats: int,
+                 union: np.ndarray):
+        self.colors = colors
+        self.nature_sum = nature_sum
+        self.nature_count = nature_count
+        self.repeats = repeats
+        self.union = union
+
+class TemplateFiller:
+    """
+    依快速樣板的分類空位自動挑選食譜：先貪婪地逐格填入，再逐格嘗試替換做局部改善。
+    每一步都以 RecipeMatrix 的欄位與食材關聯，一次算出同分類所有候選的分數，不再查詢資料庫。
+    """
+
+    def __init__(self, matrix: RecipeMatrix, seed: Optional[int] = None):
+        self.m = matrix
+        self.rng = random.Random(seed)
+        self.colors = matrix.values[:, :len(COLOR_COLUMNS)]  # 五色欄位在最前面
+        self.nature_count = matrix.column('ingredients')
+        self.nature_sum = matrix.column('nature') * self.nature_count
+
+    @staticmethod
+    def _evaluate(colors: np.ndarray, nature_sum: np.ndarray, nature_count: np.ndarray,
+                  repeats: np.ndarray) -> np.ndarray:
+        """每一列為一組菜色的彙總，回傳各組的分數"""
+        covered = (colors > 0).sum(axis=1)
+        balance = colors.min(axis=1)
+        nature = np.abs(np.divide(nature_sum, nature_count, out=np.zeros_like(nature_sum),
+                                  where=nature_count > 0))
+        return (COLOR_WEIGHT * covered + BALANCE_WEIGHT * balance
+                - NATURE_WEIGHT * nature - REPEAT_WEIGHT * repeats)
+
+    def score(self, totals: _Totals) -> float:
+        return float(self._evaluate(totals.colors[None, :], np.array([totals.nature_sum]),
+                                    np.array([totals.nature_count]), np.array([totals.repeats]))[0])
+
+    def _totals(self, rows: List[int]) -> _Totals:
+        ingredients = self.m.ingredients_of(rows, condiments=False)
+        union = np.unique(ingredients)
+        return _Totals(self.colors[rows].sum(axis=0), float(self.nature_sum[rows].sum()),
+                       float(self.nature_count[rows].sum()), len(ingredients) - len(union), union)
+
+    def _scores_with(self, base: _Totals, candidates: np.ndarray) -> np.ndarray:
+        """base 再加上每一個候選後的分數"""
+        m = self.m
+        # 候選食譜中已經出現在 base 的非調味品食材數，就是加入後增加的重複數
+        overlap = m.link_counts(~m.link_condiments & np.isin(m.link_ingredients, base.union))[candidates]
+        return self._evaluate(base.colors + self.colors[candidates],
+                              base.nature_sum + self.nature_sum[candidates],
+                              base.nature_count + self.nature_count[candidates],
+                              base.repeats + overlap)
+
+    def _best(self, base: _Totals, pool: List[int], used: set) -> Tuple[Optional[int], Optional[float]]:
+        candidates = np.array([row for row in pool if row not in used], dtype=np.int64)
+        if not len(candidates):
+            return None, None
+        scores = self._scores_with(base, candidates)
+        best = int(np.argmax(scores))  # 同分時取第一個 (候選順序已隨機打亂)
+        return int(candidates[best]), float(scores[best])
+
+    def fill(self, blueprint: Dict[str, int], fixed: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """
+        Args:
+            blueprint: 分類 -> 份數，例如 {'主菜': 5, '配菜': 3}
+            fixed: 已由使用者選定的空位 ("主菜_0" -> recipe_id)，保留不動並納入評分；
+                   值為 None 的空位 (自訂菜色) 同樣保留，但不納入評分
+
+        Returns:
+            Dict[str, int]: 自動填入的空位 -> recipe_id (不含 fixed)；候選不足的空位會留空
+        """
+        m = self.m
+        fixed = fixed or {}
+        fixed_rows = [pos for pos in (m.position(rid) for rid in fixed.values() if rid is not None)
+                      if pos is not None]
+        used = set(fixed_rows)
+
+        pools = {}
+        for cat in blueprint:
+            pool = np.flatnonzero(m.mask(categories=[cat])).tolist()
+            self.rng.shuffle(pool)  # 同分時隨機取捨，每次配出的菜單略有不同
+            pools[cat] = pool
+
+        open_slots = [(f"{cat}_{i}", cat) for cat, count in blueprint.items()
+                      for i in range(count) if f"{cat}_{i}" not in fixed]
+
+        # 1. 貪婪：每格挑讓目前總分最高的候選
+        chosen: Dict[str, int] = {}
+        totals = self._totals(fixed_rows)
+        for key, cat in open_slots:
+            best, _ = self._best(totals, pools[cat], used)
+            if best is None:
+                continue
+            chosen[key] = best
+            used.add(best)
+            totals = self._totals(fixed_rows + list(chosen.values()))
+
+        # 2. 局部改善：逐格換成同分類中讓總分最高的其他食譜，有進步就接受
+        current = self.score(totals)
+        for _ in range(MAX_PASSES):
+            improved = False
+            for key, cat in open_slots:
+                if key not in chosen:
+                    continue
+                base = self._totals(fixed_rows + [row for k, row in chosen.items() if k != key])
+                pool = [row for row in pools[cat] if row not in used]
+                if len(pool) > MAX_SWAP_CANDIDATES:
+                    pool = self.rng.sample(pool, MAX_SWAP_CANDIDATES)
+                best, s = self._best(base, pool, used)
+                if best is not None and s > current + 1e-9:
+                    used.discard(chosen[key])
+                    chosen[key] = best
+                    used.add(best)
+                    current = s
+                    improved = True
+            if not improved:
+                break
+
+        return {key: int(m.ids[row]) for key, row in chosen.items()}
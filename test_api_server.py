@@ -0,0 +1,57 @@
+import http.client
+import json
+import sqlite3
+import threading
+from urllib.parse import quote
+
+import pytest
+
+from api_server import create_server
+
+@pytest.fixture
+def server(tmp_path):
+    s = create_server(str(tmp_path / 'test.db'), host='127.0.0.1', port=0, workers=2, quiet=True)
+    s.api.db.add_ingredient('高麗菜', '葉菜類', '青', '平')
+    thread = threading.Thread(target=s.serve_forever, daemon=True)
+    thread.start()
+    yield s
+    s.shutdown()
+    s.server_close()
+    s.api.db.close()
+
+def get(server, path, headers=None):
+    conn = http.client.HTTPConnection(*server.server_address)
+    conn.request('GET', path, headers=headers or {})
+    response = conn.getresponse()
+    result = response.status, response.getheader('ETag'), response.read()
+    conn.close()
+    return result
+
+def test_etag_returns_304_when_unchanged(server):
+    status, etag, _ = get(server, '/api/ingredients')
+    assert status == 200 and etag
+    assert get(server, '/api/ingredients', {'If-None-Match': etag})[0] == 304
+
+def test_errors_ignore_if_none_match(server):
+    _, etag, _ = get(server, '/api/ingredients')
+    for path in ('/api/missing', '/api/ingredients/999'):
+        status, error_etag, body = get(server, path, {'If-None-Match': etag})
+        assert status == 404
+        assert error_etag is None
+        assert body
+
+def test_unexpected_errors_return_json_500(server, monkeypatch):
+    def broken(*args):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(server.api.db, 'get_all_menu_sets', broken)
+    status, etag, body = get(server, '/api/menu-sets')
+    assert status == 500
+    assert etag is None
+    assert 'error' in json.loads(body)
+
+def test_recipes_filtered_by_category(server):
+    db = server.api.db
+    db.add_recipe('燙青菜', '配菜', '')
+    db.add_recipe('白飯', '主食', '')
+    _, _, body = get(server, '/api/recipes?category=' + quote('配菜'))
+    assert [r['name'] for r in json.loads(body)['items']] == ['燙青菜']
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import db_manager
+from db_manager import DatabaseManager
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+@pytest.fixture
+def manager(tmp_path):
+    # 與 benchmark.run_pages 相同：把 app.py 使用的全域實例換成暫存的資料庫
+    m = DatabaseManager(str(tmp_path / 'test.db'), use_pool=True)
+    original = db_manager.db
+    db_manager.db = m
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    yield m
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    db_manager.db = original
+    m.close()
+
+def new_app(**state):
+    at = AppTest.from_file(APP_PATH, default_timeout=30)
+    for key, value in state.items():
+        at.session_state[key] = value
+    return at
+
+# --- 快速樣板 ---
+
+def test_auto_fill_keeps_diy_slot(manager):
+    rice = manager.add_ingredient('白米', '五穀雜糧', '白', '平')
+    cabbage = manager.add_ingredient('高麗菜', '葉菜類', '青', '平')
+    for name, category, ingredient in (('白飯', '主食', rice), ('糙米飯', '主食', rice), ('燙青菜', '配菜', cabbage)):
+        manager.set_recipe_ingredients(manager.add_recipe(name, category, ''), [ingredient])
+    diy = {'type': 'custom', 'name': '阿嬤的炒飯', 'category': '主食', 'ingredients': [rice]}
+
+    at = new_app(main_nav='菜單', menu_sub_nav='快速樣板', temp_sels={'主食_0': diy})
+    at.run()
+    at.button(key='auto_fill').click().run()
+    assert not at.exception
+    sels = at.session_state.temp_sels
+    assert sels['主食_0'] == diy
+    assert sels['配菜_0']['name'] == '燙青菜'
+
+# --- 冰箱配 ---
+
+def test_pantry_labels_and_missing_ingredients(manager):
+    cabbage = manager.add_ingredient('高麗菜', '葉菜類', '青', '平')
+    egg = manager.add_ingredient('雞蛋', '蛋奶類', '黃', '平')
+    salt = manager.add_ingredient('鹽', '調味品', '白', '平', is_condiment=True)
+    recipe = manager.add_recipe('高麗菜炒蛋', '主菜', '')
+    manager.set_recipe_ingredients(recipe, [cabbage, egg, salt])
+
+    at = new_app(main_nav='菜單', menu_sub_nav='冰箱配', pantry_sel=[cabbage], pantry_ignore_conds=False)
+    at.run()
+    assert not at.exception
+    pantry = at.multiselect(key='pantry_sel')
+    # 選項值是食材 id，顯示文字由 format_func 依分類、名稱組成
+    assert pantry.options == ['【葉菜類】高麗菜', '【蛋奶類】雞蛋', '【調味品】鹽']
+    assert pantry.value == [cabbage]
+    assert [c.value for c in at.caption if c.value.startswith('還缺')] == ['還缺：【蛋奶類】雞蛋、【調味品】鹽']
+
+    at.button(key=f'pantry_add_{recipe}').click().run()
+    assert [item['id'] for item in at.session_state.menu_workspace] == [recipe]
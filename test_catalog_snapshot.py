@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from catalog_snapshot import build_snapshot, install_snapshot, verify_snapshot
+from db_manager import DatabaseManager
+
+CSVS = {
+    'ingredients': "name,category,five_color,nature,effects,is_condiment\n"
+                   "高麗菜,葉菜類,青,平,,False\n鹽,調味品,白,平,,True\n",
+    'recipes': "name,category,description,ingredients\n燙青菜,配菜,,高麗菜:300g|鹽:少許\n",
+    'set_menus': "name,description,recipes\n家常,,燙青菜\n",
+}
+
+@pytest.fixture
+def snapshot(tmp_path):
+    paths = {}
+    for name, content in CSVS.items():
+        paths[name] = tmp_path / f"{name}.csv"
+        paths[name].write_text(content, encoding='utf-8')
+    path = str(tmp_path / 'snapshot.db')
+    manifest = build_snapshot(path, str(paths['ingredients']), str(paths['recipes']), str(paths['set_menus']))
+    assert manifest['counts'] == {'ingredients': 2, 'recipes': 1, 'recipe_ingredients': 2, 'menu_sets': 1}
+    return path
+
+def test_install_verified_snapshot(snapshot, tmp_path):
+    db_path = str(tmp_path / 'node.db')
+    manifest = install_snapshot(snapshot, db_path)
+    assert manifest == verify_snapshot(snapshot)
+    manager = DatabaseManager(db_path)
+    assert [r['name'] for r in manager.get_all_recipes()] == ['燙青菜']
+    manager.close()
+    # 已有資料庫時不覆蓋
+    with pytest.raises(FileExistsError):
+        install_snapshot(snapshot, db_path)
+
+def test_verify_rejects_tampered_snapshot(snapshot, tmp_path):
+    # 大小不變、只改一個位元組，仍要被 checksum 擋下
+    with open(snapshot, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+    with pytest.raises(ValueError, match='checksum'):
+        verify_snapshot(snapshot)
+
+    db_path = str(tmp_path / 'node.db')
+    with pytest.raises(ValueError):
+        install_snapshot(snapshot, db_path)
+    assert not os.path.exists(db_path)
+
+def test_verify_rejects_resized_snapshot(snapshot):
+    with open(snapshot, 'ab') as f:
+        f.write(b'\0')
+    with pytest.raises(ValueError, match='checksum'):
+        verify_snapshot(snapshot)
@@ -0,0 +1,336 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from async_db_manager import AsyncDatabaseManager
+from db_manager import SCHEMA_VERSION, ConnectionPool, DatabaseManager
+
+@pytest.fixture
+def manager(tmp_path):
+    m = DatabaseManager(str(tmp_path / 'test.db'), use_pool=True)
+    yield m
+    m.close()
+
+# --- 連線池 ---
+
+def test_pool_reuses_connection_across_short_lived_threads(manager):
+    # Streamlit 每次重新執行都是新的執行緒，連線數不能隨執行緒數增加
+    for _ in range(50):
+        t = threading.Thread(target=manager.get_all_recipes)
+        t.start()
+        t.join()
+    assert len(manager.pool) == 1
+
+def test_pool_nested_checkout_shares_connection(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'))
+    with pool.checkout() as outer:
+        with pool.checkout() as inner:
+            assert inner is outer
+    assert len(pool) == 1
+    pool.close_all()
+
+def test_pool_is_bounded(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=2, timeout=0.1)
+    release = threading.Event()
+    held = threading.Barrier(3)
+    results = []
+
+    def hold():
+        with pool.checkout():
+            held.wait()
+            release.wait()
+
+    def take():
+        try:
+            with pool.checkout():
+                results.append('ok')
+        except sqlite3.OperationalError:
+            results.append('timeout')
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for t in holders:
+        t.start()
+    held.wait()
+    # 兩條連線都在使用中：其他執行緒等待逾時，而不是另外開新連線
+    takers = [threading.Thread(target=take) for _ in range(3)]
+    for t in takers:
+        t.start()
+    for t in takers:
+        t.join()
+    release.set()
+    for t in holders:
+        t.join()
+    assert results == ['timeout'] * 3
+    assert len(pool) == 2
+    pool.close_all()
+
+def test_pool_waits_for_returned_connection(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1, timeout=5)
+    release = threading.Event()
+    held = threading.Event()
+
+    def hold():
+        with pool.checkout():
+            held.set()
+            release.wait()
+
+    t = threading.Thread(target=hold)
+    t.start()
+    held.wait()
+    threading.Timer(0.05, release.set).start()
+    with pool.checkout() as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+    t.join()
+    assert len(pool) == 1
+    pool.close_all()
+
+def test_pool_replaces_broken_connection(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1)
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.checkout() as conn:
+            conn.execute("SELECT * FROM missing_table")
+    conn.close()  # 失效的連線在下次取出前的健康檢查被換掉
+    with pool.checkout() as fresh:
+        assert fresh is not conn
+        assert fresh.execute("SELECT 1").fetchone() == (1,)
+    assert len(pool) == 1
+    pool.close_all()
+
+def test_pool_internal_statements_are_not_instrumented(tmp_path):
+    m = DatabaseManager(str(tmp_path / 'test.db'), use_pool=True, instrument=True)
+    m.pool.idle_check = 0  # 每次取出都做健康檢查
+    with m.query_log() as log:
+        m.get_all_recipes()
+        m.get_all_recipes()
+    assert [r.sql for r in log.records] == [log.records[0].sql] * 2
+    assert 'SELECT 1' not in log.records[0].sql
+    m.close()
+
+# --- 變動標記 ---
+
+def test_change_token_ignores_workspace_writes(manager):
+    token = manager.change_token()
+    manager.save_workspaces({'s': [{'type': 'custom', 'name': '燙青菜', 'ingredients': [], 'category': '自訂'}]})
+    manager.add_menu_item(None, '自訂', '[]')
+    assert manager.change_token() == token
+
+def test_change_token_moves_on_catalog_writes(manager):
+    token = manager.change_token()
+    ingredient_id = manager.add_ingredient('高麗菜', '葉菜類', '青', '平')
+    after_add = manager.change_token()
+    assert after_add != token
+    recipe_id = manager.add_recipe('燙青菜', '配菜', '')
+    manager.set_recipe_ingredients(recipe_id, [ingredient_id])
+    assert manager.change_token() != after_add
+
+def test_change_token_sees_other_connections(manager):
+    token = manager.change_token()
+    conn = sqlite3.connect(manager.db_path)
+    with conn:
+        conn.execute("INSERT INTO ingredients (name, category, five_color, nature) VALUES ('鹽', '調味品', '白', '平')")
+    conn.close()
+    assert manager.change_token() != token
+    assert manager.catalog.by_name('鹽') is not None
+
+# --- 記憶體副本 ---
+
+@pytest.fixture
+def replica_manager(tmp_path):
+    m = DatabaseManager(str(tmp_path / 'test.db'), use_pool=True, replica=True)
+    yield m
+    m.close()
+
+def test_replica_applies_local_writes_without_reload(replica_manager):
+    m = replica_manager
+    refreshes = m.replica.refreshes
+    ingredient_id = m.add_ingredient('高麗菜', '葉菜類', '青', '平')
+    recipe_id = m.add_recipe('燙青菜', '配菜', '')
+    m.set_recipe_ingredients(recipe_id, [ingredient_id])
+    m.save_workspaces({'s': [{'type': 'recipe', 'id': recipe_id, 'name': '燙青菜', 'category': '配菜', 'description': ''}]})
+    # 寫入後立即讀得到，而且不需要整份重新載入
+    assert [i['name'] for i in m.get_recipe_with_ingredients(recipe_id)['ingredients']] == ['高麗菜']
+    assert m.load_workspace('s')[0]['id'] == recipe_id
+    # 刪除食譜會連帶刪除食材關聯 (foreign_keys)，副本也要得到相同的結果
+    m.delete_recipe(recipe_id)
+    assert m.get_recipe_with_ingredients(recipe_id) is None
+    assert m.replica.refreshes == refreshes
+
+def test_replica_reloads_after_other_process_writes(replica_manager):
+    m = replica_manager
+    refreshes = m.replica.refreshes
+    conn = sqlite3.connect(m.db_path)
+    with conn:
+        conn.execute("INSERT INTO ingredients (name, category, five_color, nature) VALUES ('鹽', '調味品', '白', '平')")
+    conn.close()
+    assert [i['name'] for i in m.get_all_ingredients()] == ['鹽']
+    assert m.replica.refreshes == refreshes + 1
+
+def test_replica_connections_reused_across_threads(replica_manager):
+    for _ in range(50):
+        t = threading.Thread(target=replica_manager.get_all_recipes)
+        t.start()
+        t.join()
+    assert len(replica_manager.replica._pool) == 1
+
+# --- 結構遷移 ---
+
+def test_migrate_upgrades_older_database(tmp_path):
+    path = str(tmp_path / 'test.db')
+    DatabaseManager(path).close()
+    # 退回版本 3：目錄版本與今日菜單寫入計數都還不存在
+    conn = sqlite3.connect(path)
+    conn.executescript("DROP TABLE catalog_version; DROP TABLE workspace_version; PRAGMA user_version = 3;")
+    conn.close()
+
+    m = DatabaseManager(path)
+    assert m.migrate() == SCHEMA_VERSION
+    token = m.change_token()
+    m.add_ingredient('高麗菜', '葉菜類', '青', '平')
+    assert m.change_token() != token
+    m.close()
+
+# --- 食譜食材 ---
+
+@pytest.mark.parametrize('use_pool', [True, False])
+def test_failed_set_recipe_ingredients_keeps_old_links(tmp_path, use_pool):
+    db = DatabaseManager(str(tmp_path / 'links.db'), use_pool=use_pool)
+    cabbage = db.add_ingredient('高麗菜', '葉菜類', '青', '平')
+    tofu = db.add_ingredient('板豆腐', '豆製品', '白', '涼')
+    recipe = db.add_recipe('高麗菜炒豆腐', '主菜', '')
+    assert db.set_recipe_ingredients(recipe, [cabbage, tofu], {tofu: (200.0, 'g')})
+
+    # 不存在的食材 (外鍵) 或重複的食材 (主鍵) 都讓整組取代失敗，原本的關聯不能被刪掉
+    bad = [cabbage, 9999] if use_pool else [cabbage, cabbage]
+    assert not db.set_recipe_ingredients(recipe, bad)
+    links = db.get_recipe_with_ingredients(recipe)['ingredients']
+    assert sorted((i['name'], i['quantity']) for i in links) == [('板豆腐', 200.0), ('高麗菜', None)]
+    db.close()
+
+# --- 食譜分頁 ---
+
+def test_recipe_page_walks_every_recipe_once(manager):
+    for i in range(45):
+        manager.add_recipe(f"食譜 {i:02d}", ('主菜', '配菜')[i % 2], '')
+    expected = [(r['category'], r['name']) for r in manager.get_all_recipes()]
+    expected.sort()
+
+    for category in (None, '配菜'):
+        seen, after = [], None
+        while True:
+            page = manager.get_recipe_page(category, after, limit=10)
+            assert len(page['recipes']) <= 10
+            seen.extend((r['category'], r['name']) for r in page['recipes'])
+            after = page['next']
+            if after is None:
+                break
+        assert seen == [e for e in expected if category is None or e[0] == category]
+
+# --- 現有食材 ---
+
+def test_pantry_ranks_by_coverage(manager):
+    cabbage = manager.add_ingredient('高麗菜', '葉菜類', '青', '平')
+    egg = manager.add_ingredient('雞蛋', '蛋奶類', '黃', '平')
+    salt = manager.add_ingredient('鹽', '調味品', '白', '平', is_condiment=True)
+    full = manager.add_recipe('燙青菜', '配菜', '')
+    manager.set_recipe_ingredients(full, [cabbage, salt])
+    half = manager.add_recipe('高麗菜炒蛋', '主菜', '')
+    manager.set_recipe_ingredients(half, [cabbage, egg])
+    manager.add_recipe('白飯', '主食', '')
+
+    matches = manager.rank_recipes_by_pantry([cabbage])
+    assert [m['id'] for m in matches] == [full, half]
+    assert matches[1]['missing_ids'] == [egg]
+    # 調味品計入時，燙青菜也缺鹽
+    matches = manager.rank_recipes_by_pantry([cabbage], ignore_condiments=False)
+    assert {m['id']: m['missing_ids'] for m in matches} == {full: [salt], half: [egg]}
+
+# --- 非同步讀取合併 ---
+
+def test_async_reads_are_coalesced(manager):
+    calls = []
+    read = manager.get_all_recipes
+
+    def slow_read():
+        calls.append(1)
+        time.sleep(0.05)
+        return read()
+    manager.get_all_recipes = slow_read
+
+    async def run():
+        adb = AsyncDatabaseManager(manager)
+        results = await adb.gather(*(adb.get_all_recipes() for _ in range(5)))
+        await adb.close()
+        return results
+
+    assert asyncio.run(run()) == [[]] * 5
+    assert len(calls) == 1
+
+def test_async_write_invalidates_inflight_read(manager):
+    calls = []
+    read = manager.get_all_recipes
+    started = threading.Event()
+
+    def slow_read():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return read()
+    manager.get_all_recipes = slow_read
+
+    async def run():
+        adb = AsyncDatabaseManager(manager)
+        before = asyncio.ensure_future(adb.get_all_recipes())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        await adb.add_recipe('麻婆豆腐', '主菜', '')
+        # 寫入前開始的查詢還沒結束，寫入後的讀取不能併入它
+        after = await adb.get_all_recipes()
+        results = await before, after
+        await adb.close()
+        return results
+
+    _, after = asyncio.run(run())
+    assert len(calls) == 2
+    assert [r['name'] for r in after] == ['麻婆豆腐']
+
+def test_async_workspace_and_shopping_list(manager):
+    cabbage = manager.add_ingredient('高麗菜', '葉菜類', '青', '平')
+    tofu = manager.add_ingredient('板豆腐', '豆製品', '白', '涼')
+    recipe = manager.add_recipe('高麗菜炒豆腐', '主菜', '')
+    manager.set_recipe_ingredients(recipe, [cabbage, tofu])
+    item = {'type': 'recipe', 'id': recipe, 'name': '高麗菜炒豆腐', 'category': '主菜', 'description': ''}
+    plan = [('2024-01-01', 'workspace', 's1'), ('2024-01-02', 'recipe', recipe)]
+
+    async def run():
+        adb = AsyncDatabaseManager(manager)
+        await adb.save_workspaces({'s1': [item]})
+        workspace = await adb.load_workspace('s1')
+        rows = [row async for row in adb.iter_shopping_list(plan, batch_rows=1)]
+        # 提早結束迭代也會歸還連線
+        async for _ in adb.iter_shopping_list(plan, batch_rows=1):
+            break
+        await adb.close()
+        return workspace, rows
+
+    workspace, rows = asyncio.run(run())
+    assert [w['id'] for w in workspace] == [recipe]
+    assert rows == list(manager.iter_shopping_list(plan))
+    assert [(r['name'], r['days']) for r in rows] == [('高麗菜', 2), ('板豆腐', 2)]
+
+# --- 搜尋 ---
+
+def test_short_keywords_use_escaped_like(manager):
+    # 兩個字的關鍵字不足 trigram 的長度，改走 LIKE
+    manager.add_ingredient('板豆腐', '豆製品', '白', '涼', effects='清熱')
+    manager.add_ingredient('鹽', '調味品', '白', '平', effects='含鈉 100%', is_condiment=True)
+    manager.add_recipe('麻婆豆腐', '主菜', '')
+    manager.add_recipe('紅燒_豆腐', '主菜', '')
+    assert [i['name'] for i in manager.search_ingredients('清熱')] == ['板豆腐']
+    assert [r['name'] for r in manager.search_recipes('豆腐')] == ['紅燒_豆腐', '麻婆豆腐']
+    # % 與 _ 只比對字面，不是萬用字元
+    assert [i['name'] for i in manager.search_ingredients('%')] == ['鹽']
+    assert [i['name'] for i in manager.search_ingredients('0%')] == ['鹽']
+    assert [r['name'] for r in manager.search_recipes('_')] == ['紅燒_豆腐']
+    assert manager.search_recipes('\\') == []
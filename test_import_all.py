@@ -0,0 +1,46 @@
+from db_manager import DatabaseManager
+from import_all import import_all
+
+INGREDIENTS = """name,category,five_color,nature,effects,is_condiment
+{rows}"""
+RECIPES = """name,category,description,ingredients
+{rows}"""
+SET_MENUS = """name,description,recipes
+家常,,燙青菜
+"""
+
+def write_csvs(tmp_path, ingredients, recipes):
+    paths = {}
+    for name, template, rows in (('ingredients', INGREDIENTS, ingredients), ('recipes', RECIPES, recipes),
+                                 ('set_menus', None, None)):
+        path = tmp_path / f"{name}.csv"
+        path.write_text(SET_MENUS if template is None else template.format(rows="\n".join(rows)), encoding='utf-8')
+        paths[name] = str(path)
+    return paths
+
+def test_rebuild_keeps_workspace_references(tmp_path):
+    db_path = str(tmp_path / 'test.db')
+    csvs = write_csvs(tmp_path, ["高麗菜,葉菜類,白,平,,False", "鹽,調味品,白,平,,True"],
+                      ["燙青菜,配菜,,高麗菜|鹽"])
+    import_all(db_path, csvs['ingredients'], csvs['recipes'], csvs['set_menus'], parallel=False)
+
+    manager = DatabaseManager(db_path)
+    recipe = manager.get_all_recipes()[0]
+    cabbage = manager.catalog.by_name('高麗菜').id
+    manager.save_workspaces({'s': [
+        {'type': 'recipe', 'id': recipe['id'], 'name': recipe['name'], 'category': recipe['category'],
+         'description': recipe['description']},
+        {'type': 'custom', 'name': '清炒', 'ingredients': [cabbage], 'category': '自訂'},
+    ]})
+    manager.close()
+
+    # 新的 CSV 在前面多了食材與食譜，重建後的 id 全部位移
+    csvs = write_csvs(tmp_path, ["地瓜葉,葉菜類,青,涼,,False", "高麗菜,葉菜類,白,平,,False", "鹽,調味品,白,平,,True"],
+                      ["炒地瓜葉,配菜,,地瓜葉|鹽", "燙青菜,配菜,,高麗菜|鹽"])
+    import_all(db_path, csvs['ingredients'], csvs['recipes'], csvs['set_menus'], parallel=False)
+
+    manager = DatabaseManager(db_path)
+    items = manager.load_workspace('s')
+    assert items[0]['name'] == '燙青菜'
+    assert [manager.catalog.get(i).name for i in items[1]['ingredients']] == ['高麗菜']
+    manager.close()
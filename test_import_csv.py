@@ -0,0 +1,45 @@
+import io
+
+import pandas as pd
+import pytest
+
+import import_csv
+from db_manager import DatabaseManager
+
+CSV = """name,category,five_color,nature,effects,is_condiment
+高麗菜,葉菜類,青,平,,False
+,葉菜類,青,平,,False
+高麗菜,葉菜類,青,平,,False
+紅蘿蔔,根莖類,紅,平,,False
+鹽,香料,白,溫熱,,True
+板豆腐,豆製品,白,涼,清熱,False
+"""
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    m = DatabaseManager(str(tmp_path / 'test.db'))
+    monkeypatch.setattr(import_csv, 'db', m)
+    yield m
+    m.close()
+
+def test_validate_reports_every_bad_row(manager):
+    df = pd.read_csv(io.StringIO(CSV))
+    errors = import_csv.validate_ingredients(df)
+    # 每一行的所有問題都一起列出，而不是遇到第一個錯誤就停止
+    assert errors.to_dict() == {
+        1: 'name 不可為空',
+        2: 'name 重複: 高麗菜',
+        3: 'five_color 不合法: 紅',
+        4: 'category 不合法: 香料; nature 不合法: 溫熱',
+    }
+
+def test_bulk_import_skips_bad_rows(manager, tmp_path):
+    csv_path = tmp_path / 'ingredients.csv'
+    csv_path.write_text(CSV, encoding='utf-8')
+    manager.add_ingredient('舊食材', '其他', '黑', '平')
+
+    assert import_csv.import_ingredients_from_csv(str(csv_path))
+    # 舊資料被取代，只寫入合法的行；記憶體中的目錄與全文索引都跟著更新
+    assert sorted(i['name'] for i in manager.get_all_ingredients()) == ['板豆腐', '高麗菜']
+    assert manager.catalog.by_name('舊食材') is None
+    assert [i['name'] for i in manager.search_ingredients('清熱')] == ['板豆腐']
@@ -0,0 +1,65 @@
+import sqlite3
+
+from db_manager import DatabaseManager
+from import_recipes import import_recipes
+from import_set_menus import import_set_menus
+
+RECIPES = "name,category,description,ingredients\n"
+SET_MENUS = "name,description,recipes\n"
+
+def write_csv(path, header, rows):
+    path.write_text(header + "\n".join(rows) + "\n", encoding='utf-8')
+    return str(path)
+
+def digest_names(db_path, kind):
+    with sqlite3.connect(db_path) as conn:
+        return sorted(name for name, in conn.execute("SELECT name FROM import_digests WHERE kind = ?", (kind,)))
+
+def test_incremental_reimport(tmp_path):
+    db_path = str(tmp_path / 'test.db')
+    manager = DatabaseManager(db_path)
+    manager.add_ingredient('高麗菜', '葉菜類', '青', '平')
+    manager.add_ingredient('鹽', '調味品', '白', '平', is_condiment=True)
+    manager.close()
+    recipes_csv = tmp_path / 'recipes.csv'
+    set_menus_csv = tmp_path / 'set_menus.csv'
+
+    write_csv(recipes_csv, RECIPES, ["燙青菜,配菜,,高麗菜|鹽", "高麗菜湯,湯品,,高麗菜"])
+    write_csv(set_menus_csv, SET_MENUS, ["家常,,燙青菜|高麗菜湯", "清淡,,高麗菜湯"])
+    assert len(import_recipes(db_path, str(recipes_csv)).added) == 2
+    assert len(import_set_menus(db_path, str(set_menus_csv)).added) == 2
+
+    # 未變動：不寫入任何資料
+    summary = import_recipes(db_path, str(recipes_csv))
+    assert (summary.added, summary.updated, summary.relinked, summary.unchanged) == ([], [], [], 2)
+    summary = import_set_menus(db_path, str(set_menus_csv))
+    assert (summary.added, summary.updated, summary.relinked, summary.unchanged) == ([], [], [], 2)
+
+    # 變動與移除：只處理變動的資料，移除的資料清掉摘要
+    write_csv(recipes_csv, RECIPES, ["燙青菜,配菜,少油,高麗菜"])
+    write_csv(set_menus_csv, SET_MENUS, ["家常,,燙青菜"])
+    summary = import_recipes(db_path, str(recipes_csv))
+    assert (summary.updated, summary.relinked, summary.pruned) == (['燙青菜'], ['燙青菜'], 1)
+    summary = import_set_menus(db_path, str(set_menus_csv))
+    assert (summary.relinked, summary.pruned) == (['家常'], 1)
+    assert digest_names(db_path, 'recipe') == ['燙青菜']
+    assert digest_names(db_path, 'menu_set') == ['家常']
+
+    # 移除期間在資料庫中被修改過，重新加回 CSV 時要再次寫入，而不是比對成未變動
+    manager = DatabaseManager(db_path)
+    soup = next(r for r in manager.get_all_recipes() if r['name'] == '高麗菜湯')
+    manager.update_recipe(soup['id'], '高麗菜湯', '湯品', '改過的說明')
+    manager.close()
+    write_csv(recipes_csv, RECIPES, ["燙青菜,配菜,少油,高麗菜", "高麗菜湯,湯品,,高麗菜"])
+    summary = import_recipes(db_path, str(recipes_csv))
+    assert summary.updated == ['高麗菜湯']
+    manager = DatabaseManager(db_path)
+    assert manager.get_recipe_by_id(soup['id'])['description'] == ''
+    manager.close()
+
+def test_set_menus_import_into_new_database(tmp_path):
+    db_path = str(tmp_path / 'new.db')
+    csv_path = write_csv(tmp_path / 'set_menus.csv', SET_MENUS, ["家常,,燙青菜"])
+    summary = import_set_menus(db_path, csv_path)
+    assert summary.added == ['家常'] and summary.unresolved == 1
+    assert digest_names(db_path, 'menu_set') == ['家常']
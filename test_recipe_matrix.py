@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from db_manager import DatabaseManager
+from quantities import format_amount
+from recipe_matrix import RecipeMatrix
+from template_filler import TemplateFiller
+
+@pytest.fixture
+def manager(tmp_path):
+    m = DatabaseManager(str(tmp_path / 'test.db'), use_pool=True)
+    yield m
+    m.close()
+
+def add(manager, name, category, ingredient_ids):
+    recipe_id = manager.add_recipe(name, category, '')
+    manager.set_recipe_ingredients(recipe_id, ingredient_ids)
+    return recipe_id
+
+def test_incremental_refresh_matches_full_load(manager):
+    cabbage = manager.add_ingredient('高麗菜', '葉菜類', '青', '平')
+    carrot = manager.add_ingredient('紅蘿蔔', '根莖類', '赤', '溫')
+    salt = manager.add_ingredient('鹽', '調味品', '白', '平', is_condiment=True)
+    first = add(manager, '燙青菜', '配菜', [cabbage, salt])
+    manager.get_recipe_matrix()
+    # 本行程的食譜寫入只重算那幾列
+    add(manager, '炒紅蘿蔔', '配菜', [carrot, salt])
+    manager.set_recipe_ingredients(first, [cabbage, carrot])
+    matrix = manager.get_recipe_matrix()
+
+    with manager.get_connection() as conn:
+        full = RecipeMatrix.load(conn)
+    assert np.array_equal(matrix.ids, full.ids)
+    assert np.array_equal(matrix.values, full.values)
+    for pos in range(len(full)):
+        assert sorted(matrix.ingredients_of([pos])) == sorted(full.ingredients_of([pos]))
+    assert [m['id'] for m in matrix.rank_by_pantry([carrot])] == [m['id'] for m in full.rank_by_pantry([carrot])]
+
+def test_filler_prefers_balanced_menu_without_repeats(manager):
+    green = manager.add_ingredient('菠菜', '葉菜類', '青', '平')
+    corn = manager.add_ingredient('玉米', '五穀雜糧', '黃', '平')
+    ginger = manager.add_ingredient('老薑', '根莖類', '黃', '熱')
+    add(manager, '玉米炒蛋', '主菜', [corn])
+    add(manager, '麻油薑', '主菜', [ginger])
+    add(manager, '菠菜湯', '湯品', [green])
+    add(manager, '玉米湯', '湯品', [corn])
+
+    picks = TemplateFiller(manager.get_recipe_matrix(), seed=1).fill({'主菜': 1, '湯品': 1})
+    names = {key: manager.get_recipe_by_id(rid)['name'] for key, rid in picks.items()}
+    # 兩種顏色、食性平、沒有重複食材的組合只有一組
+    assert names == {'主菜_0': '玉米炒蛋', '湯品_0': '菠菜湯'}
+
+def test_filler_keeps_fixed_slots(manager):
+    green = manager.add_ingredient('菠菜', '葉菜類', '青', '平')
+    first = add(manager, '炒菠菜', '主菜', [green])
+    add(manager, '菠菜湯', '湯品', [green])
+    picks = TemplateFiller(manager.get_recipe_matrix(), seed=1).fill({'主菜': 2, '湯品': 1},
+                                                                      {'主菜_0': first, '主菜_1': None})
+    assert set(picks) == {'湯品_0'}
+
+def test_purchase_totals_scale_by_headcount_and_unit(manager):
+    cabbage = manager.add_ingredient('高麗菜', '葉菜類', '青', '平')
+    egg = manager.add_ingredient('雞蛋', '蛋奶類', '黃', '平')
+    salt = manager.add_ingredient('鹽', '調味品', '白', '平', is_condiment=True)
+    pepper = manager.add_ingredient('胡椒', '調味品', '黑', '熱', is_condiment=True)
+    two = manager.add_recipe('高麗菜炒蛋', '主菜', '', servings=2)
+    for ingredient, quantity, unit in ((cabbage, 300, 'g'), (salt, 1, '小匙'), (egg, 2, None), (pepper, None, '少許')):
+        manager.add_ingredient_to_recipe(two, ingredient, quantity, unit)
+    four = manager.add_recipe('高麗菜湯', '湯品', '')  # 未填份數視為 4 人份
+    manager.add_ingredient_to_recipe(four, cabbage, 0.5, '斤')
+    manager.add_ingredient_to_recipe(four, salt, 1, '大匙')
+    whole = manager.add_recipe('高麗菜飯', '主食', '', servings=4)
+    manager.add_ingredient_to_recipe(whole, cabbage, 1, '顆')
+
+    totals = manager.get_purchase_totals([(two, 4), (four, 8), (two, 2), (whole, 4), (9999, 3)])
+    # 斤、公克換算成同一個基準單位加總，顆另列一筆；只有數字視為個數；未填用量只計入道數
+    assert [(t['name'], t['unit'], t['amount'], t['dishes']) for t in totals] == [
+        ('高麗菜', 'g', 300 * 2 + 300 * 2 + 300 * 1, 3),
+        ('高麗菜', '顆', 1, 1),
+        ('雞蛋', '個', 2 * 2 + 2 * 1, 2),
+        ('胡椒', None, 0, 2),
+        ('鹽', 'ml', 5 * 2 + 15 * 2 + 5 * 1, 3),
+    ]
+    assert format_amount(totals[0]['amount'], 'g') == '1.5 kg'
+    assert manager.get_purchase_totals([]) == []
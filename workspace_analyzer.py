@@ -0,0 +1,60 @@
+from typing import List, Dict, Optional
+
+from db_manager import NATURE_SCORES
+
+class WorkspaceAnalysis:
+    """今日菜單的分析結果，供五色圓餅圖、食性量尺與採購清單共用"""
+
+    def __init__(self, color_counts: Dict[str, int], nature_score: Optional[float],
+                 core_ingredients: List[str], condiments: List[str]):
+        self.color_counts = color_counts
+        self.nature_score = nature_score
+        self.core_ingredients = core_ingredients
+        self.condiments = condiments
+
+class WorkspaceAnalyzer:
+    """
+    一次解析工作台中所有菜色的食材，單次走訪即產生五色統計、食性分數與採購分類。
+
+    食譜菜色的食材以 get_recipes_with_ingredients 一次批次查詢；
+    自訂菜色的食材 id 則由記憶體中的食材目錄解析。
+    """
+
+    def __init__(self, db, recipe_loader=None):
+        self.db = db
+        # 可替換為帶快取的讀取函數，簽名同 get_recipes_with_ingredients(recipe_ids)
+        self.recipe_loader = recipe_loader or db.get_recipes_with_ingredients
+
+    def analyze(self, workspace: List[Dict]) -> WorkspaceAnalysis:
+        recipe_ids = sorted({item['id'] for item in workspace if item['type'] == 'recipe'})
+        recipe_ings = {r['id']: r['ingredients'] for r in self.recipe_loader(recipe_ids)}
+
+        color_counts: Dict[str, int] = {}
+        nature_total = 0
+        nature_count = 0
+        core_ings = set()
+        condiments = set()
+
+        for item in workspace:
+            if item['type'] == 'recipe':
+                for ing in recipe_ings.get(item['id'], []):
+                    color_counts[ing['five_color']] = color_counts.get(ing['five_color'], 0) + 1
+                    nature_total += NATURE_SCORES.get(ing['nature'], 0)
+                    nature_count += 1
+                    if ing['is_condiment']:
+                        condiments.add(ing['name'])
+                    else:
+                        core_ings.add(ing['name'])
+            elif item['type'] == 'custom':
+                for ing_id in item.get('ingredients', []):
+                    ing = self.db.catalog.get(ing_id)
+                    if ing:
+                        # 自訂菜色的食材一律列為核心食材
+                        core_ings.add(ing.name)
+                        color_counts[ing.five_color] = color_counts.get(ing.five_color, 0) + 1
+                        nature_total += NATURE_SCORES.get(ing.nature, 0)
+                        nature_count += 1
+
+        color_counts.pop('未知', None)
+        nature_score = nature_total / nature_count if nature_count else None
+        return WorkspaceAnalysis(color_counts, nature_score, sorted(core_ings), sorted(condiments))